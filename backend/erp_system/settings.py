@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 from decouple import config, Csv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -71,6 +72,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foundation.metrics.MetricsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -133,7 +135,8 @@ CACHES = {
         'BACKEND': 'django_redis.cache.RedisCache',
         'LOCATION': f"redis://{config('REDIS_HOST')}:{config('REDIS_PORT')}/0",
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # 在默认客户端基础上统计缓存命中次数
+            'CLIENT_CLASS': 'foundation.metrics.MetricsRedisClient',
             'PASSWORD': config('REDIS_PASSWORD', default=''),
         }
     }
@@ -201,7 +204,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST Framework配置
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'foundation.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -217,8 +220,9 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
+        'foundation.filters.ObjectPermissionFilter',
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
+        'foundation.filters.NgramSearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
@@ -231,7 +235,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=config('JWT_REFRESH_TOKEN_LIFETIME', default=7, cast=int)),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # 登录记录由 foundation.logins 缓冲后批量写入
+    'UPDATE_LAST_LOGIN': False,
 
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': config('JWT_SECRET_KEY', default=SECRET_KEY),
@@ -246,6 +251,8 @@ SIMPLE_JWT = {
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # 作废的令牌存入 Redis 黑名单（见 foundation.tokens）
+    'TOKEN_REFRESH_SERIALIZER': 'foundation.tokens.TokenRefreshSerializer',
 }
 
 # CORS配置
@@ -278,6 +285,31 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'archive-deleted-records': {
+        'task': 'foundation.tasks.archive_deleted_records',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'flush-login-events': {
+        'task': 'foundation.tasks.flush_login_events',
+        'schedule': crontab(),
+    },
+    'flush-expired-tokens': {
+        'task': 'foundation.tasks.flush_expired_tokens',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# 软删除数据保留天数，超过后由定时任务归档
+SOFT_DELETE_RETENTION_DAYS = config('SOFT_DELETE_RETENTION_DAYS', default=90, cast=int)
+
+# 接口性能指标
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Prometheus 抓取指标时使用的令牌（?token=），为空时仅管理员可访问
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# 接口认证时缓存用户信息的秒数（用户保存、角色变化时立即失效）
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=300, cast=int)
 
 # 日志配置
 LOGGING = {
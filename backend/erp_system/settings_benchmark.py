@@ -0,0 +1,43 @@
+"""
+接口基准测试配置
+
+使用嵌入式 SQLite 数据库和本地内存缓存，无需 MySQL/Redis 即可在本地运行：
+
+    DJANGO_SETTINGS_MODULE=erp_system.settings_benchmark python manage.py benchmark_api --setup
+"""
+import os
+
+# 基础配置中必填、基准测试不使用的连接参数
+os.environ.setdefault('SECRET_KEY', 'benchmark-only-secret-key-do-not-use-in-production')
+for name in ('DB_ENGINE', 'DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT',
+             'REDIS_HOST', 'REDIS_PORT'):
+    os.environ.setdefault(name, 'benchmark')
+os.environ.setdefault('ALLOWED_HOSTS', '*')
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+os.environ.setdefault('CELERY_RESULT_BACKEND', 'cache+memory://')
+
+from .settings import *  # noqa: E402,F401,F403
+from .settings import BASE_DIR  # noqa: E402
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DB_NAME', str(BASE_DIR / 'benchmark.sqlite3')),
+        'OPTIONS': {
+            # 并发客户端写入（如登录）时等待锁
+            'timeout': 30,
+        },
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+CELERY_TASK_ALWAYS_EAGER = True
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from mptt.admin import MPTTModelAdmin
-from .models import Department, User, Role, Permission, Menu, Customer, Supplier
+from .models import Department, User, Role, Permission, Menu, Customer, Supplier, ImportJob, ArchivedRecord, LoginLog
 
 
 @admin.register(Department)
@@ -78,3 +78,30 @@ class SupplierAdmin(admin.ModelAdmin):
     search_fields = ['supplier_code', 'supplier_name', 'contact_person', 'contact_phone']
     ordering = ['-created_at']
     readonly_fields = ['created_at', 'updated_at', 'created_by', 'updated_by']
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'target', 'mode', 'status', 'total_rows', 'processed_rows',
+                    'success_rows', 'failed_rows', 'created_by', 'created_at']
+    list_filter = ['target', 'status', 'created_at']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'updated_at', 'started_at', 'finished_at']
+
+
+@admin.register(ArchivedRecord)
+class ArchivedRecordAdmin(admin.ModelAdmin):
+    list_display = ['model_label', 'object_id', 'object_repr', 'deleted_at', 'archived_at']
+    list_filter = ['model_label', 'archived_at']
+    search_fields = ['object_repr']
+    ordering = ['-archived_at']
+    readonly_fields = ['model_label', 'object_id', 'object_repr', 'data', 'deleted_at', 'archived_at']
+
+
+@admin.register(LoginLog)
+class LoginLogAdmin(admin.ModelAdmin):
+    list_display = ['username', 'ip_address', 'user_agent', 'login_at']
+    list_filter = ['login_at']
+    search_fields = ['username', 'ip_address']
+    ordering = ['-login_at']
+    readonly_fields = ['user', 'username', 'ip_address', 'user_agent', 'login_at']
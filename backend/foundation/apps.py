@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class FoundationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "foundation"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import connect_signals
+
+        connect_signals()
@@ -0,0 +1,88 @@
+"""
+软删除数据归档
+
+软删除超过保留天数的数据移入 ArchivedRecord（JSON 保存原数据）并从业务表物理删除，
+业务表只保留有效数据和回收站中的近期数据。由 Celery Beat 定时执行 archive_deleted_records。
+仍被业务表数据（包括回收站中的数据）引用的记录暂不归档，避免物理删除时外键被置空或级联删除，
+例如仍有物料的物料分类、仍有下级的分类，待引用它的数据归档后再处理。
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import ArchivedRecord
+from .pagination import invalidate_count_cache
+
+ARCHIVE_CHUNK_SIZE = 1000
+
+# 参与归档的模型
+ARCHIVE_MODELS = (
+    'inventory.Material',
+    'inventory.Warehouse',
+    'foundation.Customer',
+    'foundation.Supplier',
+    'inventory.MaterialCategory',
+)
+
+
+def get_archive_days():
+    return getattr(settings, 'SOFT_DELETE_RETENTION_DAYS', 90)
+
+
+def archive_model(model, cutoff):
+    """归档一个模型中删除时间早于 cutoff 的数据，返回归档条数"""
+    queryset = model.objects.deleted().filter(deleted_at__lt=cutoff).order_by('pk')
+    for relation in model._meta.related_objects:
+        if relation.one_to_many or relation.one_to_one:
+            # 树形模型只归档叶子节点，上级节点在其下级全部归档后的下一轮处理
+            queryset = queryset.filter(~Exists(
+                relation.related_model._base_manager.filter(**{relation.field.name: OuterRef('pk')})
+            ))
+    is_tree = hasattr(model, '_mptt_meta')
+
+    archived = 0
+    while True:
+        objects = list(queryset[:ARCHIVE_CHUNK_SIZE])
+        if not objects:
+            break
+        with transaction.atomic():
+            ArchivedRecord.objects.bulk_create([
+                ArchivedRecord(
+                    model_label=model._meta.label,
+                    object_id=obj.pk,
+                    object_repr=str(obj)[:300],
+                    data=serialize_object(obj),
+                    deleted_at=obj.deleted_at,
+                ) for obj in objects
+            ])
+            if is_tree:
+                # 逐个删除以维护 MPTT 左右值
+                for obj in objects:
+                    obj.delete()
+            else:
+                model.objects.filter(pk__in=[obj.pk for obj in objects]).delete()
+        archived += len(objects)
+    return archived
+
+
+def serialize_object(obj):
+    """按字段保存原数据，外键保存ID"""
+    return {field.attname: getattr(obj, field.attname) for field in obj._meta.concrete_fields}
+
+
+def archive_deleted_records(days=None):
+    """归档所有模型中软删除超过 days 天的数据，返回 {模型: 归档条数}"""
+    days = get_archive_days() if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    result = {}
+    for label in ARCHIVE_MODELS:
+        model = apps.get_model(label)
+        count = archive_model(model, cutoff)
+        if count:
+            invalidate_count_cache(model)
+        result[label] = count
+    return result
@@ -0,0 +1,107 @@
+"""
+JWT 认证用户缓存
+
+默认的 JWTAuthentication 每个请求都按令牌中的 user_id 查询一次用户表。
+CachedJWTAuthentication 把用户字段（不含密码）、部门ID、角色ID和全局权限版本号缓存一小段时间，
+一次 get_many 同时取回用户缓存、权限版本号、用户权限缓存和令牌黑名单，命中时认证及权限判断不查询数据库。
+用户保存、删除、角色变化时删除缓存（见 signals），角色整体清空等无法定位用户的变化通过权限版本号失效。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models.fields.files import FieldFile
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .permissions import PERMISSION_VERSION_KEY, USER_PERMISSION_KEY, get_permission_version, load_user_permissions
+from .tokens import get_blacklist_key
+
+AUTH_USER_KEY = 'auth:user:{user_id}'
+# 不缓存的字段：密码哈希只保存摘要，访问 user.password 时按需从数据库加载
+AUTH_USER_EXCLUDE_FIELDS = ('password',)
+
+
+def get_auth_user_timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300)
+
+
+def invalidate_auth_users(*user_ids):
+    """删除指定用户的认证缓存"""
+    if user_ids:
+        cache.delete_many([AUTH_USER_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def build_auth_entry(user, version):
+    """用户缓存内容"""
+    fields = [field for field in user._meta.concrete_fields if field.name not in AUTH_USER_EXCLUDE_FIELDS]
+    return {
+        'version': version,
+        'fields': [field.attname for field in fields],
+        'values': [_get_raw_value(user, field) for field in fields],
+        'role_ids': sorted(user.roles.values_list('pk', flat=True)),
+        'password_hash': get_md5_hash_password(user.password),
+    }
+
+
+def _get_raw_value(user, field):
+    value = getattr(user, field.attname)
+    # 头像等文件字段只缓存文件名
+    return value.name if isinstance(value, FieldFile) else value
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """从缓存解析令牌对应用户的 JWT 认证"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user_key = AUTH_USER_KEY.format(user_id=user_id)
+        permission_key = USER_PERMISSION_KEY.format(user_id=user_id)
+        keys = [user_key, PERMISSION_VERSION_KEY, permission_key]
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti is not None:
+            keys.append(get_blacklist_key(jti))
+        values = cache.get_many(keys)
+        if jti is not None and get_blacklist_key(jti) in values:
+            # 登出时作废的访问令牌
+            raise InvalidToken(_('Token is blacklisted'))
+        version = values.get(PERMISSION_VERSION_KEY)
+        if version is None:
+            version = get_permission_version()
+
+        entry = values.get(user_key)
+        if entry is None or entry['version'] != version:
+            entry = self.load_entry(user_id, version)
+            cache.set(user_key, entry, get_auth_user_timeout())
+        user = self.build_user(entry)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['password_hash']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        user._role_ids = entry['role_ids']
+        # 用户权限缓存有效时直接带上，权限判断不再读取缓存
+        permissions = values.get(permission_key)
+        if permissions and permissions.get('version') == version and 'mask' in permissions:
+            load_user_permissions(user, version, permissions)
+        return user
+
+    def load_entry(self, user_id, version):
+        try:
+            user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+        return build_auth_entry(user, version)
+
+    def build_user(self, entry):
+        # 未加载的 password 为延迟字段，save() 时只更新已加载的字段
+        return self.user_model.from_db(router.db_for_read(self.user_model), entry['fields'], entry['values'])
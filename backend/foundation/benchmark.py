@@ -0,0 +1,327 @@
+"""
+接口基准测试
+
+在进程内用 Django 测试客户端模拟多个并发客户端请求热点接口，统计每个场景的
+p50/p95/p99 耗时、吞吐量和每请求 SQL 条数，结果保存为 JSON 便于不同提交间对比。
+"""
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .management.commands.init_foundation_data import PERMISSIONS
+from .metrics import RequestMetrics
+from .models import Department, Menu, Permission, Role, User
+from .permissions import bump_permission_version
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark123'
+BENCHMARK_ROLE_CODE = 'benchmark'
+
+# 对比结果时展示的指标，(字段, 数值越小越好)
+COMPARE_FIELDS = (('p50_ms', True), ('p95_ms', True), ('p99_ms', True), ('throughput', False), ('queries', True))
+
+
+class BenchmarkContext:
+    """场景共用的请求参数：账号、候选物料ID、搜索关键词"""
+
+    def __init__(self, username, password, material_ids, search_terms):
+        self.username = username
+        self.password = password
+        self.material_ids = material_ids
+        self.search_terms = search_terms
+
+
+def login_request(context, rng):
+    return 'post', reverse('login'), {'username': context.username, 'password': context.password}
+
+
+def user_info_request(context, rng):
+    return 'get', reverse('user_info'), None
+
+
+def user_menus_request(context, rng):
+    return 'get', reverse('user_menus'), None
+
+
+def material_list_request(context, rng):
+    return 'get', reverse('material-list'), {'page': rng.randint(1, 5)}
+
+
+def material_search_request(context, rng):
+    return 'get', reverse('material-list'), {'search': rng.choice(context.search_terms)}
+
+
+def material_retrieve_request(context, rng):
+    return 'get', reverse('material-detail', kwargs={'pk': rng.choice(context.material_ids)}), None
+
+
+def department_tree_request(context, rng):
+    return 'get', reverse('department-tree'), None
+
+
+def menu_tree_request(context, rng):
+    return 'get', reverse('menu-tree'), None
+
+
+def category_tree_request(context, rng):
+    return 'get', reverse('materialcategory-tree'), None
+
+
+# 场景名称 -> (构造请求的函数, 是否携带令牌)
+BENCHMARK_SCENARIOS = {
+    'login': (login_request, False),
+    'auth_user': (user_info_request, True),
+    'auth_menus': (user_menus_request, True),
+    'material_list': (material_list_request, True),
+    'material_search': (material_search_request, True),
+    'material_retrieve': (material_retrieve_request, True),
+    'department_tree': (department_tree_request, True),
+    'menu_tree': (menu_tree_request, True),
+    'category_tree': (category_tree_request, True),
+}
+
+
+def seed_permissions():
+    """补齐基础权限数据（与 init_foundation_data 相同），合成数据集不含权限，返回新增条数"""
+    existing = set(Permission.objects.values_list('code', flat=True))
+    created = Permission.objects.bulk_create([
+        Permission(**data) for data in PERMISSIONS if data['code'] not in existing
+    ])
+    if created:
+        # bulk_create 不触发信号
+        bump_permission_version()
+    return len(created)
+
+
+def get_benchmark_role():
+    """基准测试角色，每次运行都同步为全部权限，保证各场景通过接口鉴权"""
+    role, _ = Role.objects.get_or_create(code=BENCHMARK_ROLE_CODE, defaults={'name': '基准测试'})
+    permission_ids = set(Permission.objects.values_list('pk', flat=True))
+    if set(role.permissions.values_list('pk', flat=True)) != permission_ids:
+        role.permissions.set(permission_ids)
+    return role
+
+
+def get_benchmark_user(password=BENCHMARK_PASSWORD):
+    """获取或创建基准测试账号（普通用户，拥有前三个角色及基准测试角色以覆盖权限查询）"""
+    role = get_benchmark_role()
+    user = User.objects.filter(username=BENCHMARK_USERNAME).first()
+    if user is None:
+        user = User(username=BENCHMARK_USERNAME, employee_no='BENCHMARK', department=Department.objects.first())
+        user.set_password(password)
+        user.save()
+        user.roles.set([*Role.objects.exclude(pk=role.pk).order_by('pk')[:3], role])
+        return user
+    if not user.check_password(password):
+        user.set_password(password)
+        user.save(update_fields=['password'])
+    if not user.roles.filter(pk=role.pk).exists():
+        user.roles.add(role)
+    return user
+
+
+def build_context(rng, password=BENCHMARK_PASSWORD, sample_size=1000):
+    """准备场景参数，物料ID按主键区间随机抽样，关键词取自物料名称"""
+    Material = apps.get_model('inventory', 'Material')
+    user = get_benchmark_user(password)
+    materials = Material.objects.alive()
+    bounds = materials.aggregate(low=Min('pk'), high=Max('pk'))
+    material_ids = []
+    if bounds['low'] is not None:
+        span = range(bounds['low'], bounds['high'] + 1)
+        candidates = rng.sample(span, min(len(span), sample_size * 2))
+        material_ids = list(materials.filter(pk__in=candidates).values_list('pk', flat=True)[:sample_size])
+
+    search_terms = set()
+    for name in materials.filter(pk__in=material_ids[:100]).values_list('material_name', flat=True):
+        if len(name) >= 2:
+            start = rng.randint(0, len(name) - 2)
+            search_terms.add(name[start:start + 2])
+    return BenchmarkContext(user.username, password, material_ids, sorted(search_terms))
+
+
+def percentile(values, quantile):
+    """最近秩法分位数，values 须已排序"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(quantile * len(values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """汇总一个场景的样本 [(耗时秒, 状态码, SQL 条数), ...]"""
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    queries = [sample[2] for sample in samples]
+    statuses = {}
+    for _, status_code, _ in samples:
+        statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+    count = len(samples)
+    return {
+        'requests': count,
+        'errors': sum(1 for sample in samples if sample[1] >= 400),
+        'status': statuses,
+        'throughput': round(count / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(latencies) / count, 2) if count else None,
+        'p50_ms': _round(percentile(latencies, 0.5)),
+        'p95_ms': _round(percentile(latencies, 0.95)),
+        'p99_ms': _round(percentile(latencies, 0.99)),
+        'max_ms': _round(latencies[-1] if latencies else None),
+        'queries': round(sum(queries) / count, 2) if count else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+class BenchmarkRunner:
+    """
+    并发执行基准场景
+
+    每个模拟客户端一个线程和一个测试客户端，请求在进程内经完整中间件栈处理；
+    cold=True 时每次请求前清空缓存，测量缓存未命中时的性能。
+    """
+
+    def __init__(self, context, concurrency=4, requests=200, warmup=10, cold=False, seed=42):
+        self.context = context
+        self.concurrency = max(1, concurrency)
+        self.requests = requests
+        self.warmup = warmup
+        self.cold = cold
+        self.seed = seed
+        user = User.objects.get(username=context.username)
+        self.access_token = str(RefreshToken.for_user(user).access_token)
+
+    def run(self, names):
+        return {name: self.run_scenario(name) for name in names}
+
+    def run_scenario(self, name):
+        build_request, authenticated = BENCHMARK_SCENARIOS[name]
+        per_worker = [self.requests // self.concurrency + (1 if index < self.requests % self.concurrency else 0)
+                      for index in range(self.concurrency)]
+        # 所有线程就绪后同时开始计时
+        barrier = threading.Barrier(self.concurrency + 1)
+
+        def worker(index, count):
+            rng = random.Random(f'{self.seed}:{name}:{index}')
+            client = Client()
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {self.access_token}'} if authenticated else {}
+            try:
+                for _ in range(self.warmup):
+                    self.send(client, build_request, rng, headers)
+                barrier.wait()
+                return [self.send(client, build_request, rng, headers) for _ in range(count)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(worker, index, count) for index, count in enumerate(per_worker)]
+            barrier.wait()
+            start = time.perf_counter()
+            samples = [sample for future in futures for sample in future.result()]
+            elapsed = time.perf_counter() - start
+        return summarize(samples, elapsed)
+
+    def send(self, client, build_request, rng, headers):
+        """发送一次请求，返回 (耗时秒, 状态码, SQL 条数)"""
+        method, path, data = build_request(self.context, rng)
+        if self.cold:
+            cache.clear()
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics):
+            start = time.perf_counter()
+            if method == 'get':
+                response = client.get(path, data, **headers)
+            else:
+                response = client.post(path, data, content_type='application/json', **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        return elapsed, response.status_code, metrics.sql_count
+
+
+def get_git_revision():
+    """当前提交及工作区是否有未提交修改，非 git 环境返回 None"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {'commit': commit, 'dirty': dirty}
+
+
+def get_dataset_summary():
+    Material = apps.get_model('inventory', 'Material')
+    MaterialCategory = apps.get_model('inventory', 'MaterialCategory')
+    return {
+        'users': User.objects.count(),
+        'departments': Department.objects.count(),
+        'menus': Menu.objects.count(),
+        'material_categories': MaterialCategory.objects.count(),
+        'materials': Material.objects.count(),
+    }
+
+
+def build_report(results, options):
+    """基准结果及运行环境，写入 JSON"""
+    return {
+        'created_at': timezone.now().isoformat(),
+        'git': get_git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'platform': platform.platform(),
+        },
+        'options': options,
+        'dataset': get_dataset_summary(),
+        'results': results,
+    }
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+def compare_reports(baseline, current):
+    """
+    对比两次结果，返回 [(场景, 字段, 基准值, 当前值, 变化百分比, 是否变差), ...]
+
+    只对比两次都有的场景
+    """
+    rows = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for field, lower_is_better in COMPARE_FIELDS:
+            old, new = previous.get(field), result.get(field)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change > 0 if lower_is_better else change < 0
+            rows.append((name, field, old, new, round(change, 1), worse))
+    return rows
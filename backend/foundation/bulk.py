@@ -0,0 +1,171 @@
+"""
+批量写入服务
+
+供批量接口和导入任务共用：逐行字段校验、关联外键按集合预加载、编码唯一性集合校验，
+使用 bulk_create(update_conflicts=True) 分块写入，每块一个事务。
+更新时只覆盖行中提供的字段：块内按字段组合分组写入，未提供的字段保留原值。
+某块写入时违反约束（如并发写入同一编码、关联数据被删除）只回滚该块并标记其中的行失败，
+已写入的块照常返回结果并发送 bulk_saved。
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, transaction
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+
+from .signals import bulk_saved
+
+BULK_MODES = ('create', 'update', 'upsert')
+
+
+class BulkUpserter:
+    """
+    批量新增/更新/插入或更新
+
+    - mode=create  仅新增，编码已存在的行报错
+    - mode=update  仅更新，编码不存在的行报错
+    - mode=upsert  编码存在则更新，否则新增
+    """
+    chunk_size = 500
+    # 新增时写入、更新时保留的字段
+    create_only_fields = ('created_at', 'created_by')
+
+    def __init__(self, serializer_class, code_field, user=None, mode='upsert', context=None):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.code_field = code_field
+        self.user = user
+        self.mode = mode
+        self.context = dict(context or {}, bulk=True)
+
+    def get_serializer(self, rows):
+        """构造用于逐行校验的序列化器，关联外键按集合预加载"""
+        serializer = self.serializer_class(context=self.context)
+        for name, field in serializer.fields.items():
+            if field.read_only:
+                continue
+            if name == self.code_field:
+                # 唯一性由 save 统一校验
+                field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                self._preload_related_field(field, name, rows)
+        return serializer
+
+    @staticmethod
+    def _preload_related_field(field, name, rows):
+        queryset = field.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = set()
+        for row in rows:
+            value = row.get(name) if isinstance(row, dict) else None
+            if value not in (None, '') and not isinstance(value, bool):
+                try:
+                    pks.add(pk_field.to_python(value))
+                except ValidationError:
+                    pass
+        objects = queryset.in_bulk(pks) if pks else {}
+
+        def to_internal_value(data):
+            try:
+                if isinstance(data, bool):
+                    raise TypeError
+                return objects[pk_field.to_python(data)]
+            except KeyError:
+                field.fail('does_not_exist', pk_value=data)
+            except (TypeError, ValueError, ValidationError):
+                field.fail('incorrect_type', data_type=type(data).__name__)
+
+        field.to_internal_value = to_internal_value
+
+    def save(self, rows):
+        """校验并分块写入，返回逐行结果"""
+        code_field = self.code_field
+        serializer = self.get_serializer(rows)
+        results = [None] * len(rows)
+
+        # 逐行校验字段
+        valid = []
+        seen = set()
+        for index, row in enumerate(rows):
+            try:
+                attrs = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                results[index] = {'index': index, 'status': 'failed', 'errors': exc.detail}
+                continue
+            code = attrs[code_field]
+            if code in seen:
+                results[index] = {
+                    'index': index, code_field: code, 'status': 'failed',
+                    'errors': {code_field: ['编码在本批数据中重复']}
+                }
+                continue
+            seen.add(code)
+            valid.append((index, attrs))
+
+        # 一次查询取回已存在的编码
+        existing = dict(self.model.objects.filter(
+            **{f'{code_field}__in': list(seen)}
+        ).values_list(code_field, 'pk'))
+        writable = []
+        for index, attrs in valid:
+            code = attrs[code_field]
+            if self.mode == 'create' and code in existing:
+                results[index] = {'index': index, code_field: code, 'status': 'failed',
+                                  'errors': {code_field: ['编码已存在']}}
+            elif self.mode == 'update' and code not in existing:
+                results[index] = {'index': index, code_field: code, 'status': 'failed',
+                                  'errors': {code_field: ['编码不存在']}}
+            else:
+                writable.append((index, attrs))
+
+        written_ids = []
+        try:
+            for start in range(0, len(writable), self.chunk_size):
+                chunk = writable[start:start + self.chunk_size]
+                try:
+                    ids = self._write_chunk(chunk)
+                except IntegrityError:
+                    for index, attrs in chunk:
+                        results[index] = {
+                            'index': index, code_field: attrs[code_field], 'status': 'failed',
+                            'errors': {api_settings.NON_FIELD_ERRORS_KEY: ['写入失败，数据与其他数据冲突，请重试']}
+                        }
+                    continue
+                written_ids.extend(ids.values())
+                for index, attrs in chunk:
+                    code = attrs[code_field]
+                    results[index] = {
+                        'index': index, code_field: code, 'id': ids.get(code),
+                        'status': 'updated' if code in existing else 'created'
+                    }
+        finally:
+            # bulk_create 不触发 post_save，由 bulk_saved 通知缓存和索引（中途出错时已写入的块同样通知）
+            if written_ids:
+                bulk_saved.send(sender=self.model, ids=written_ids)
+        return results
+
+    def _write_chunk(self, chunk):
+        model = self.model
+        code_field = self.code_field
+        # 字段组合相同的行一起写入，冲突时只更新这些字段
+        groups = {}
+        for _, attrs in chunk:
+            groups.setdefault(frozenset(attrs), []).append(attrs)
+
+        unique_fields = None
+        if connections[model.objects.db].features.supports_update_conflicts_with_target:
+            unique_fields = [code_field]
+        with transaction.atomic():
+            for fields, rows in groups.items():
+                # 写入已软删除的编码时恢复该数据
+                update_fields = {'updated_by', 'updated_at', 'is_deleted', 'deleted_at', *fields}
+                update_fields.discard(code_field)
+                update_fields.difference_update(self.create_only_fields)
+                objs = [
+                    model(**attrs, created_by=self.user, updated_by=self.user, is_deleted=False, deleted_at=None)
+                    for attrs in rows
+                ]
+                model.objects.bulk_create(objs, update_conflicts=True, update_fields=sorted(update_fields),
+                                          unique_fields=unique_fields)
+        codes = [attrs[code_field] for _, attrs in chunk]
+        return dict(model.objects.filter(**{f'{code_field}__in': codes}).values_list(code_field, 'pk'))
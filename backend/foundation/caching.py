@@ -0,0 +1,81 @@
+"""
+接口响应缓存
+
+缓存渲染后的响应内容，缓存项记录其依赖模型的版本号（标签）；
+模型保存、删除、多对多关系变化时在事务提交后递增该模型的版本号，
+读取时版本号不一致即视为失效，无需逐个删除缓存键。版本号同时用于生成条件 GET 的 ETag（见 ConditionalGetMixin）。
+"""
+import time
+
+from django.core.cache import cache
+
+MODEL_VERSION_KEY = 'resp:version:{label}'
+RESPONSE_CACHE_KEY = 'resp:{label}:{action}:{digest}'
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def get_model_version_key(model):
+    return MODEL_VERSION_KEY.format(label=model._meta.label_lower)
+
+
+def init_model_version(key):
+    """
+    初始化缺失的版本号（首次使用或缓存被清空），返回当前值
+
+    以当前时间（微秒）为初值，缓存被清空后不会与此前的版本号重复，客户端保存的旧 ETag 不会被误判为未变化。
+    """
+    initial = time.time_ns() // 1000
+    cache.add(key, initial, timeout=None)
+    return cache.get(key, initial)
+
+
+def bump_model_version(model):
+    """递增模型版本号，使依赖该模型的响应缓存失效"""
+    key = get_model_version_key(model)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        init_model_version(key)
+        return cache.incr(key)
+
+
+def read_model_versions(version_keys, values):
+    """从 get_many 的结果中取出版本号，缺失的初始化"""
+    versions = []
+    for version_key in version_keys:
+        version = values.get(version_key)
+        if version is None:
+            version = init_model_version(version_key)
+        versions.append(version)
+    return versions
+
+
+def get_model_versions(models):
+    """读取模型的版本号列表"""
+    version_keys = [get_model_version_key(model) for model in models]
+    return read_model_versions(version_keys, cache.get_many(version_keys))
+
+
+def get_cached_response(key, models):
+    """
+    读取响应缓存，一次 get_many 同时取回缓存项和依赖模型的版本号
+
+    返回 (缓存项或 None, 当前版本号列表)，版本号列表用于写入缓存
+    """
+    version_keys = [get_model_version_key(model) for model in models]
+    values = cache.get_many([key, *version_keys])
+    versions = read_model_versions(version_keys, values)
+
+    entry = values.get(key)
+    if entry and entry.get('versions') == versions:
+        return entry, versions
+    return None, versions
+
+
+def set_cached_response(key, versions, content, content_type, headers=None):
+    cache.set(key, {
+        'versions': versions,
+        'content': content,
+        'content_type': content_type,
+        'headers': headers or {},
+    }, RESPONSE_CACHE_TIMEOUT)
@@ -0,0 +1,417 @@
+"""
+合成数据集生成
+
+按参数生成可复现（同一随机种子得到相同数据）的压测/基准数据：部门树、用户及角色、物料分类树、
+物料、客户、供应商、仓库。全部使用 bulk_create 分批写入并显式分配主键，
+树形数据在内存中直接计算 MPTT 左右值后批量插入，不逐条维护树结构。
+"""
+import random
+import time
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .caching import bump_model_version
+from .models import Customer, Department, Permission, Role, Supplier, User
+from .pagination import invalidate_count_cache
+from .search import index_model_objects
+
+DEFAULT_BATCH_SIZE = 5000
+
+# 预设规模，命令行参数可单独覆盖
+DATASET_PRESETS = {
+    'small': {
+        'departments': 50, 'department_depth': 4, 'users': 500, 'roles': 10,
+        'categories': 100, 'category_depth': 3, 'materials': 10000,
+        'customers': 1000, 'suppliers': 1000, 'warehouses': 10,
+    },
+    'medium': {
+        'departments': 500, 'department_depth': 5, 'users': 5000, 'roles': 20,
+        'categories': 1000, 'category_depth': 4, 'materials': 100000,
+        'customers': 10000, 'suppliers': 10000, 'warehouses': 20,
+    },
+    'large': {
+        'departments': 2000, 'department_depth': 6, 'users': 50000, 'roles': 50,
+        'categories': 5000, 'category_depth': 5, 'materials': 1000000,
+        'customers': 100000, 'suppliers': 100000, 'warehouses': 50,
+    },
+}
+
+CITIES = ['北京', '上海', '广州', '深圳', '杭州', '苏州', '南京', '成都', '重庆', '武汉', '西安', '天津', '青岛', '宁波', '厦门']
+COMPANY_WORDS = ['华星', '恒通', '宏达', '鑫源', '瑞丰', '中科', '金泰', '永盛', '东方', '天成', '博远', '嘉和', '新锐', '联创']
+INDUSTRIES = ['机械', '电子', '化工', '物流', '贸易', '科技', '材料', '制造', '设备', '包装']
+DEPARTMENT_WORDS = ['研发', '销售', '生产', '采购', '质量', '财务', '人事', '行政', '仓储', '物流', '市场', '客服']
+MATERIAL_WORDS = ['螺栓', '螺母', '垫片', '轴承', '齿轮', '弹簧', '电阻', '电容', '芯片', '板材', '管件', '阀门', '电机', '传感器']
+MATERIAL_ADJECTIVES = ['不锈钢', '碳钢', '铝合金', '黄铜', '尼龙', '高强度', '耐高温', '防腐', '精密', '微型']
+UNITS = ['个', '件', '套', '米', '千克', '箱']
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚'
+
+
+def plan_tree(rng, total, depth, roots=1):
+    """
+    规划树形结构：各层节点数按固定分叉系数增长，节点随机挂到上一层节点下
+
+    返回按层排列的 [(上级序号或 None, 层级), ...]，上级序号总小于自身序号
+    """
+    if total <= 0:
+        return []
+    roots = min(roots, total)
+    depth = max(depth, 1)
+    # 二分查找分叉系数，使 depth 层的节点总数不少于 total
+    low, high = 1.0, float(total)
+    for _ in range(60):
+        branch = (low + high) / 2
+        if roots * sum(branch ** level for level in range(depth)) >= total:
+            high = branch
+        else:
+            low = branch
+    branch = high
+
+    nodes = [(None, 0)] * roots
+    previous = list(range(roots))
+    for level in range(1, depth):
+        remaining = total - len(nodes)
+        if remaining <= 0:
+            break
+        size = remaining if level == depth - 1 else min(remaining, max(1, round(roots * branch ** level)))
+        start = len(nodes)
+        nodes.extend((rng.choice(previous), level) for _ in range(size))
+        previous = list(range(start, start + size))
+    return nodes
+
+
+def compute_tree_fields(nodes, first_tree_id):
+    """
+    按上级关系计算 MPTT 字段，每个根节点一棵树
+
+    同级节点按序号排序，与按 sort_order 插入的顺序一致。返回 [(tree_id, lft, rght), ...]
+    """
+    children = [[] for _ in nodes]
+    roots = []
+    for index, (parent, _level) in enumerate(nodes):
+        if parent is None:
+            roots.append(index)
+        else:
+            children[parent].append(index)
+
+    fields = [None] * len(nodes)
+    for tree_offset, root in enumerate(roots):
+        tree_id = first_tree_id + tree_offset
+        counter = 1
+        lefts = {}
+        # 非递归深度优先遍历，(节点, 是否已展开)
+        stack = [(root, False)]
+        while stack:
+            index, expanded = stack.pop()
+            if expanded:
+                fields[index] = (tree_id, lefts.pop(index), counter)
+                counter += 1
+                continue
+            lefts[index] = counter
+            counter += 1
+            stack.append((index, True))
+            stack.extend((child, False) for child in reversed(children[index]))
+    return fields
+
+
+def get_next_pk(model):
+    return (model.objects.aggregate(value=Max('pk'))['value'] or 0) + 1
+
+
+def get_next_tree_id(model):
+    return (model.objects.aggregate(value=Max(model._mptt_meta.tree_id_attr))['value'] or 0) + 1
+
+
+def reset_sequences(models):
+    """显式写入主键后同步自增序列（PostgreSQL 需要，MySQL/SQLite 返回空语句）"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+class DatasetGenerator:
+    """
+    合成数据集生成器
+
+    编码统一带 prefix 前缀以便与业务数据区分；同一 seed 和参数生成的数据相同（主键、时间除外）。
+    """
+
+    def __init__(self, prefix='SYN', seed=42, batch_size=DEFAULT_BATCH_SIZE, password='synthetic123',
+                 index=True, log=None):
+        self.prefix = prefix
+        self.seed = seed
+        self.batch_size = batch_size
+        self.password = password
+        self.index = index
+        self.log = log or (lambda message: None)
+        self.department_ids = []
+        self.category_ids = []
+
+    def rng(self, name):
+        """每类数据使用独立的随机序列，调整某类数量不影响其他数据"""
+        return random.Random(f'{self.seed}:{name}')
+
+    def check_existing(self):
+        """返回已存在相同前缀数据的模型名称"""
+        Material = apps.get_model('inventory', 'Material')
+        checks = [
+            (Department, {'code__startswith': self.prefix}),
+            (User, {'username__startswith': self.prefix.lower()}),
+            (Role, {'code__startswith': self.prefix.lower()}),
+            (Material, {'material_code__startswith': self.prefix}),
+            (Customer, {'customer_code__startswith': self.prefix}),
+            (Supplier, {'supplier_code__startswith': self.prefix}),
+        ]
+        return [model._meta.verbose_name for model, lookup in checks if model.objects.filter(**lookup).exists()]
+
+    def generate(self, departments=0, department_depth=4, users=0, roles=0, categories=0, category_depth=3,
+                 materials=0, customers=0, suppliers=0, warehouses=0):
+        """按数量生成各类数据，返回 {模型名称: 条数}"""
+        result = {}
+        steps = [
+            ('部门', departments, lambda: self.generate_departments(departments, department_depth)),
+            ('角色', roles, lambda: self.generate_roles(roles)),
+            ('用户', users, lambda: self.generate_users(users)),
+            ('物料分类', categories, lambda: self.generate_categories(categories, category_depth)),
+            ('物料', materials, lambda: self.generate_materials(materials)),
+            ('客户', customers, lambda: self.generate_customers(customers)),
+            ('供应商', suppliers, lambda: self.generate_suppliers(suppliers)),
+            ('仓库', warehouses, lambda: self.generate_warehouses(warehouses)),
+        ]
+        for label, count, step in steps:
+            if not count:
+                continue
+            start = time.perf_counter()
+            result[label] = step()
+            elapsed = time.perf_counter() - start
+            self.log(f'{label}: {result[label]}条, 耗时{elapsed:.1f}秒, {result[label] / max(elapsed, 1e-6):.0f}条/秒')
+        return result
+
+    def bulk_insert(self, model, rows):
+        """
+        分批写入，rows 为生成模型实例的迭代器
+
+        每批一个事务；写入后维护搜索索引，结束后使列表总数和响应缓存失效。
+        """
+        count = 0
+        batch = []
+        for obj in rows:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                count += self._write_batch(model, batch)
+                batch = []
+        if batch:
+            count += self._write_batch(model, batch)
+        reset_sequences([model])
+        invalidate_count_cache(model)
+        bump_model_version(model)
+        return count
+
+    def _write_batch(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            if self.index:
+                index_model_objects(model, [obj.pk for obj in batch])
+        return len(batch)
+
+    def build_tree(self, model, total, depth, roots, make_node):
+        """
+        生成树形数据，make_node(序号, 层级, 同级序号) 返回未保存的实例（不含上级和 MPTT 字段）
+
+        按层插入保证上级先于下级写入，返回按序号排列的主键列表
+        """
+        nodes = plan_tree(self.rng(model._meta.label), total, depth, roots)
+        fields = compute_tree_fields(nodes, get_next_tree_id(model))
+        first_pk = get_next_pk(model)
+        opts = model._mptt_meta
+        sibling_counts = {}
+
+        def rows():
+            for index, ((parent, level), (tree_id, left, right)) in enumerate(zip(nodes, fields)):
+                sibling = sibling_counts.get(parent, 0) + 1
+                sibling_counts[parent] = sibling
+                obj = make_node(index, level, sibling)
+                obj.pk = first_pk + index
+                setattr(obj, opts.parent_attr + '_id', None if parent is None else first_pk + parent)
+                setattr(obj, opts.tree_id_attr, tree_id)
+                setattr(obj, opts.left_attr, left)
+                setattr(obj, opts.right_attr, right)
+                setattr(obj, opts.level_attr, level)
+                yield obj
+
+        self.bulk_insert(model, rows())
+        return list(range(first_pk, first_pk + len(nodes)))
+
+    def generate_departments(self, total, depth):
+        rng = self.rng('department-names')
+
+        def make_node(index, level, sibling):
+            name = f'{rng.choice(CITIES)}{rng.choice(DEPARTMENT_WORDS)}{"中心" if level < 2 else "部"}{index}'
+            return Department(name=name, code=f'{self.prefix}D{index:06d}', sort_order=sibling)
+
+        self.department_ids = self.build_tree(Department, total, depth, 1, make_node)
+        return len(self.department_ids)
+
+    def generate_categories(self, total, depth):
+        MaterialCategory = apps.get_model('inventory', 'MaterialCategory')
+        rng = self.rng('category-names')
+
+        def make_node(index, level, sibling):
+            word = rng.choice(MATERIAL_WORDS if level else INDUSTRIES)
+            return MaterialCategory(
+                category_code=f'{self.prefix}MC{index:06d}', category_name=f'{word}类{index}', sort_order=sibling
+            )
+
+        roots = min(10, total)
+        self.category_ids = self.build_tree(MaterialCategory, total, depth, roots, make_node)
+        return len(self.category_ids)
+
+    def generate_roles(self, total):
+        rng = self.rng('roles')
+        permission_ids = list(Permission.objects.order_by('pk').values_list('pk', flat=True))
+        Role.objects.bulk_create([
+            Role(name=f'{self.prefix}角色{index}', code=f'{self.prefix.lower()}_role_{index}', sort_order=index)
+            for index in range(total)
+        ])
+        roles = list(Role.objects.filter(code__startswith=f'{self.prefix.lower()}_role_').order_by('pk'))
+        if permission_ids:
+            through = Role.permissions.through
+            through.objects.bulk_create([
+                through(role_id=role.pk, permission_id=permission_id)
+                for role in roles
+                for permission_id in rng.sample(permission_ids, rng.randint(1, len(permission_ids)))
+            ], batch_size=self.batch_size)
+        invalidate_count_cache(Role)
+        bump_model_version(Role)
+        return len(roles)
+
+    def generate_users(self, total):
+        rng = self.rng('users')
+        # 哈希计算开销大，所有用户共用同一个密码哈希
+        password = make_password(self.password)
+        role_ids = list(Role.objects.filter(
+            code__startswith=f'{self.prefix.lower()}_role_'
+        ).values_list('pk', flat=True))
+        department_ids = self.department_ids or list(Department.objects.values_list('pk', flat=True))
+        first_pk = get_next_pk(User)
+        user_roles = []
+
+        def rows():
+            for index in range(total):
+                pk = first_pk + index
+                if role_ids:
+                    sampled = rng.sample(role_ids, min(len(role_ids), rng.randint(1, 3)))
+                    user_roles.extend((pk, role_id) for role_id in sampled)
+                yield User(
+                    pk=pk,
+                    username=f'{self.prefix.lower()}_user{index:07d}',
+                    employee_no=f'{self.prefix}E{index:07d}',
+                    password=password,
+                    first_name=rng.choice(GIVEN_NAMES) + rng.choice(GIVEN_NAMES),
+                    last_name=rng.choice(SURNAMES),
+                    email=f'{self.prefix.lower()}_user{index}@example.com',
+                    phone=f'1{rng.randint(3, 9)}{rng.randint(0, 999999999):09d}',
+                    department_id=rng.choice(department_ids) if department_ids else None,
+                    gender=rng.choice(['male', 'female']),
+                    status=rng.choices(['active', 'inactive', 'suspended'], weights=[90, 8, 2])[0],
+                )
+
+        count = self.bulk_insert(User, rows())
+        through = User.roles.through
+        for start in range(0, len(user_roles), self.batch_size):
+            through.objects.bulk_create([
+                through(user_id=user_id, role_id=role_id)
+                for user_id, role_id in user_roles[start:start + self.batch_size]
+            ])
+        return count
+
+    def generate_materials(self, total):
+        Material = apps.get_model('inventory', 'Material')
+        rng = self.rng('materials')
+        category_ids = self.category_ids or list(
+            apps.get_model('inventory', 'MaterialCategory').objects.values_list('pk', flat=True)
+        )
+        first_pk = get_next_pk(Material)
+
+        def rows():
+            for index in range(total):
+                word = rng.choice(MATERIAL_WORDS)
+                yield Material(
+                    pk=first_pk + index,
+                    material_code=f'{self.prefix}M{index:08d}',
+                    material_name=f'{rng.choice(MATERIAL_ADJECTIVES)}{word}',
+                    material_spec=f'{rng.choice("MDΦ")}{rng.randint(2, 64)}x{rng.randint(5, 500)}',
+                    category_id=rng.choice(category_ids) if category_ids else None,
+                    material_type=rng.choice([1, 1, 1, 2, 3]),
+                    unit=rng.choice(UNITS),
+                    price=round(rng.uniform(0.1, 5000), 2),
+                    barcode=f'2{self.seed % 100:02d}{index:010d}',
+                    status=rng.choices([1, 0], weights=[95, 5])[0],
+                )
+
+        # 新物料没有条码缓存项，此前缓存的"不存在"记录很快过期（见 inventory.barcodes）
+        return self.bulk_insert(Material, rows())
+
+    def company_name(self, rng):
+        return f'{rng.choice(CITIES)}{rng.choice(COMPANY_WORDS)}{rng.choice(INDUSTRIES)}有限公司'
+
+    def contact(self, rng):
+        return {
+            'contact_person': rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES),
+            'contact_phone': f'1{rng.randint(3, 9)}{rng.randint(0, 999999999):09d}',
+            'address': f'{rng.choice(CITIES)}市{rng.choice(COMPANY_WORDS)}路{rng.randint(1, 999)}号',
+        }
+
+    def generate_customers(self, total):
+        rng = self.rng('customers')
+        first_pk = get_next_pk(Customer)
+        return self.bulk_insert(Customer, (
+            Customer(
+                pk=first_pk + index,
+                customer_code=f'{self.prefix}C{index:07d}',
+                customer_name=self.company_name(rng),
+                customer_type=rng.choices([1, 2], weights=[80, 20])[0],
+                customer_level=rng.choice([1, 2, 2, 3]),
+                industry=rng.choice(INDUSTRIES),
+                credit_limit=rng.randint(0, 100) * 10000,
+                credit_days=rng.choice([0, 30, 60, 90]),
+                status=rng.choices([1, 0], weights=[95, 5])[0],
+                **self.contact(rng),
+            ) for index in range(total)
+        ))
+
+    def generate_suppliers(self, total):
+        rng = self.rng('suppliers')
+        first_pk = get_next_pk(Supplier)
+        return self.bulk_insert(Supplier, (
+            Supplier(
+                pk=first_pk + index,
+                supplier_code=f'{self.prefix}S{index:07d}',
+                supplier_name=self.company_name(rng),
+                supplier_type=rng.choice([1, 2, 3]),
+                supplier_level=rng.choice([1, 2, 2, 3]),
+                payment_days=rng.choice([0, 30, 60, 90]),
+                status=rng.choices([1, 0], weights=[95, 5])[0],
+                **self.contact(rng),
+            ) for index in range(total)
+        ))
+
+    def generate_warehouses(self, total):
+        Warehouse = apps.get_model('inventory', 'Warehouse')
+        rng = self.rng('warehouses')
+        first_pk = get_next_pk(Warehouse)
+        return self.bulk_insert(Warehouse, (
+            Warehouse(
+                pk=first_pk + index,
+                warehouse_code=f'{self.prefix}WH{index:04d}',
+                warehouse_name=f'{rng.choice(CITIES)}{index}号仓',
+                warehouse_type=rng.choice([1, 2, 3, 4]),
+                location=f'{rng.choice(CITIES)}市{rng.choice(COMPANY_WORDS)}工业园',
+            ) for index in range(total)
+        ))
@@ -0,0 +1,374 @@
+"""
+主数据导入
+
+逐行流式读取 CSV/XLSX，按批校验并分块写入，内存占用与文件大小无关。
+进度和错误明细写回 ImportJob，由 Celery 任务 run_import_job 执行。
+"""
+import csv
+import io
+import os
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+from .bulk import BulkUpserter
+from .models import ImportJob
+from .pagination import invalidate_count_cache
+from .permissions import BULK_MODE_OPERATIONS
+from .trees import TreeLoader
+
+BATCH_SIZE = 1000
+# ImportJob.errors 中最多保存的错误行数
+MAX_STORED_ERRORS = 1000
+
+# 导入对象配置
+# permission_prefix: 权限编码前缀，与对应视图集一致
+# references: 编码列 -> (外键字段, 关联模型, 关联模型编码字段, 列标题别名)
+IMPORT_TARGETS = {
+    'material': {
+        'serializer': 'inventory.serializers.MaterialSerializer',
+        'code_field': 'material_code',
+        'permission_prefix': 'inventory:material',
+        'references': {
+            'category_code': ('category', 'inventory.MaterialCategory', 'category_code', '分类编码'),
+        },
+    },
+    'material_category': {
+        'serializer': 'inventory.serializers.MaterialCategorySerializer',
+        'code_field': 'category_code',
+        'permission_prefix': 'inventory:category',
+        'references': {
+            'parent_code': ('parent', 'inventory.MaterialCategory', 'category_code', '上级分类编码'),
+        },
+        # 树形数据：上级编码可引用同一批次中新建的行，整批写入后统一重建树结构
+        'tree_reference': 'parent_code',
+    },
+    'customer': {
+        'serializer': 'foundation.serializers.CustomerSerializer',
+        'code_field': 'customer_code',
+        'permission_prefix': 'foundation:customer',
+        'references': {},
+    },
+    'supplier': {
+        'serializer': 'foundation.serializers.SupplierSerializer',
+        'code_field': 'supplier_code',
+        'permission_prefix': 'foundation:supplier',
+        'references': {},
+    },
+}
+
+def get_import_permission_codes(target, mode):
+    """创建导入任务需要的权限编码"""
+    prefix = IMPORT_TARGETS[target]['permission_prefix']
+    return tuple(f'{prefix}:{operation}' for operation in BULK_MODE_OPERATIONS[mode])
+
+
+def iter_csv_rows(file):
+    """逐行读取 CSV，第一行为表头"""
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield row
+
+
+def iter_xlsx_rows(file):
+    """以只读模式逐行读取 XLSX 第一个工作表，第一行为表头"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def get_row_reader(filename):
+    """根据文件扩展名选择读取方式"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return iter_csv_rows
+    if extension == '.xlsx':
+        return iter_xlsx_rows
+    raise ValueError('仅支持CSV和XLSX文件')
+
+
+class ImportRunner:
+    """执行单个导入任务"""
+
+    def __init__(self, job):
+        self.job = job
+        self.config = IMPORT_TARGETS[job.target]
+        self.serializer_class = import_string(self.config['serializer'])
+        self.code_field = self.config['code_field']
+        self.columns = None
+        self.choice_labels = {}
+        self.reference_maps = {}
+        self.errors = []
+        # 树形数据逐批写入，整个任务结束后统一重建树结构
+        self.tree_loader = TreeLoader(self.serializer_class.Meta.model) if self.config.get('tree_reference') else None
+
+    def run(self):
+        job = self.job
+        # 重新执行时从头计数
+        job.processed_rows = job.success_rows = job.failed_rows = 0
+        ImportJob.objects.filter(pk=job.pk).update(
+            status='running', started_at=timezone.now(), finished_at=None,
+            processed_rows=0, success_rows=0, failed_rows=0, errors=[]
+        )
+        try:
+            self.load_reference_maps()
+            reader = get_row_reader(job.file.name)
+            job.total_rows = self.count_rows(reader)
+            ImportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows)
+
+            batch = []
+            with job.file.open('rb') as file:
+                rows = reader(file)
+                header = next(rows, None)
+                if header is None:
+                    raise ValueError('文件为空')
+                self.columns = self.map_columns(header)
+                for line_no, values in enumerate(rows, start=2):
+                    if not any(value not in (None, '') for value in values):
+                        continue
+                    batch.append((line_no, values))
+                    if len(batch) >= BATCH_SIZE:
+                        self.process_batch(batch)
+                        batch = []
+                if batch:
+                    self.process_batch(batch)
+        except Exception as exc:
+            self.finish('failed', str(exc)[:500])
+            raise
+        finally:
+            if self.tree_loader is not None:
+                self.tree_loader.rebuild()
+        self.finish('success', '导入完成')
+
+    def finish(self, status, message):
+        ImportJob.objects.filter(pk=self.job.pk).update(
+            status=status, message=message, errors=self.errors,
+            finished_at=timezone.now()
+        )
+        invalidate_count_cache(self.serializer_class.Meta.model)
+
+    def count_rows(self, reader):
+        """预先统计数据行数用于显示进度（流式读取，不占内存）"""
+        with self.job.file.open('rb') as file:
+            return max(sum(1 for _ in reader(file)) - 1, 0)
+
+    def load_reference_maps(self):
+        """加载编码 -> ID 映射"""
+        for column, (_, model_label, code_field, _) in self.config['references'].items():
+            model = apps.get_model(model_label)
+            self.reference_maps[column] = dict(
+                model.objects.filter(is_deleted=False).values_list(code_field, 'pk')
+            )
+
+    def map_columns(self, header):
+        """表头 -> 字段名，支持字段名和中文字段名"""
+        model = self.serializer_class.Meta.model
+        aliases = {}
+        for name, field in self.serializer_class().fields.items():
+            if field.read_only:
+                continue
+            aliases[name] = name
+            if isinstance(field, serializers.ChoiceField):
+                # 支持导出文件中的显示值，如“原材料”
+                self.choice_labels[name] = {str(label): value for value, label in field.choices.items()}
+            try:
+                aliases[str(model._meta.get_field(name).verbose_name)] = name
+            except FieldDoesNotExist:
+                pass
+        for column, (_, _, _, label) in self.config['references'].items():
+            aliases[column] = column
+            aliases[label] = column
+        return [aliases.get(str(title).strip()) if title is not None else None for title in header]
+
+    def build_row(self, values, batch_codes=()):
+        """
+        将一行数据转换为序列化器输入，并解析编码引用，返回 (数据, 错误)
+
+        树形数据的上级编码在 batch_codes（本批次的编码）中时保留原编码，由 save_tree 解析
+        """
+        row = {}
+        errors = {}
+        for name, value in zip(self.columns, values):
+            if name is None:
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+            if value in (None, ''):
+                continue
+            reference = self.config['references'].get(name)
+            if reference is None:
+                labels = self.choice_labels.get(name)
+                if labels is not None:
+                    value = labels.get(str(value), value)
+                row[name] = value
+                continue
+            target_id = self.reference_maps[name].get(str(value))
+            if target_id is None and name == self.config.get('tree_reference') and str(value) in batch_codes:
+                row[name] = str(value)
+            elif target_id is None:
+                errors[name] = [f'编码"{value}"不存在']
+            else:
+                row[reference[0]] = target_id
+        return row, errors
+
+    def process_batch(self, batch):
+        rows = []
+        line_numbers = []
+        failed = 0
+        batch_codes = self.get_batch_codes(batch) if self.config.get('tree_reference') else ()
+        for line_no, values in batch:
+            row, errors = self.build_row(values, batch_codes)
+            if errors:
+                failed += 1
+                self.add_error(line_no, errors)
+                continue
+            rows.append(row)
+            line_numbers.append(line_no)
+
+        if self.config.get('tree_reference'):
+            results = self.save_tree(rows)
+        else:
+            results = BulkUpserter(
+                self.serializer_class, self.code_field,
+                user=self.job.created_by, mode=self.job.mode
+            ).save(rows)
+
+        for line_no, result in zip(line_numbers, results):
+            if result['status'] == 'failed':
+                failed += 1
+                self.add_error(line_no, result['errors'])
+
+        job = self.job
+        job.processed_rows += len(batch)
+        job.failed_rows += failed
+        job.success_rows += len(batch) - failed
+        ImportJob.objects.filter(pk=job.pk).update(
+            processed_rows=job.processed_rows,
+            success_rows=job.success_rows,
+            failed_rows=job.failed_rows,
+            errors=self.errors
+        )
+
+    def get_batch_codes(self, batch):
+        """本批次各行的编码"""
+        if self.code_field not in self.columns:
+            return set()
+        position = self.columns.index(self.code_field)
+        codes = set()
+        for _, values in batch:
+            if position < len(values) and values[position] not in (None, ''):
+                codes.add(str(values[position]).strip())
+        return codes
+
+    def save_tree(self, rows):
+        """
+        树形数据（物料分类）整批保存
+
+        逐行校验后一次写入，写入期间不维护 MPTT 左右值，任务结束后受影响的树只重建一次；
+        上级编码可引用本批次中的行（无论先后），新建节点加入编码映射供后续批次引用。
+        """
+        if self.job.mode != 'create' and self.tree_loader.pending:
+            # 修改已有节点的上级时需按左右值判断下级，先重建前面批次写入的节点
+            self.tree_loader.rebuild()
+        model = self.serializer_class.Meta.model
+        code_field = self.code_field
+        reference_column = self.config['tree_reference']
+        parent_attr = self.config['references'][reference_column][0]
+        user = self.job.created_by
+        upserter = BulkUpserter(self.serializer_class, code_field, user=user, mode=self.job.mode)
+        serializer = upserter.get_serializer(rows)
+
+        codes = [row[code_field] for row in rows if row.get(code_field) is not None]
+        existing = model.objects.in_bulk(codes, field_name=code_field) if codes else {}
+        results = [None] * len(rows)
+        nodes = {}
+        pending_parents = {}
+        for index, row in enumerate(rows):
+            parent_code = row.pop(reference_column, None)
+            try:
+                attrs = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                results[index] = {'status': 'failed', 'errors': exc.detail}
+                continue
+            code = attrs[code_field]
+            instance = existing.get(code)
+            if code in nodes:
+                results[index] = {'status': 'failed', 'errors': {code_field: ['编码在本批数据中重复']}}
+                continue
+            if instance is None and self.job.mode == 'update':
+                results[index] = {'status': 'failed', 'errors': {code_field: ['编码不存在']}}
+                continue
+            if instance is not None and self.job.mode == 'create':
+                results[index] = {'status': 'failed', 'errors': {code_field: ['编码已存在']}}
+                continue
+
+            if instance is None:
+                instance = model(**attrs, created_by=user, updated_by=user)
+            else:
+                for name, value in attrs.items():
+                    setattr(instance, name, value)
+                instance.updated_by = user
+                # 与 BulkUpserter 一致，写入已软删除的编码时恢复该数据
+                instance.is_deleted = False
+                instance.deleted_at = None
+                parent = attrs.get(parent_attr)
+                if parent is not None and (parent.pk == instance.pk or parent.is_descendant_of(instance)):
+                    results[index] = {'status': 'failed', 'errors': {parent_attr: ['上级不能是自身或其下级']}}
+                    continue
+            nodes[code] = (index, instance)
+            if parent_code is not None:
+                pending_parents[code] = parent_code
+
+        # 本批次内的上级关系（含已存在的上级），上级行校验失败或形成循环时，该行及其下级均失败
+        links = dict(pending_parents)
+        for code, (_, instance) in nodes.items():
+            parent = getattr(instance, parent_attr)
+            if code not in links and parent is not None and getattr(parent, code_field) in nodes:
+                links[code] = getattr(parent, code_field)
+        while True:
+            failed = {code for code, parent_code in pending_parents.items() if parent_code not in nodes}
+            failed.update(code for code in links if self._has_cycle(code, links))
+            if not failed:
+                break
+            for code in failed:
+                index, _ = nodes.pop(code)
+                links.pop(code, None)
+                pending_parents.pop(code, None)
+                results[index] = {'status': 'failed', 'errors': {reference_column: ['上级编码不存在或存在循环引用']}}
+            # 已存在的上级即使本批次的修改失败，下级仍可引用
+            links = {code: parent_code for code, parent_code in links.items()
+                     if parent_code in nodes or code in pending_parents}
+        for code, parent_code in pending_parents.items():
+            setattr(nodes[code][1], parent_attr, nodes[parent_code][1])
+
+        created = {code for code, (_, instance) in nodes.items() if instance.pk is None}
+        self.tree_loader.save([instance for _, instance in nodes.values()])
+        code_map = self.reference_maps[reference_column]
+        for code, (index, instance) in nodes.items():
+            code_map[code] = instance.pk
+            results[index] = {'status': 'created' if code in created else 'updated'}
+        return results
+
+    @staticmethod
+    def _has_cycle(code, parents):
+        """code 是否处于上级关系的循环中（只是下级挂在循环上不算）"""
+        seen = set()
+        current = code
+        while current in parents and current not in seen:
+            seen.add(current)
+            current = parents[current]
+            if current == code:
+                return True
+        return False
+
+    def add_error(self, line_no, errors):
+        if len(self.errors) < MAX_STORED_ERRORS:
+            self.errors.append({'row': line_no, 'errors': errors})
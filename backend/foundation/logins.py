@@ -0,0 +1,159 @@
+"""
+登录记录延迟写入
+
+登录时只把登录事件（用户、时间、IP、客户端）追加到 Redis 列表，不在请求中更新用户表；
+Celery Beat 定时执行 flush_login_events，批量写入登录日志并更新用户的最后登录时间和IP，
+集中登录（如交接班）时避免大量请求争用 sys_user 的行锁。
+缓存不是 django_redis 或 Redis 不可用时直接写入数据库。
+整批写入因个别事件的数据出错时逐条写入，出错的事件移入死信列表，不阻塞后续批次。
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv46_address
+from django.db import InterfaceError, OperationalError, models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.ipv6 import clean_ipv6_address
+
+from .models import LoginLog, User
+
+logger = logging.getLogger(__name__)
+
+LOGIN_QUEUE_KEY = 'login:queue'
+# 无法写入的事件（原始 JSON），需人工处理
+LOGIN_DEAD_LETTER_KEY = 'login:dead'
+LOGIN_FLUSH_BATCH_SIZE = 1000
+
+
+def get_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+def is_buffer_enabled():
+    backend = settings.CACHES['default']['BACKEND']
+    return getattr(settings, 'LOGIN_BUFFER_ENABLED', True) and backend.startswith('django_redis.')
+
+
+def clean_ip_address(value):
+    """校验并规范化客户端IP，无效时返回 None（X-Forwarded-For 可由客户端任意填写）"""
+    try:
+        validate_ipv46_address(value)
+    except ValidationError:
+        return None
+    return clean_ipv6_address(value) if ':' in value else value
+
+
+def record_login(user, ip_address, user_agent='', login_at=None):
+    """记录一次登录，user 的 last_login/last_login_ip 同步修改（不保存）以便响应展示"""
+    login_at = login_at or timezone.now()
+    ip_address = clean_ip_address(ip_address or '')
+    user.last_login = login_at
+    user.last_login_ip = ip_address
+    event = {
+        'user_id': user.pk,
+        'username': user.get_username(),
+        'ip_address': ip_address,
+        'user_agent': (user_agent or '')[:300],
+        'login_at': login_at.isoformat(),
+    }
+    if is_buffer_enabled():
+        try:
+            get_redis().rpush(LOGIN_QUEUE_KEY, json.dumps(event))
+            return
+        except Exception:
+            logger.warning('登录记录写入缓冲区失败，直接写入数据库', exc_info=True)
+    # 刚通过认证的用户，无需检查是否存在
+    save_login_events([event], check_users=False)
+
+
+def save_login_events(events, check_users=True):
+    """
+    写入登录日志，并把每个用户的最后登录时间和IP更新为其最新一次登录
+
+    check_users 为 True 时跳过写入前已被删除的用户（批量写入时使用）
+    """
+    latest = {}
+    for event in events:
+        event['login_at'] = parse_datetime(event['login_at'])
+        current = latest.get(event['user_id'])
+        if current is None or event['login_at'] >= current[0]:
+            latest[event['user_id']] = (event['login_at'], event['ip_address'])
+
+    user_ids = set(latest)
+    if check_users:
+        user_ids = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+
+    LoginLog.objects.bulk_create([
+        LoginLog(
+            user_id=event['user_id'],
+            username=event['username'],
+            ip_address=event['ip_address'],
+            user_agent=event['user_agent'],
+            login_at=event['login_at'],
+        ) for event in events if event['user_id'] in user_ids
+    ], batch_size=LOGIN_FLUSH_BATCH_SIZE)
+    if user_ids:
+        # 一条 UPDATE 更新所有用户；数据库中已是更新的登录时间时不回退（登录字段变化本身不使响应缓存失效）
+        conditions = {
+            user_id: Q(pk=user_id) & (Q(last_login__isnull=True) | Q(last_login__lte=latest[user_id][0]))
+            for user_id in user_ids
+        }
+        User.objects.filter(pk__in=user_ids).update(
+            last_login=Case(
+                *[When(condition, then=Value(latest[user_id][0])) for user_id, condition in conditions.items()],
+                default=F('last_login'), output_field=models.DateTimeField()
+            ),
+            last_login_ip=Case(
+                *[When(condition, then=Value(latest[user_id][1])) for user_id, condition in conditions.items()],
+                default=F('last_login_ip'), output_field=models.GenericIPAddressField()
+            ),
+        )
+    return sum(1 for event in events if event['user_id'] in user_ids)
+
+
+def flush_login_events(batch_size=LOGIN_FLUSH_BATCH_SIZE):
+    """把缓冲区中的登录事件逐批写入数据库，返回写入的登录日志条数"""
+    if not is_buffer_enabled():
+        return 0
+    redis = get_redis()
+    total = 0
+    while True:
+        # 取出并删除一批事件（MULTI 保证不与其他执行者重复取出）
+        pipe = redis.pipeline()
+        pipe.lrange(LOGIN_QUEUE_KEY, 0, batch_size - 1)
+        pipe.ltrim(LOGIN_QUEUE_KEY, batch_size, -1)
+        values, _ = pipe.execute()
+        if not values:
+            return total
+        try:
+            with transaction.atomic():
+                total += save_login_events([json.loads(value) for value in values])
+        except (OperationalError, InterfaceError):
+            # 数据库不可用时放回队首，下次执行重试
+            redis.lpush(LOGIN_QUEUE_KEY, *reversed(values))
+            raise
+        except Exception:
+            logger.warning('登录记录批量写入失败，改为逐条写入', exc_info=True)
+            total += save_events_individually(redis, values)
+
+
+def save_events_individually(redis, values):
+    """逐条写入一批事件，数据出错的事件移入死信列表，返回写入条数"""
+    total = 0
+    for position, value in enumerate(values):
+        try:
+            with transaction.atomic():
+                total += save_login_events([json.loads(value)])
+        except (OperationalError, InterfaceError):
+            redis.lpush(LOGIN_QUEUE_KEY, *reversed(values[position:]))
+            raise
+        except Exception:
+            logger.error('登录记录无法写入，已移入死信列表: %s', value, exc_info=True)
+            redis.rpush(LOGIN_DEAD_LETTER_KEY, value)
+    return total
@@ -0,0 +1,115 @@
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from foundation.benchmark import (
+    BENCHMARK_PASSWORD, BENCHMARK_SCENARIOS, BenchmarkRunner, build_context, build_report,
+    compare_reports, get_git_revision, load_report, save_report, seed_permissions
+)
+from foundation.datasets import DATASET_PRESETS, DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = '接口基准测试：并发请求热点接口，输出耗时分位数、吞吐量和 SQL 条数并保存为 JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=list(BENCHMARK_SCENARIOS),
+                            help='只运行指定场景，可重复指定，默认全部')
+        parser.add_argument('--concurrency', type=int, default=4, help='并发客户端数')
+        parser.add_argument('--requests', type=int, default=200, help='每个场景的请求总数')
+        parser.add_argument('--warmup', type=int, default=5, help='每个客户端的预热请求数（不计入结果）')
+        parser.add_argument('--cold', action='store_true', help='每次请求前清空缓存')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+        parser.add_argument('--setup', action='store_true', help='先执行迁移并生成合成数据集（已存在则跳过）')
+        parser.add_argument('--preset', choices=list(DATASET_PRESETS), default='small', help='--setup 使用的数据规模')
+        parser.add_argument('--output', help='结果文件路径，默认 benchmark_results/<提交>-<时间>.json')
+        parser.add_argument('--compare', help='与指定的结果文件对比')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('请求数和并发数必须大于 0')
+        baseline = load_report(options['compare']) if options['compare'] else None
+
+        if options['setup']:
+            self.setup_dataset(options['preset'], options['seed'])
+
+        rng = random.Random(options['seed'])
+        context = build_context(rng, BENCHMARK_PASSWORD)
+        names = options['scenario'] or list(BENCHMARK_SCENARIOS)
+        if not context.material_ids:
+            skipped = [name for name in ('material_search', 'material_retrieve') if name in names]
+            if skipped:
+                self.stdout.write(self.style.WARNING(f'没有物料数据，跳过: {", ".join(skipped)}'))
+                names = [name for name in names if name not in skipped]
+
+        runner = BenchmarkRunner(
+            context,
+            concurrency=options['concurrency'],
+            requests=options['requests'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            seed=options['seed'],
+        )
+        results = {}
+        for name in names:
+            self.stdout.write(f'运行场景: {name}')
+            results[name] = runner.run_scenario(name)
+        self.print_results(results)
+
+        report = build_report(results, {
+            key: options[key] for key in ('concurrency', 'requests', 'warmup', 'cold', 'seed')
+        })
+        path = Path(options['output'] or self.default_output_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_report(report, path)
+        self.stdout.write(self.style.SUCCESS(f'结果已保存: {path}'))
+
+        if baseline is not None:
+            self.print_comparison(baseline, report)
+
+        # 有失败请求时结果不可信（如鉴权失败的请求耗时偏低），以非零状态退出
+        failed = [name for name, result in results.items() if result['errors']]
+        if failed:
+            raise CommandError(f'以下场景存在失败请求: {", ".join(failed)}')
+
+    def setup_dataset(self, preset, seed):
+        call_command('migrate', verbosity=0)
+        created = seed_permissions()
+        if created:
+            self.stdout.write(f'补齐权限数据 {created} 条')
+        generator = DatasetGenerator(seed=seed, log=self.stdout.write)
+        if generator.check_existing():
+            self.stdout.write('合成数据集已存在，跳过生成')
+            return
+        self.stdout.write(f'生成合成数据集: {preset}')
+        generator.generate(**DATASET_PRESETS[preset])
+
+    def default_output_path(self):
+        from django.utils import timezone
+
+        revision = get_git_revision()
+        commit = 'unknown'
+        if revision:
+            commit = revision['commit'] + ('-dirty' if revision['dirty'] else '')
+        timestamp = timezone.localtime().strftime('%Y%m%d%H%M%S')
+        return Path(settings.BASE_DIR) / 'benchmark_results' / f'{commit}-{timestamp}.json'
+
+    def print_results(self, results):
+        header = f'{"场景":<20}{"请求":>8}{"错误":>6}{"吞吐/秒":>10}{"p50":>9}{"p95":>9}{"p99":>9}{"SQL":>7}'
+        self.stdout.write(header)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<20}{result["requests"]:>8}{result["errors"]:>6}{result["throughput"]:>10}'
+                f'{result["p50_ms"]:>9}{result["p95_ms"]:>9}{result["p99_ms"]:>9}{result["queries"]:>7}'
+            )
+
+    def print_comparison(self, baseline, report):
+        commit = (baseline.get('git') or {}).get('commit', '?')
+        self.stdout.write(f'与基准 {commit} 对比:')
+        for name, field, old, new, change, worse in compare_reports(baseline, report):
+            line = f'  {name:<20}{field:<12}{old:>10} -> {new:<10}{change:+.1f}%'
+            style = self.style.ERROR if worse and abs(change) >= 10 else self.style.SUCCESS
+            self.stdout.write(style(line) if abs(change) >= 10 else line)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from foundation.search import SEARCH_TARGETS, index_objects
+
+
+class Command(BaseCommand):
+    help = '重建搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=list(SEARCH_TARGETS), help='只重建指定对象的索引')
+
+    def handle(self, *args, **options):
+        targets = [options['target']] if options['target'] else list(SEARCH_TARGETS)
+        for target in targets:
+            self.stdout.write(f'开始重建索引: {target}')
+            count = index_objects(target)
+            self.stdout.write(self.style.SUCCESS(f'索引完成: {target}, 共{count}条'))
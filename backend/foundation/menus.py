@@ -0,0 +1,83 @@
+"""
+用户菜单树缓存
+
+菜单树只取决于用户的有效权限编码集合，因此按权限集合的指纹缓存，
+拥有相同角色组合的用户共享同一份缓存；超级管理员共享一份全量菜单。
+菜单或权限数据变化时递增菜单版本号，所有缓存随之失效。
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from .models import Menu
+from .permissions import get_user_permission_codes
+from .trees import build_tree
+
+MENU_VERSION_KEY = 'menu:version'
+MENU_TREE_KEY = 'menu:tree:{fingerprint}'
+MENU_TREE_TIMEOUT = 60 * 60 * 24
+
+MENU_TREE_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'title': 'title',
+    'path': 'path',
+    'component': 'component',
+    'icon': 'icon',
+    'menu_type': 'menu_type',
+    'parent_id': 'parent_id',
+    'sort_order': 'sort_order',
+    'is_cache': 'is_cache',
+    'is_external': 'is_external',
+}
+
+
+def get_menu_version():
+    """获取当前菜单版本号"""
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_KEY, 1, timeout=None)
+        version = cache.get(MENU_VERSION_KEY, 1)
+    return version
+
+
+def bump_menu_version():
+    """递增菜单版本号，使所有菜单树缓存失效"""
+    try:
+        return cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        cache.add(MENU_VERSION_KEY, 1, timeout=None)
+        return cache.incr(MENU_VERSION_KEY)
+
+
+def get_menu_fingerprint(user):
+    """计算用户菜单的缓存指纹"""
+    if user.is_superuser:
+        return 'superuser'
+    codes = '\n'.join(sorted(get_user_permission_codes(user)))
+    return hashlib.sha1(codes.encode('utf-8')).hexdigest()
+
+
+def build_menu_tree(user):
+    """从数据库构建用户菜单树"""
+    menus = Menu.objects.filter(is_visible=True)
+    if not user.is_superuser:
+        menus = menus.filter(permission__code__in=get_user_permission_codes(user))
+    return build_tree(menus, MENU_TREE_FIELDS)
+
+
+def get_user_menu_tree(user):
+    """获取用户菜单树（优先读取缓存）"""
+    tree_key = MENU_TREE_KEY.format(fingerprint=get_menu_fingerprint(user))
+    values = cache.get_many([MENU_VERSION_KEY, tree_key])
+    version = values.get(MENU_VERSION_KEY)
+    if version is None:
+        version = get_menu_version()
+
+    entry = values.get(tree_key)
+    if entry and entry.get('version') == version:
+        return entry['tree']
+
+    menu_tree = build_menu_tree(user)
+    cache.set(tree_key, {'version': version, 'tree': menu_tree}, MENU_TREE_TIMEOUT)
+    return menu_tree
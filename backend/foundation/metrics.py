@@ -0,0 +1,244 @@
+"""
+接口性能指标
+
+MetricsMiddleware 记录每个请求的耗时、SQL 条数及耗时、缓存命中/未命中次数和响应大小，
+按 (路由, 请求方法) 汇总到 Redis 哈希中，多个工作进程共享同一份统计。
+指标以 Prometheus 文本格式导出，并提供最慢接口汇总。
+"""
+import logging
+import re
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django_redis.client import DefaultClient
+
+logger = logging.getLogger(__name__)
+
+METRICS_VIEWS_KEY = 'metrics:views'
+METRICS_VIEW_KEY = 'metrics:view:{name}'
+# 耗时直方图分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_metrics', default=None)
+_missing = object()
+
+
+class RequestMetrics:
+    """单个请求的计数"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper 回调"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+
+class MetricsRedisClient(DefaultClient):
+    """统计缓存命中次数的 django_redis 客户端（CACHES OPTIONS.CLIENT_CLASS）"""
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=_missing, version=version, client=client)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _missing:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version, client=client)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+
+def get_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+def get_route_name(request):
+    """路由模板作为指标维度，如 /api/inventory/materials/{pk}/"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'{\1}', match.route)
+    return '/' + route.replace('^', '').replace('$', '')
+
+
+def record_request(name, status_code, duration, size, metrics):
+    """累加一个请求的指标（一次 Redis 往返）"""
+    bucket = next((str(le) for le in LATENCY_BUCKETS if duration <= le), '+Inf')
+    key = METRICS_VIEW_KEY.format(name=name)
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.sadd(METRICS_VIEWS_KEY, name)
+    pipe.hincrby(key, 'count', 1)
+    pipe.hincrby(key, f'status:{status_code}', 1)
+    pipe.hincrby(key, f'bucket:{bucket}', 1)
+    pipe.hincrbyfloat(key, 'latency_sum', duration)
+    pipe.hincrby(key, 'sql_count', metrics.sql_count)
+    pipe.hincrbyfloat(key, 'sql_time', metrics.sql_time)
+    pipe.hincrby(key, 'cache_hits', metrics.cache_hits)
+    pipe.hincrby(key, 'cache_misses', metrics.cache_misses)
+    pipe.hincrby(key, 'response_bytes', size)
+    pipe.execute()
+
+
+def load_metrics():
+    """读取全部接口的汇总数据，返回 {(路由, 方法): {字段: 值}}"""
+    redis = get_redis()
+    names = sorted(name.decode() for name in redis.smembers(METRICS_VIEWS_KEY))
+    pipe = redis.pipeline(transaction=False)
+    for name in names:
+        pipe.hgetall(METRICS_VIEW_KEY.format(name=name))
+    result = {}
+    for name, values in zip(names, pipe.execute()):
+        method, _, route = name.partition(' ')
+        result[(route, method)] = {field.decode(): float(value) for field, value in values.items()}
+    return result
+
+
+def get_cumulative_buckets(values):
+    """直方图累计计数 [(上界, 计数), ...]"""
+    buckets = []
+    total = 0
+    for le in LATENCY_BUCKETS:
+        total += values.get(f'bucket:{le}', 0)
+        buckets.append((str(le), total))
+    buckets.append(('+Inf', total + values.get('bucket:+Inf', 0)))
+    return buckets
+
+
+def estimate_quantile(values, quantile):
+    """按直方图估算分位耗时（取所在分桶上界）"""
+    count = values.get('count', 0)
+    if not count:
+        return None
+    for le, total in get_cumulative_buckets(values):
+        if total >= count * quantile:
+            return float(le) if le != '+Inf' else None
+    return None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(data):
+    """Prometheus 文本格式"""
+    families = [
+        ('erp_http_requests_total', 'counter', '请求总数'),
+        ('erp_http_request_duration_seconds', 'histogram', '请求耗时'),
+        ('erp_db_queries_total', 'counter', 'SQL 条数'),
+        ('erp_db_query_duration_seconds_total', 'counter', 'SQL 总耗时'),
+        ('erp_cache_hits_total', 'counter', '缓存命中次数'),
+        ('erp_cache_misses_total', 'counter', '缓存未命中次数'),
+        ('erp_http_response_size_bytes_total', 'counter', '响应字节数'),
+    ]
+    simple = {
+        'erp_db_queries_total': 'sql_count',
+        'erp_db_query_duration_seconds_total': 'sql_time',
+        'erp_cache_hits_total': 'cache_hits',
+        'erp_cache_misses_total': 'cache_misses',
+        'erp_http_response_size_bytes_total': 'response_bytes',
+    }
+    lines = []
+    for metric, metric_type, help_text in families:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+        for (route, method), values in data.items():
+            labels = f'route="{_escape(route)}",method="{method}"'
+            if metric == 'erp_http_requests_total':
+                for field, value in sorted(values.items()):
+                    if field.startswith('status:'):
+                        lines.append(f'{metric}{{{labels},status="{field[7:]}"}} {value:g}')
+            elif metric == 'erp_http_request_duration_seconds':
+                for le, total in get_cumulative_buckets(values):
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {total:g}')
+                lines.append(f'{metric}_sum{{{labels}}} {values.get("latency_sum", 0):g}')
+                lines.append(f'{metric}_count{{{labels}}} {values.get("count", 0):g}')
+            else:
+                lines.append(f'{metric}{{{labels}}} {values.get(simple[metric], 0):g}')
+    return '\n'.join(lines) + '\n'
+
+
+def get_slowest_endpoints(data, limit=10, order='p95'):
+    """最慢接口汇总，按 p95 或平均耗时倒序"""
+    rows = []
+    for (route, method), values in data.items():
+        count = values.get('count', 0)
+        if not count:
+            continue
+        rows.append({
+            'route': route,
+            'method': method,
+            'count': int(count),
+            'avg_ms': round(values.get('latency_sum', 0) / count * 1000, 2),
+            'p95_ms': _to_ms(estimate_quantile(values, 0.95)),
+            'p99_ms': _to_ms(estimate_quantile(values, 0.99)),
+            'avg_queries': round(values.get('sql_count', 0) / count, 2),
+            'avg_db_ms': round(values.get('sql_time', 0) / count * 1000, 2),
+            'avg_bytes': int(values.get('response_bytes', 0) / count),
+            'cache_hits': int(values.get('cache_hits', 0)),
+            'cache_misses': int(values.get('cache_misses', 0)),
+        })
+    key = 'avg_ms' if order == 'avg' else 'p95_ms'
+    # 超出最大分桶的 p95 记为无穷大排在最前
+    rows.sort(key=lambda row: float('inf') if row[key] is None else row[key], reverse=True)
+    return rows[:limit]
+
+
+def _to_ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class MetricsMiddleware:
+    """请求指标中间件，应放在 MIDDLEWARE 首位以覆盖其余中间件的耗时"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # 跨进程汇总依赖 django_redis
+        backend = settings.CACHES['default']['BACKEND']
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True) and backend.startswith('django_redis.')
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - start
+
+        size = 0 if response.streaming else len(response.content)
+        name = f'{request.method} {get_route_name(request)}'
+        try:
+            record_request(name, response.status_code, duration, size, metrics)
+        except Exception:
+            # 指标记录失败不影响业务请求
+            logger.warning('记录接口指标失败', exc_info=True)
+        return response
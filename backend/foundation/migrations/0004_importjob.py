@@ -0,0 +1,135 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("foundation", "0003_supplier"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "target",
+                    models.CharField(
+                        choices=[
+                            ("material", "物料"),
+                            ("material_category", "物料分类"),
+                            ("customer", "客户"),
+                            ("supplier", "供应商"),
+                        ],
+                        max_length=50,
+                        verbose_name="导入对象",
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[
+                            ("create", "仅新增"),
+                            ("update", "仅更新"),
+                            ("upsert", "新增或更新"),
+                        ],
+                        default="upsert",
+                        max_length=20,
+                        verbose_name="导入模式",
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        upload_to="imports/%Y%m%d/", verbose_name="导入文件"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "等待执行"),
+                            ("running", "执行中"),
+                            ("success", "已完成"),
+                            ("failed", "执行失败"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("total_rows", models.IntegerField(default=0, verbose_name="总行数")),
+                (
+                    "processed_rows",
+                    models.IntegerField(default=0, verbose_name="已处理行数"),
+                ),
+                (
+                    "success_rows",
+                    models.IntegerField(default=0, verbose_name="成功行数"),
+                ),
+                (
+                    "failed_rows",
+                    models.IntegerField(default=0, verbose_name="失败行数"),
+                ),
+                (
+                    "errors",
+                    models.JSONField(blank=True, default=list, verbose_name="错误明细"),
+                ),
+                (
+                    "message",
+                    models.CharField(
+                        blank=True, max_length=500, verbose_name="执行信息"
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="开始时间"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="结束时间"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="import_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="创建人",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "导入任务",
+                "verbose_name_plural": "导入任务",
+                "db_table": "sys_import_job",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("foundation", "0004_importjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("target", models.CharField(max_length=30, verbose_name="索引对象")),
+                ("object_id", models.BigIntegerField(verbose_name="对象ID")),
+                ("gram", models.CharField(max_length=4, verbose_name="分词")),
+                ("weight", models.SmallIntegerField(default=1, verbose_name="权重")),
+            ],
+            options={
+                "verbose_name": "搜索索引",
+                "verbose_name_plural": "搜索索引",
+                "db_table": "sys_search_token",
+                "indexes": [
+                    models.Index(
+                        fields=["target", "gram", "object_id"],
+                        name="sys_search__target_5e1d68_idx",
+                    ),
+                    models.Index(
+                        fields=["target", "object_id"],
+                        name="sys_search__target_872ffc_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:01
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+def backfill_deleted_at(apps, schema_editor):
+    """已删除数据以最后更新时间作为删除时间"""
+    for model_name in ["customer", "supplier"]:
+        model = apps.get_model("foundation", model_name)
+        model.objects.filter(is_deleted=True, deleted_at__isnull=True).update(
+            deleted_at=models.F("updated_at")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("foundation", "0005_searchtoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model_label",
+                    models.CharField(max_length=100, verbose_name="数据类型"),
+                ),
+                ("object_id", models.BigIntegerField(verbose_name="原数据ID")),
+                (
+                    "object_repr",
+                    models.CharField(
+                        blank=True, max_length=300, verbose_name="数据描述"
+                    ),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        verbose_name="原数据",
+                    ),
+                ),
+                (
+                    "deleted_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="删除时间"
+                    ),
+                ),
+                (
+                    "archived_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="归档时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "归档数据",
+                "verbose_name_plural": "归档数据",
+                "db_table": "sys_archived_record",
+                "ordering": ["-archived_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="删除时间"),
+        ),
+        migrations.AddField(
+            model_name="supplier",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="删除时间"),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                fields=["is_deleted", "status", "created_at"],
+                name="foundation__is_dele_f478f4_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                fields=["is_deleted", "created_at"],
+                name="foundation__is_dele_68b4d6_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(
+                fields=["is_deleted", "status", "created_at"],
+                name="foundation__is_dele_eefcb5_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(
+                fields=["is_deleted", "created_at"],
+                name="foundation__is_dele_480091_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedrecord",
+            index=models.Index(
+                fields=["model_label", "object_id"],
+                name="sys_archive_model_l_aa7f14_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("foundation", "0006_soft_delete_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoginLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("username", models.CharField(max_length=150, verbose_name="用户名")),
+                (
+                    "ip_address",
+                    models.GenericIPAddressField(
+                        blank=True, null=True, verbose_name="登录IP"
+                    ),
+                ),
+                (
+                    "user_agent",
+                    models.CharField(blank=True, max_length=300, verbose_name="客户端"),
+                ),
+                ("login_at", models.DateTimeField(verbose_name="登录时间")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="login_logs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "登录日志",
+                "verbose_name_plural": "登录日志",
+                "db_table": "sys_login_log",
+                "ordering": ["-login_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "login_at"],
+                        name="sys_login_l_user_id_b7328d_idx",
+                    ),
+                    models.Index(
+                        fields=["login_at"], name="sys_login_l_login_a_09d87c_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# 建立索引时的字段权重和分词规则（与 foundation.search 一致，迁移中固定下来）
+SEARCH_TARGETS = {
+    "material": (
+        "inventory",
+        "material",
+        {"material_code": 3, "barcode": 3, "material_name": 2, "material_spec": 1},
+    ),
+    "customer": ("foundation", "customer", {"customer_code": 3, "customer_name": 2}),
+    "supplier": ("foundation", "supplier", {"supplier_code": 3, "supplier_name": 2}),
+}
+GRAM_SIZE = 2
+CHUNK_SIZE = 1000
+
+
+def make_grams(text):
+    grams = set()
+    for part in str(text or "").lower().split():
+        for i in range(len(part) - GRAM_SIZE + 1):
+            grams.add(part[i : i + GRAM_SIZE])
+    return grams
+
+
+def build_search_index(apps, schema_editor):
+    """为已有的未删除数据建立 N-gram 搜索索引，此前的数据没有索引行，搜索结果为空"""
+    SearchToken = apps.get_model("foundation", "SearchToken")
+    for target, (app_label, model_name, fields) in SEARCH_TARGETS.items():
+        model = apps.get_model(app_label, model_name)
+        SearchToken.objects.filter(target=target).delete()
+        queryset = model.objects.filter(is_deleted=False).order_by("pk")
+        last_pk = None
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(batch.values("pk", *fields)[:CHUNK_SIZE])
+            if not rows:
+                break
+            tokens = []
+            for row in rows:
+                weights = {}
+                for field, weight in fields.items():
+                    for gram in make_grams(row[field]):
+                        if weights.get(gram, 0) < weight:
+                            weights[gram] = weight
+                tokens.extend(
+                    SearchToken(
+                        target=target, object_id=row["pk"], gram=gram, weight=weight
+                    )
+                    for gram, weight in weights.items()
+                )
+            SearchToken.objects.bulk_create(tokens, batch_size=CHUNK_SIZE)
+            last_pk = rows[-1]["pk"]
+
+
+def clear_search_index(apps, schema_editor):
+    apps.get_model("foundation", "SearchToken").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("foundation", "0007_loginlog"),
+        ("inventory", "0002_soft_delete"),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, clear_search_index),
+    ]
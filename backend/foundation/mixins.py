@@ -0,0 +1,596 @@
+"""
+视图集通用混入类
+"""
+import csv
+import hashlib
+import json
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .bulk import BULK_MODES, BulkUpserter
+from .caching import RESPONSE_CACHE_KEY, get_cached_response, get_model_versions, set_cached_response
+from .filters import ObjectPermissionFilter
+from .pagination import invalidate_count_cache
+from .serializers import get_field_selection, select_fields
+
+# (序列化器类, 字段选择) -> 查询计划
+_query_plans = {}
+# 字段选择来自请求参数，限制缓存的计划数量
+MAX_QUERY_PLANS = 1000
+
+
+class QueryPlan:
+    """由序列化器推导出的查询优化计划"""
+
+    def __init__(self):
+        self.select_related = set()
+        self.prefetch_related = set()
+        self.only = {'pk'}
+        # 序列化器读取了无法静态分析的属性时不做列裁剪
+        self.prunable = True
+
+    def apply(self, queryset, extra_only=()):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(self.prefetch_related))
+        if self.prunable:
+            queryset = queryset.only(*sorted(self.only.union(extra_only)))
+        return queryset
+
+
+def _get_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _guess_relation(model, field_name):
+    """根据方法字段名推测关联关系，如 roles_info -> roles"""
+    for suffix in ('_info', '_detail', '_list'):
+        if field_name.endswith(suffix):
+            field = _get_field(model, field_name[:-len(suffix)])
+            if field is not None and field.is_relation:
+                return field
+    return None
+
+
+def _plan_source(plan, model, source, prefix, prefetching):
+    """分析点号路径形式的 source，如 created_by.username、get_status_display"""
+    parts = source.split('.')
+    for index, part in enumerate(parts):
+        is_last = index == len(parts) - 1
+        if part.startswith('get_') and part.endswith('_display'):
+            part = part[len('get_'):-len('_display')]
+        field = _get_field(model, part)
+        if field is None:
+            plan.prunable = False
+            return
+        path = prefix + part
+        if is_last:
+            if field.many_to_many or field.one_to_many:
+                plan.prefetch_related.add(path)
+            elif not prefetching:
+                plan.only.add(path)
+            return
+        if not field.is_relation or field.many_to_many or field.one_to_many:
+            plan.prunable = False
+            return
+        if prefetching:
+            plan.prefetch_related.add(path)
+        else:
+            plan.select_related.add(path)
+            plan.only.add(path)
+        model = field.related_model
+        prefix = path + '__'
+
+
+def _plan_serializer(plan, fields, model, prefix='', prefetching=False):
+    """递归分析序列化器的字段"""
+    for name, field in fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            relation = _guess_relation(model, name)
+            if relation is not None:
+                plan.prefetch_related.add(prefix + relation.name)
+            # 方法字段可能读取任意属性
+            plan.prunable = False
+            continue
+
+        source = field.source
+        if source == '*':
+            plan.prunable = False
+            continue
+
+        if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+            relation = _get_field(model, source)
+            if relation is None or not relation.is_relation:
+                plan.prunable = False
+                continue
+            path = prefix + relation.name
+            plan.prefetch_related.add(path)
+            child = getattr(field, 'child', None)
+            if isinstance(child, serializers.BaseSerializer):
+                _plan_serializer(plan, child.fields, relation.related_model, path + '__', prefetching=True)
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            relation = _get_field(model, source)
+            if relation is None or not relation.is_relation:
+                plan.prunable = False
+                continue
+            path = prefix + relation.name
+            if prefetching:
+                plan.prefetch_related.add(path)
+            else:
+                plan.select_related.add(path)
+                plan.only.add(path)
+            _plan_serializer(plan, field.fields, relation.related_model, path + '__', prefetching)
+            continue
+
+        _plan_source(plan, model, source, prefix, prefetching)
+
+
+def get_query_plan(serializer_class, only=None, exclude=None):
+    """获取序列化器（及 ?fields= / ?exclude= 字段选择）对应的查询计划"""
+    key = (serializer_class, only, exclude)
+    plan = _query_plans.get(key)
+    if plan is None:
+        plan = QueryPlan()
+        fields = select_fields(serializer_class().fields, only, exclude)
+        _plan_serializer(plan, fields, serializer_class.Meta.model)
+        if len(_query_plans) < MAX_QUERY_PLANS:
+            _query_plans[key] = plan
+    return plan
+
+
+def get_related_models(serializer_class, model):
+    """序列化器展示的关联路径及其模型，返回 [(路径, 模型), ...]"""
+    if not issubclass(serializer_class, serializers.ModelSerializer):
+        return []
+    plan = get_query_plan(serializer_class)
+    related = []
+    for path in sorted(plan.select_related | plan.prefetch_related):
+        current = model
+        for part in path.split('__'):
+            field = _get_field(current, part)
+            current = field.related_model if field is not None and field.is_relation else None
+            if current is None:
+                break
+        if current is not None:
+            related.append((path, current))
+    return related
+
+
+def get_dependent_models(view):
+    """视图集返回内容依赖的模型：查询集模型及序列化器展示的关联模型，按标签排序"""
+    model = view.get_queryset().model
+    models = {model}
+    models.update(related_model for _, related_model in get_related_models(view.get_serializer_class(), model))
+    return sorted(models, key=lambda item: item._meta.label_lower)
+
+
+class QueryOptimizationMixin:
+    """
+    根据序列化器自动优化查询集
+
+    分析序列化器字段的 source 路径和嵌套序列化器，对外键关联使用 select_related，
+    对多对多/反向关联使用 prefetch_related，并在可静态分析时用 only() 裁剪列。
+    请求带 ?fields= / ?exclude= 时只为选中的字段加载列和关联。
+    仅作用于只读动作，写操作仍加载完整对象。
+    """
+    optimize_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.optimize_actions:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, serializers.ModelSerializer):
+            return queryset
+        only, exclude = get_field_selection(self.request)
+        plan = get_query_plan(serializer_class, only, exclude)
+        return plan.apply(queryset, extra_only=self.get_cursor_fields())
+
+    def get_cursor_fields(self):
+        """游标分页从对象上读取排序字段，裁剪列时需保留"""
+        ordering = getattr(self, 'cursor_ordering', None) or getattr(self.pagination_class, 'cursor_ordering', ())
+        return {field.lstrip('-') for field in ordering}
+
+
+class NotModified(Exception):
+    """条件请求命中，由 ConditionalGetMixin 转换为 304 响应"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    条件 GET
+
+    列表、详情和树形接口根据依赖模型（查询集模型及序列化器展示的关联模型）的版本号、请求路径、查询参数、
+    当前用户及其可访问的对象范围生成 ETag。模型数据变化时由 signals 递增版本号（与 ResponseCacheMixin 共用），
+    生成 ETag 只需一次缓存读取、不查询数据库；请求携带 If-None-Match 且数据未变化时直接返回 304，
+    跳过分页查询和序列化。
+    """
+    conditional_actions = ('list', 'retrieve', 'tree')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_etag = None
+        if request.method not in ('GET', 'HEAD') or self.action not in self.conditional_actions:
+            return
+        self.conditional_etag = self.get_conditional_etag()
+        response = get_conditional_response(request._request, etag=self.conditional_etag)
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'conditional_etag', None)
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+            # 浏览器每次使用缓存前都须重新校验
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def get_conditional_etag(self):
+        """由依赖模型的版本号生成 ETag"""
+        request = self.request
+        payload = [
+            request.path, self.action, request.user.pk,
+            sorted(request.query_params.lists()),
+            get_model_versions(get_dependent_models(self)),
+        ]
+        if getattr(self, 'object_permission', None) is not None:
+            payload.append(ObjectPermissionFilter.get_permitted_ids(request, self, self.get_queryset().model))
+        return 'W/"%s"' % hashlib.md5(json.dumps(payload).encode('utf-8')).hexdigest()
+
+
+class CachedResponse(Exception):
+    """响应缓存命中，由 ResponseCacheMixin 直接返回缓存内容"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+class ResponseCacheMixin:
+    """
+    响应缓存
+
+    列表、详情和树形接口的渲染结果按请求参数缓存，缓存项以查询集模型及序列化器展示的关联模型
+    的版本号为标签，这些模型变化时（见 signals）缓存自动失效；命中时不访问数据库。
+    与 ConditionalGetMixin 同时使用时应排在其后，缓存项一并保存 ETag，命中时可直接返回 304。
+    内容因用户而异的视图集设置 response_cache_per_user = True，按用户分别缓存；
+    声明了对象级权限（object_permission）的视图集按用户可访问的对象范围缓存，范围相同的用户共用缓存。
+    """
+    response_cache_actions = ('list', 'retrieve', 'tree')
+    response_cache_per_user = False
+    # 随内容一起缓存的响应头
+    response_cache_headers = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.response_cache = None
+        if request.method != 'GET' or self.action not in self.response_cache_actions:
+            return
+        key = self.get_response_cache_key(request)
+        entry, versions = get_cached_response(key, self.get_response_cache_models())
+        if entry is None:
+            self.response_cache = (key, versions)
+            return
+
+        headers = entry['headers']
+        last_modified = parse_http_date_safe(headers['Last-Modified']) if 'Last-Modified' in headers else None
+        response = get_conditional_response(
+            request._request, etag=headers.get('ETag'), last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        for header, value in headers.items():
+            response[header] = value
+        raise CachedResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CachedResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        response_cache = getattr(self, 'response_cache', None)
+        if response_cache is not None and response.status_code == 200 and isinstance(response, Response):
+            key, versions = response_cache
+
+            def store(rendered):
+                headers = {
+                    header: rendered[header] for header in self.response_cache_headers if rendered.has_header(header)
+                }
+                set_cached_response(key, versions, rendered.content, rendered['Content-Type'], headers)
+
+            response.add_post_render_callback(store)
+        return response
+
+    def get_response_cache_models(self):
+        """缓存依赖的模型：查询集模型及序列化器展示的关联模型"""
+        return get_dependent_models(self)
+
+    def get_response_cache_key(self, request):
+        payload = [
+            request.get_host(), request.path, request.accepted_renderer.format,
+            sorted(request.query_params.lists()),
+        ]
+        if self.response_cache_per_user:
+            payload.append(request.user.pk)
+        if getattr(self, 'object_permission', None) is not None:
+            payload.append(ObjectPermissionFilter.get_permitted_ids(request, self, self.get_queryset().model))
+        digest = hashlib.md5(json.dumps(payload).encode('utf-8')).hexdigest()
+        return RESPONSE_CACHE_KEY.format(
+            label=self.get_queryset().model._meta.label_lower, action=self.action, digest=digest
+        )
+
+
+class BulkUpsertMixin:
+    """
+    批量新增/更新/插入或更新
+
+    POST <list>/bulk/ ，请求体为对象数组（或 {"mode": ..., "items": [...]}），
+    mode 取 create / update / upsert（默认），写入逻辑见 BulkUpserter。
+    """
+    bulk_code_field = None
+    bulk_max_rows = 10000
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """批量保存"""
+        payload = request.data
+        mode = 'upsert'
+        if isinstance(payload, dict):
+            mode = payload.get('mode', mode)
+            payload = payload.get('items')
+        if not isinstance(payload, list) or not payload:
+            return Response({
+                'code': 400,
+                'message': '请求数据必须为非空数组',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if mode not in BULK_MODES:
+            return Response({
+                'code': 400,
+                'message': f'不支持的模式: {mode}',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(payload) > self.bulk_max_rows:
+            return Response({
+                'code': 400,
+                'message': f'单次最多提交{self.bulk_max_rows}条数据',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer_class = self.get_serializer_class()
+        upserter = BulkUpserter(
+            serializer_class, self.bulk_code_field, user=request.user,
+            mode=mode, context=self.get_serializer_context()
+        )
+        results = upserter.save(payload)
+        summary = {'created': 0, 'updated': 0, 'failed': 0}
+        for result in results:
+            summary[result['status']] += 1
+        if summary['created']:
+            invalidate_count_cache(serializer_class.Meta.model)
+
+        return Response({
+            'code': 200,
+            'message': '批量保存完成',
+            'data': dict(summary, results=results)
+        })
+
+
+class SoftDeleteMixin:
+    """
+    回收站
+
+    GET <list>/deleted/ 查看已删除数据，POST <pk>/restore/ 恢复。
+    软删除超过保留期限的数据会被归档（见 foundation.archive），不再出现在回收站中。
+    """
+
+    def get_deleted_queryset(self):
+        return self.get_queryset().model.objects.deleted()
+
+    def check_restore(self, instance):
+        """恢复前检查，返回错误信息或 None"""
+        return None
+
+    @action(detail=False, methods=['get'])
+    def deleted(self, request, *args, **kwargs):
+        """已删除数据列表"""
+        queryset = self.filter_queryset(self.get_deleted_queryset().order_by('-deleted_at', '-pk'))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            data = self.get_serializer(queryset, many=True).data
+        else:
+            results = self.get_serializer(page, many=True).data
+            paginator = self.paginator
+            if hasattr(paginator, 'get_paginated_data'):
+                data = paginator.get_paginated_data(results)
+            else:
+                data = {
+                    'count': paginator.page.paginator.count,
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                    'results': results
+                }
+        return Response({
+            'code': 200,
+            'message': '获取成功',
+            'data': data
+        })
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, *args, **kwargs):
+        """恢复已删除数据"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        # 经过滤器以应用对象级权限
+        instance = self.filter_queryset(self.get_deleted_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).first()
+        if instance is None:
+            return Response({
+                'code': 404,
+                'message': '数据不存在或已归档',
+                'data': None
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        error = self.check_restore(instance)
+        if error:
+            return Response({
+                'code': 400,
+                'message': error,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        instance.restore(request.user)
+        invalidate_count_cache(type(instance))
+        return Response({
+            'code': 200,
+            'message': '恢复成功',
+            'data': self.get_serializer(instance).data
+        })
+
+
+class Echo:
+    """csv.writer 的伪文件对象，write 直接返回写入内容"""
+
+    def write(self, value):
+        return value
+
+
+class ExportMixin:
+    """
+    列表数据导出
+
+    GET <list>/export/?file_format=csv|xlsx ，沿用列表接口的过滤条件。
+    按主键分批读取 values_list，以 StreamingHttpResponse 流式输出，内存占用与行数无关。
+    视图集通过 export_fields 声明导出列：[(查询路径, 列标题), ...]，
+    带 choices 的字段自动输出显示值。
+    """
+    export_fields = ()
+    export_chunk_size = 2000
+    export_formats = ('csv', 'xlsx')
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """导出数据"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in self.export_formats:
+            return Response({
+                'code': 400,
+                'message': f'不支持的导出格式: {file_format}',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        headers = [header for _, header in self.export_fields]
+        rows = self.iter_export_rows(queryset)
+        if file_format == 'xlsx':
+            content = self.stream_xlsx(headers, rows)
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            content = self.stream_csv(headers, rows)
+            content_type = 'text/csv; charset=utf-8'
+
+        filename = f'{queryset.model._meta.model_name}_{timezone.localtime():%Y%m%d%H%M%S}.{file_format}'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_export_formatters(self, model):
+        """为每一列生成取值格式化函数"""
+        formatters = []
+        for lookup, _ in self.export_fields:
+            field = None
+            current = model
+            for part in lookup.split('__'):
+                field = _get_field(current, part)
+                if field is None:
+                    break
+                current = field.related_model if field.is_relation else current
+            choices = dict(field.flatchoices) if field is not None and field.choices else None
+            formatters.append(choices)
+        return formatters
+
+    def iter_export_rows(self, queryset):
+        """按主键分批读取，避免一次性加载全部结果"""
+        lookups = [lookup for lookup, _ in self.export_fields]
+        formatters = self.get_export_formatters(queryset.model)
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(batch.values_list('pk', *lookups)[:self.export_chunk_size])
+            if not rows:
+                return
+            for row in rows:
+                yield [self.format_export_value(value, choices)
+                       for value, choices in zip(row[1:], formatters)]
+            last_pk = rows[-1][0]
+
+    @staticmethod
+    def format_export_value(value, choices=None):
+        if value is None:
+            return ''
+        if choices is not None:
+            return str(choices.get(value, value))
+        if isinstance(value, datetime):
+            if timezone.is_aware(value):
+                value = timezone.localtime(value)
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def stream_csv(headers, rows):
+        writer = csv.writer(Echo())
+        # BOM 便于 Excel 识别 UTF-8
+        yield '\ufeff' + writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    @staticmethod
+    def stream_xlsx(headers, rows):
+        from openpyxl import Workbook
+
+        # write_only 模式逐行写入临时文件，完成后分块输出
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(headers)
+        for row in rows:
+            sheet.append(row)
+        with tempfile.TemporaryFile() as file:
+            workbook.save(file)
+            file.seek(0)
+            while True:
+                chunk = file.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
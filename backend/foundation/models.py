@@ -1,6 +1,70 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from mptt.managers import TreeManager
 from mptt.models import MPTTModel, TreeForeignKey
+from mptt.querysets import TreeQuerySet
+
+
+class SoftDeleteQuerySetMixin:
+    """软删除查询集方法"""
+
+    def alive(self):
+        """未删除的数据"""
+        return self.filter(is_deleted=False)
+
+    def deleted(self):
+        """已删除（回收站中）的数据"""
+        return self.filter(is_deleted=True)
+
+
+class SoftDeleteQuerySet(SoftDeleteQuerySetMixin, models.QuerySet):
+    pass
+
+
+class SoftDeleteTreeQuerySet(SoftDeleteQuerySetMixin, TreeQuerySet):
+    pass
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """
+    软删除管理器
+
+    默认不过滤已删除数据（编码唯一性校验、批量写入需要看到全部数据），
+    通过 alive() / deleted() 区分。
+    """
+
+
+class SoftDeleteTreeManager(TreeManager.from_queryset(SoftDeleteTreeQuerySet)):
+    """MPTT 模型的软删除管理器"""
+
+
+class SoftDeleteModel(models.Model):
+    """软删除模型基类"""
+    is_deleted = models.BooleanField('是否删除', default=False)
+    deleted_at = models.DateTimeField('删除时间', null=True, blank=True)
+
+    objects = SoftDeleteManager()
+
+    class Meta:
+        abstract = True
+
+    def soft_delete(self, user=None):
+        """软删除，保存时触发信号以维护缓存和索引"""
+        self.is_deleted = True
+        self.deleted_at = timezone.now()
+        if user is not None:
+            self.updated_by = user
+        self.save()
+
+    def restore(self, user=None):
+        """从回收站恢复"""
+        self.is_deleted = False
+        self.deleted_at = None
+        if user is not None:
+            self.updated_by = user
+        self.save()
 
 
 class Department(MPTTModel):
@@ -205,7 +269,7 @@ class Menu(MPTTModel):
         return self.title
 
 
-class Customer(models.Model):
+class Customer(SoftDeleteModel):
     """客户模型"""
     CUSTOMER_TYPE_CHOICES = [
         (1, '企业'),
@@ -254,7 +318,6 @@ class Customer(models.Model):
         related_name='updated_customers',
         verbose_name='更新人'
     )
-    is_deleted = models.BooleanField('是否删除', default=False)
 
     class Meta:
         db_table = 'foundation_customer'
@@ -264,13 +327,15 @@ class Customer(models.Model):
         indexes = [
             models.Index(fields=['customer_code']),
             models.Index(fields=['customer_name']),
+            models.Index(fields=['is_deleted', 'status', 'created_at']),
+            models.Index(fields=['is_deleted', 'created_at']),
         ]
 
     def __str__(self):
         return f"{self.customer_code} - {self.customer_name}"
 
 
-class Supplier(models.Model):
+class Supplier(SoftDeleteModel):
     """供应商模型"""
     SUPPLIER_TYPE_CHOICES = [
         (1, '生产商'),
@@ -318,7 +383,6 @@ class Supplier(models.Model):
         related_name='updated_suppliers',
         verbose_name='更新人'
     )
-    is_deleted = models.BooleanField('是否删除', default=False)
 
     class Meta:
         db_table = 'foundation_supplier'
@@ -328,7 +392,133 @@ class Supplier(models.Model):
         indexes = [
             models.Index(fields=['supplier_code']),
             models.Index(fields=['supplier_name']),
+            models.Index(fields=['is_deleted', 'status', 'created_at']),
+            models.Index(fields=['is_deleted', 'created_at']),
         ]
 
     def __str__(self):
         return f"{self.supplier_code} - {self.supplier_name}"
+
+
+class ImportJob(models.Model):
+    """数据导入任务模型"""
+    TARGET_CHOICES = [
+        ('material', '物料'),
+        ('material_category', '物料分类'),
+        ('customer', '客户'),
+        ('supplier', '供应商'),
+    ]
+
+    MODE_CHOICES = [
+        ('create', '仅新增'),
+        ('update', '仅更新'),
+        ('upsert', '新增或更新'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', '等待执行'),
+        ('running', '执行中'),
+        ('success', '已完成'),
+        ('failed', '执行失败'),
+    ]
+
+    target = models.CharField('导入对象', max_length=50, choices=TARGET_CHOICES)
+    mode = models.CharField('导入模式', max_length=20, choices=MODE_CHOICES, default='upsert')
+    file = models.FileField('导入文件', upload_to='imports/%Y%m%d/')
+    status = models.CharField('状态', max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.IntegerField('总行数', default=0)
+    processed_rows = models.IntegerField('已处理行数', default=0)
+    success_rows = models.IntegerField('成功行数', default=0)
+    failed_rows = models.IntegerField('失败行数', default=0)
+    errors = models.JSONField('错误明细', default=list, blank=True)
+    message = models.CharField('执行信息', max_length=500, blank=True)
+    started_at = models.DateTimeField('开始时间', null=True, blank=True)
+    finished_at = models.DateTimeField('结束时间', null=True, blank=True)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs',
+        verbose_name='创建人'
+    )
+
+    class Meta:
+        db_table = 'sys_import_job'
+        verbose_name = '导入任务'
+        verbose_name_plural = '导入任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_target_display()} - {self.get_status_display()}"
+
+
+class SearchToken(models.Model):
+    """搜索索引模型 - 名称、编码等字段的二元分词倒排索引"""
+    target = models.CharField('索引对象', max_length=30)
+    object_id = models.BigIntegerField('对象ID')
+    gram = models.CharField('分词', max_length=4)
+    weight = models.SmallIntegerField('权重', default=1)
+
+    class Meta:
+        db_table = 'sys_search_token'
+        verbose_name = '搜索索引'
+        verbose_name_plural = '搜索索引'
+        indexes = [
+            models.Index(fields=['target', 'gram', 'object_id']),
+            models.Index(fields=['target', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.target}:{self.object_id}:{self.gram}"
+
+
+class ArchivedRecord(models.Model):
+    """归档数据模型 - 软删除超过保留期限的数据移入此表"""
+    model_label = models.CharField('数据类型', max_length=100)
+    object_id = models.BigIntegerField('原数据ID')
+    object_repr = models.CharField('数据描述', max_length=300, blank=True)
+    data = models.JSONField('原数据', encoder=DjangoJSONEncoder)
+    deleted_at = models.DateTimeField('删除时间', null=True, blank=True)
+    archived_at = models.DateTimeField('归档时间', auto_now_add=True)
+
+    class Meta:
+        db_table = 'sys_archived_record'
+        verbose_name = '归档数据'
+        verbose_name_plural = '归档数据'
+        ordering = ['-archived_at']
+        indexes = [
+            models.Index(fields=['model_label', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label}:{self.object_id}"
+
+
+class LoginLog(models.Model):
+    """登录日志模型 - 由定时任务从 Redis 缓冲区批量写入"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='login_logs',
+        verbose_name='用户'
+    )
+    username = models.CharField('用户名', max_length=150)
+    ip_address = models.GenericIPAddressField('登录IP', null=True, blank=True)
+    user_agent = models.CharField('客户端', max_length=300, blank=True)
+    login_at = models.DateTimeField('登录时间')
+
+    class Meta:
+        db_table = 'sys_login_log'
+        verbose_name = '登录日志'
+        verbose_name_plural = '登录日志'
+        ordering = ['-login_at']
+        indexes = [
+            models.Index(fields=['user', 'login_at']),
+            models.Index(fields=['login_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.username}@{self.login_at}"
@@ -0,0 +1,256 @@
+"""
+列表分页
+
+默认沿用页码分页；请求带 cursor 参数时切换为游标（keyset）分页，
+按 (-created_at, id) 定位，不执行 COUNT(*) 和 OFFSET 扫描，深翻页耗时恒定。
+首页使用 ?cursor= （空值）即可进入游标模式。
+
+页码模式下的总数按查询条件缓存（短 TTL，新增/删除时由视图集失效）；
+查询没有过滤条件（软删除模型只有未删除条件）且数据量超过阈值时改用数据库表统计信息估算
+（软删除模型减去回收站中的数据），并在响应中标记 count_is_estimate。视图 get_queryset、对象级权限过滤等缩小了范围的查询仍精确计数。
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections, models
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_VERSION_KEY = 'count:version:{label}'
+COUNT_KEY = 'count:{label}:{digest}'
+COUNT_TIMEOUT = 60
+
+
+def invalidate_count_cache(model):
+    """使模型的列表总数缓存失效（新增、删除后调用）"""
+    key = COUNT_VERSION_KEY.format(label=model._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def estimate_row_count(model, using='default'):
+    """读取数据库表统计信息中的估算行数，不支持的数据库返回 None"""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = ('SELECT TABLE_ROWS FROM information_schema.TABLES '
+               'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s')
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def is_unfiltered(queryset):
+    """查询是否覆盖整张表（软删除模型只有未删除条件时视为覆盖整张表）"""
+    where = queryset.query.where
+    if not where:
+        return True
+    manager = queryset.model._default_manager
+    return hasattr(manager, 'alive') and where == manager.alive().query.where
+
+
+def get_cached_count(queryset):
+    """按查询条件缓存的总数（短 TTL，模型新增、删除后由 invalidate_count_cache 失效）"""
+    model = queryset.model
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        return 0
+
+    label = model._meta.label_lower
+    version_key = COUNT_VERSION_KEY.format(label=label)
+    count_key = COUNT_KEY.format(label=label, digest=hashlib.md5(sql.encode('utf-8')).hexdigest())
+    values = cache.get_many([version_key, count_key])
+    version = values.get(version_key, 0)
+    entry = values.get(count_key)
+    if entry and entry.get('version') == version:
+        return entry['count']
+
+    count = queryset.count()
+    cache.set(count_key, {'version': version, 'count': count}, COUNT_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """总数可缓存、可估算的分页器"""
+
+    def __init__(self, object_list, per_page, estimate_threshold=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate_threshold = estimate_threshold
+        self.count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, models.QuerySet):
+            return len(queryset)
+        model = queryset.model
+
+        if self.estimate_threshold is not None and is_unfiltered(queryset):
+            estimate = estimate_row_count(model, using=queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                if queryset.query.where:
+                    # 统计信息为整表行数，减去回收站中的数据（按 is_deleted 索引计数，数量受归档保留期限制）
+                    estimate = max(estimate - get_cached_count(model._default_manager.deleted()), 0)
+                self.count_is_estimate = True
+                return estimate
+        return get_cached_count(queryset)
+
+
+class KeysetPageNumberPagination(PageNumberPagination):
+    """支持游标模式的页码分页"""
+    cursor_query_param = 'cursor'
+    # 视图可通过 cursor_ordering 属性覆盖，例如用户列表使用 date_joined
+    cursor_ordering = ('-created_at', 'id')
+    invalid_cursor_message = '无效的游标'
+    django_paginator_class = CachedCountPaginator
+    # 查询无过滤条件且表统计行数达到该阈值时使用估算总数
+    count_estimate_threshold = 100000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return self.paginate_by_page(queryset, request)
+
+        self.page_size = self.get_page_size(request)
+        self.ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        position, reverse = self.decode_cursor(request.query_params.get(self.cursor_query_param), queryset.model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # 反向翻页时，结果之后一定还有数据；正向翻页时，带游标说明之前有数据
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first_position = self._position(results[0]) if results else None
+        self.last_position = self._position(results[-1]) if results else None
+        return results
+
+    def paginate_by_page(self, queryset, request):
+        """页码分页，总数由 CachedCountPaginator 提供"""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size, estimate_threshold=self.count_estimate_threshold)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        return list(self.page)
+
+    def get_paginated_data(self, results):
+        """分页响应中的 data 部分"""
+        if not getattr(self, 'cursor_mode', False):
+            paginator = self.page.paginator
+            return {
+                'count': paginator.count,
+                'count_is_estimate': getattr(paginator, 'count_is_estimate', False),
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'results': results
+            }
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': results
+        }
+
+    def get_next_link(self):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_next_link()
+        if not self.has_next or self.last_position is None:
+            return None
+        return self._build_link(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_previous_link()
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self._build_link(self.first_position, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, value, model):
+        """解析游标，返回 (按排序字段类型转换后的定位值, 是否反向)，无法解析时返回 404"""
+        if not value:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            values = []
+            for field, item in zip(self.ordering, position):
+                item = model._meta.get_field(field.lstrip('-')).to_python(item)
+                if item is None:
+                    raise ValueError
+                values.append(item)
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _build_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    def _position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    @staticmethod
+    def _after(ordering, position):
+        """构造 keyset 条件：排序元组位于游标之后"""
+        values = []
+        for field, value in zip(ordering, position):
+            values.append((field.lstrip('-'), '__lt' if field.startswith('-') else '__gt', value))
+
+        condition = Q()
+        for index, (name, lookup, value) in enumerate(values):
+            clause = Q(**{f'{name}{lookup}': value})
+            for prev_name, _, prev_value in values[:index]:
+                clause &= Q(**{prev_name: prev_value})
+            condition |= clause
+        return condition
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
@@ -0,0 +1,399 @@
+"""
+权限解析服务
+
+用户的有效权限编码 = 其所有启用角色的权限编码并集。计算结果缓存在 Redis 中，
+并带有全局权限版本号：角色/权限数据变化时只需递增版本号即可让所有用户的缓存失效，
+用户角色变化时只删除该用户的缓存。
+
+接口鉴权使用位图：全部权限按主键顺序连续编号作为位序，用户的有效权限编译为一个整数
+（随权限缓存一起保存，并记下编译所用索引的标识），全局"权限编码 -> 位序"索引同样按权限版本号缓存
+（进程内再缓存一份），检查权限只需一次字典查找和位运算。视图集通过 HasActionPermission 按动作检查，
+函数视图或单个动作使用 require_permissions 装饰器。
+
+对象级权限（django-guardian）按用户解析出有权访问的对象主键，与权限版本号一起缓存，
+列表等接口以一个 IN 条件过滤（见 filters.ObjectPermissionFilter），不逐行检查。
+guardian 按查询集或向多个用户/用户组授权时使用 bulk_create，不触发信号，
+授权和撤销须通过 assign_object_permission/remove_object_permission 以使缓存失效。
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
+from django.utils.crypto import constant_time_compare
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.request import Request
+
+from .models import Permission
+
+# 全局权限版本号（角色权限、角色启用状态、权限编码变化时递增）
+PERMISSION_VERSION_KEY = 'perm:version'
+# 用户有效权限缓存
+USER_PERMISSION_KEY = 'perm:user:{user_id}'
+# 用户对象级权限缓存 {'version': 版本号, 'objects': {权限: 对象主键列表或 None}}
+USER_OBJECT_PERMISSION_KEY = 'perm:objects:{user_id}'
+USER_PERMISSION_TIMEOUT = 60 * 60 * 24
+# 对象级权限缓存时间较短：绕过 assign_object_permission 直接批量授权时，最多延迟这么久生效
+USER_OBJECT_PERMISSION_TIMEOUT = 60 * 5
+# 权限索引 {'version': 版本号, 'token': 索引标识, 'bits': {权限编码: 位序}}
+PERMISSION_INDEX_KEY = 'perm:index'
+
+# 视图集动作对应的权限操作，未列出的动作按请求方法取 view 或 edit
+ACTION_PERMISSIONS = {
+    'list': 'view',
+    'retrieve': 'view',
+    'tree': 'view',
+    'export': 'view',
+    'deleted': 'view',
+    'create': 'add',
+    'update': 'edit',
+    'partial_update': 'edit',
+    'restore': 'edit',
+    'destroy': 'delete',
+}
+
+# 批量保存（及导入）各模式需要的操作权限：插入或更新模式两者都可能执行
+BULK_MODE_OPERATIONS = {
+    'create': ('add',),
+    'update': ('edit',),
+    'upsert': ('add', 'edit'),
+}
+
+# 进程内缓存的索引 (版本号, 索引)
+_permission_index = (None, None)
+
+
+def get_permission_version():
+    """获取当前全局权限版本号"""
+    version = cache.get(PERMISSION_VERSION_KEY)
+    if version is None:
+        cache.add(PERMISSION_VERSION_KEY, 1, timeout=None)
+        version = cache.get(PERMISSION_VERSION_KEY, 1)
+    return version
+
+
+def bump_permission_version():
+    """递增全局权限版本号，使所有用户的权限缓存失效"""
+    try:
+        return cache.incr(PERMISSION_VERSION_KEY)
+    except ValueError:
+        cache.add(PERMISSION_VERSION_KEY, 1, timeout=None)
+        return cache.incr(PERMISSION_VERSION_KEY)
+
+
+def invalidate_user_permissions(*user_ids):
+    """删除指定用户的权限缓存（含对象级权限）"""
+    if user_ids:
+        cache.delete_many([
+            key.format(user_id=user_id)
+            for user_id in user_ids for key in (USER_PERMISSION_KEY, USER_OBJECT_PERMISSION_KEY)
+        ])
+
+
+def compute_user_permission_codes(user):
+    """从数据库计算用户的有效权限编码（单条查询）"""
+    return frozenset(Permission.objects.filter(
+        roles__users=user,
+        roles__is_active=True
+    ).values_list('code', flat=True).distinct())
+
+
+def build_permission_mask(codes, index):
+    """按索引把权限编码编译为位图，索引中没有的编码忽略"""
+    bits = index['bits']
+    mask = 0
+    for code in codes:
+        bit = bits.get(code)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def get_user_permission_codes(user):
+    """
+    获取用户的有效权限编码
+
+    一次 get_many 同时取回全局版本号和用户缓存，版本一致时直接返回缓存结果。
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    # 同一请求内重复调用时直接复用
+    cached_codes = getattr(user, '_permission_codes', None)
+    if cached_codes is not None:
+        return cached_codes
+
+    load_user_permissions(user)
+    return user._permission_codes
+
+
+def load_user_permissions(user, version=None, entry=None):
+    """
+    读取用户的权限缓存（版本不一致时重新计算），结果保存在 user 上供同一请求复用
+
+    version/entry 由调用方一并取回时传入（见 CachedJWTAuthentication），避免再次读取缓存。
+    """
+    user_key = USER_PERMISSION_KEY.format(user_id=user.pk)
+    if version is None:
+        values = cache.get_many([PERMISSION_VERSION_KEY, user_key])
+        version = values.get(PERMISSION_VERSION_KEY)
+        if version is None:
+            version = get_permission_version()
+        entry = values.get(user_key)
+
+    if entry and entry.get('version') == version and 'mask' in entry:
+        codes, mask, token = frozenset(entry['codes']), entry['mask'], entry.get('index')
+    else:
+        # 位图在首次检查权限时编译并写回（见 get_permission_mask），只需权限编码时不读取索引
+        codes, mask, token = compute_user_permission_codes(user), None, None
+        cache.set(user_key, {'version': version, 'codes': sorted(codes), 'mask': mask, 'index': token},
+                  USER_PERMISSION_TIMEOUT)
+
+    user._permission_codes = codes
+    user._permission_mask = mask
+    user._permission_index = token
+    user._permission_version = version
+
+
+def compile_permission_index():
+    """
+    从数据库编译权限索引：全部权限按主键顺序连续编号，位图长度只与权限数量有关
+
+    token 由编码序列计算，各进程编译出相同的索引时标识一致。
+    """
+    codes = list(Permission.objects.order_by('pk').values_list('code', flat=True))
+    token = hashlib.md5('\n'.join(codes).encode()).hexdigest()[:16]
+    return {'token': token, 'bits': {code: bit for bit, code in enumerate(codes)}}
+
+
+def get_permission_index(version=None):
+    """获取权限索引，权限版本号变化后重新读取共享缓存或编译"""
+    if version is None:
+        version = get_permission_version()
+    cached_version, index = _permission_index
+    if cached_version == version:
+        return index
+    return load_permission_index(version)
+
+
+def load_permission_index(version, current=None):
+    """
+    从共享缓存读取该版本的索引，缓存中没有时从数据库编译并写入
+
+    current 为进程内正在使用的索引：共享缓存中同一版本的索引与其相同时直接返回。
+    共享缓存中的索引即该版本已编译过的标记，每个版本只从数据库编译一次。
+    """
+    global _permission_index
+    entry = cache.get(PERMISSION_INDEX_KEY)
+    if entry and entry.get('version') == version and 'bits' in entry:
+        if current is not None and entry['token'] == current['token']:
+            return current
+        index = {'token': entry['token'], 'bits': entry['bits']}
+    else:
+        index = compile_permission_index()
+        cache.set(PERMISSION_INDEX_KEY, {'version': version, **index}, timeout=None)
+    _permission_index = (version, index)
+    return index
+
+
+def get_permitted_object_ids(user, perm, model):
+    """
+    用户拥有对象级权限 perm（如 'inventory.view_warehouse'）的 model 对象主键列表
+
+    返回 None 表示不受限：超级管理员，或通过用户/用户组拥有该权限的全局授权。
+    结果按用户和权限版本号缓存，同一请求内再保存在 user 上。
+    """
+    if user.is_superuser:
+        return None
+    resolved = getattr(user, '_object_permission_ids', None)
+    if resolved is None:
+        resolved = user._object_permission_ids = {}
+    if perm in resolved:
+        return resolved[perm]
+
+    version = getattr(user, '_permission_version', None) or get_permission_version()
+    key = USER_OBJECT_PERMISSION_KEY.format(user_id=user.pk)
+    entry = cache.get(key)
+    if not entry or entry.get('version') != version:
+        entry = {'version': version, 'objects': {}}
+    if perm in entry['objects']:
+        ids = entry['objects'][perm]
+    else:
+        ids = compute_permitted_object_ids(user, perm, model)
+        entry['objects'][perm] = ids
+        cache.set(key, entry, USER_OBJECT_PERMISSION_TIMEOUT)
+    resolved[perm] = ids
+    return ids
+
+
+def compute_permitted_object_ids(user, perm, model):
+    """
+    从数据库解析对象级权限，返回 None 表示拥有全局授权
+
+    与 guardian.shortcuts.get_objects_for_user 结果一致，但只需两条查询：
+    全局授权（用户或用户组）一条，用户及用户组的对象授权合并为一条。
+    """
+    from django.contrib.auth.models import Permission as AuthPermission
+    from django.contrib.contenttypes.models import ContentType
+    from guardian.models import GroupObjectPermission, UserObjectPermission
+
+    app_label, codename = perm.split('.', 1)
+    if AuthPermission.objects.filter(
+        Q(pk__in=user.user_permissions.values('pk')) | Q(group__in=user.groups.values('pk')),
+        content_type__app_label=app_label, codename=codename
+    ).exists():
+        return None
+
+    content_type = ContentType.objects.get_for_model(model)
+    conditions = {'content_type': content_type, 'permission__codename': codename}
+    object_pks = UserObjectPermission.objects.filter(user=user, **conditions).values_list('object_pk', flat=True).union(
+        GroupObjectPermission.objects.filter(group__in=user.groups.values('pk'), **conditions).values_list('object_pk', flat=True)
+    )
+    return sorted({model._meta.pk.to_python(pk) for pk in object_pks})
+
+
+def assign_object_permission(perm, user_or_group, obj):
+    """
+    授予对象级权限并使相关缓存失效，参数同 guardian.shortcuts.assign_perm
+
+    obj 可以是查询集或对象列表，user_or_group 可以是多个用户或用户组。
+    """
+    from guardian.shortcuts import assign_perm
+
+    result = assign_perm(perm, user_or_group, obj)
+    invalidate_object_permissions(user_or_group)
+    return result
+
+
+def remove_object_permission(perm, user_or_group, obj):
+    """撤销对象级权限并使相关缓存失效，参数同 guardian.shortcuts.remove_perm"""
+    from guardian.shortcuts import remove_perm
+
+    result = remove_perm(perm, user_or_group, obj)
+    invalidate_object_permissions(user_or_group)
+    return result
+
+
+def invalidate_object_permissions(users_or_groups):
+    """对象级权限变化后使缓存失效：用户只删除其缓存，用户组无法得知受影响的用户，递增权限版本号"""
+    from django.contrib.auth.models import Group
+
+    if isinstance(users_or_groups, QuerySet):
+        if issubclass(users_or_groups.model, Group):
+            bump_permission_version()
+        else:
+            invalidate_user_permissions(*users_or_groups.values_list('pk', flat=True))
+        return
+    if not isinstance(users_or_groups, (list, tuple, set)):
+        users_or_groups = [users_or_groups]
+    if any(isinstance(item, Group) for item in users_or_groups):
+        bump_permission_version()
+    else:
+        invalidate_user_permissions(*[item.pk for item in users_or_groups])
+
+
+def has_permissions(user, *codes):
+    """用户是否拥有全部指定权限，超级管理员拥有全部权限"""
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    if getattr(user, '_permission_codes', None) is None:
+        load_user_permissions(user)
+    index = get_permission_index(user._permission_version)
+    for code in codes:
+        if code not in index['bits']:
+            # 缓存被清空后版本号从头计数，进程内的索引可能已过期：按共享缓存核对，
+            # 该版本已编译过时不再查询数据库
+            index = load_permission_index(user._permission_version, current=index)
+        bit = index['bits'].get(code)
+        # 未定义的权限编码视为无权限
+        if bit is None or not get_permission_mask(user, index) >> bit & 1:
+            return False
+    return True
+
+
+def get_permission_mask(user, index):
+    """用户按 index 编译的权限位图，尚未编译或编译自其他索引时按权限编码重新编译并写回缓存"""
+    if user._permission_index != index['token']:
+        user._permission_mask = build_permission_mask(user._permission_codes, index)
+        user._permission_index = index['token']
+        cache.set(USER_PERMISSION_KEY.format(user_id=user.pk), {
+            'version': user._permission_version,
+            'codes': sorted(user._permission_codes),
+            'mask': user._permission_mask,
+            'index': user._permission_index,
+        }, USER_PERMISSION_TIMEOUT)
+    return user._permission_mask
+
+
+def require_permissions(*codes):
+    """
+    要求指定权限的装饰器，用于函数视图（@api_view 之下）或视图集动作（@action 之下）
+
+    视图集同时使用 HasActionPermission 时，以装饰器声明的权限为准。
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            if not has_permissions(request.user, *codes):
+                raise PermissionDenied('没有操作权限')
+            return func(*args, **kwargs)
+
+        wrapper.required_permissions = codes
+        return wrapper
+    return decorator
+
+
+class HasActionPermission(BasePermission):
+    """
+    按视图集动作检查权限
+
+    视图集声明 permission_prefix（如 'inventory:material'），权限编码为 前缀:操作，
+    操作按 ACTION_PERMISSIONS 由动作得出；permission_codes 可为单个动作指定权限编码。
+    """
+    message = '没有操作权限'
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+        action = getattr(view, 'action', None)
+        handler = getattr(view, action, None) if action else None
+        if getattr(handler, 'required_permissions', None):
+            # 由 require_permissions 装饰器检查
+            return True
+        codes = self.get_required_codes(request, view, action)
+        return not codes or has_permissions(request.user, *codes)
+
+    @staticmethod
+    def get_required_codes(request, view, action):
+        codes = getattr(view, 'permission_codes', {})
+        if action in codes:
+            return (codes[action],)
+        prefix = getattr(view, 'permission_prefix', None)
+        if prefix is None:
+            return ()
+        if action == 'bulk':
+            # 批量保存按模式检查，与 BulkUpsertMixin.bulk 一致默认 upsert，无效的模式由视图返回 400
+            mode = request.data.get('mode', 'upsert') if isinstance(request.data, dict) else 'upsert'
+            operations = BULK_MODE_OPERATIONS.get(mode if isinstance(mode, str) else None,
+                                                  BULK_MODE_OPERATIONS['upsert'])
+            return tuple(f'{prefix}:{operation}' for operation in operations)
+        operation = ACTION_PERMISSIONS.get(action)
+        if operation is None:
+            operation = 'view' if request.method in SAFE_METHODS else 'edit'
+        return (f'{prefix}:{operation}',)
+
+
+class IsMetricsReader(BasePermission):
+    """指标接口：携带 METRICS_TOKEN（?token=）的抓取请求或管理员"""
+
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token and constant_time_compare(request.query_params.get('token', ''), token):
+            return True
+        user = request.user
+        return bool(user and user.is_authenticated and user.is_staff)
@@ -0,0 +1,154 @@
+"""
+N-gram 搜索索引
+
+对编码、名称、规格、条形码等字段按二元分词（bigram）建立倒排索引，
+中文名称无需分词器即可子串匹配；搜索时要求关键词的所有分词均命中，按字段权重排序。
+候选不截断，由调用方与其他条件一起在数据库中过滤和分页。
+索引随模型保存/删除信号及批量写入同步维护。
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save
+
+from .models import SearchToken
+from .signals import bulk_saved
+
+GRAM_SIZE = 2
+INDEX_CHUNK_SIZE = 1000
+
+# 索引对象 -> 模型和字段权重
+SEARCH_TARGETS = {
+    'material': {
+        'model': 'inventory.Material',
+        'fields': {'material_code': 3, 'barcode': 3, 'material_name': 2, 'material_spec': 1},
+    },
+    'customer': {
+        'model': 'foundation.Customer',
+        'fields': {'customer_code': 3, 'customer_name': 2},
+    },
+    'supplier': {
+        'model': 'foundation.Supplier',
+        'fields': {'supplier_code': 3, 'supplier_name': 2},
+    },
+}
+
+
+def get_target_for_model(model):
+    """根据模型获取索引对象名称"""
+    label = model._meta.label
+    for target, config in SEARCH_TARGETS.items():
+        if config['model'] == label:
+            return target
+    return None
+
+
+def make_grams(text):
+    """将文本切分为二元分词，按空白分段，不足两个字符的片段不产生分词"""
+    grams = set()
+    for part in str(text or '').lower().split():
+        for i in range(len(part) - GRAM_SIZE + 1):
+            grams.add(part[i:i + GRAM_SIZE])
+    return grams
+
+
+def build_tokens(target, obj_id, values):
+    """根据字段值生成索引行，同一分词取最高权重"""
+    weights = {}
+    for field, weight in SEARCH_TARGETS[target]['fields'].items():
+        for gram in make_grams(values.get(field)):
+            if weights.get(gram, 0) < weight:
+                weights[gram] = weight
+    return [SearchToken(target=target, object_id=obj_id, gram=gram, weight=weight)
+            for gram, weight in weights.items()]
+
+
+def index_objects(target, ids=None):
+    """
+    重建指定对象（为空时全部对象）的索引，已软删除的对象只清除索引
+    """
+    config = SEARCH_TARGETS[target]
+    model = apps.get_model(config['model'])
+    fields = list(config['fields'])
+    queryset = model.objects.order_by('pk')
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+        queryset = queryset.filter(pk__in=ids)
+        with transaction.atomic():
+            SearchToken.objects.filter(target=target, object_id__in=ids).delete()
+            return _index_queryset(target, queryset, fields)
+
+    SearchToken.objects.filter(target=target).delete()
+    return _index_queryset(target, queryset, fields)
+
+
+def _index_queryset(target, queryset, fields):
+    indexed = 0
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch.values('pk', 'is_deleted', *fields)[:INDEX_CHUNK_SIZE])
+        if not rows:
+            break
+        tokens = []
+        for row in rows:
+            if not row['is_deleted']:
+                tokens.extend(build_tokens(target, row['pk'], row))
+                indexed += 1
+        SearchToken.objects.bulk_create(tokens, batch_size=INDEX_CHUNK_SIZE)
+        last_pk = rows[-1]['pk']
+    return indexed
+
+
+def index_model_objects(model, ids):
+    """批量写入后维护索引，模型未注册时忽略"""
+    target = get_target_for_model(model)
+    if target is not None:
+        index_objects(target, ids)
+
+
+def search_matches(target, terms):
+    """
+    按关键词检索，返回按对象分组的查询集（object_id, score），未执行，可作为子查询使用
+
+    所有关键词的全部分词都须命中；不足两个字符的关键词无法使用索引，返回 None。
+    """
+    grams = set()
+    for term in terms:
+        term_grams = make_grams(term)
+        if not term_grams:
+            return None
+        grams |= term_grams
+    return SearchToken.objects.filter(
+        target=target, gram__in=grams
+    ).values('object_id').annotate(
+        hits=Count('gram', distinct=True), score=Sum('weight')
+    ).filter(hits=len(grams))
+
+
+def _handle_save(sender, instance, **kwargs):
+    target = get_target_for_model(sender)
+    transaction.on_commit(lambda: index_objects(target, [instance.pk]))
+
+
+def _handle_bulk_saved(sender, ids, **kwargs):
+    index_model_objects(sender, ids)
+
+
+def _handle_delete(sender, instance, **kwargs):
+    if instance.is_deleted:
+        # 软删除时索引已清除（如归档）
+        return
+    target = get_target_for_model(sender)
+    SearchToken.objects.filter(target=target, object_id=instance.pk).delete()
+
+
+def connect_signals():
+    """为已注册的模型连接索引维护信号"""
+    for target, config in SEARCH_TARGETS.items():
+        model = apps.get_model(config['model'])
+        post_save.connect(_handle_save, sender=model, dispatch_uid=f'search_index_save_{target}')
+        post_delete.connect(_handle_delete, sender=model, dispatch_uid=f'search_index_delete_{target}')
+        bulk_saved.connect(_handle_bulk_saved, sender=model, dispatch_uid=f'search_index_bulk_{target}')
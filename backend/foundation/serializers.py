@@ -1,8 +1,58 @@
 from rest_framework import serializers
-from .models import Department, User, Role, Permission, Menu, Customer, Supplier
+from rest_framework.permissions import SAFE_METHODS
+from .models import Department, User, Role, Permission, Menu, Customer, Supplier, ImportJob
+from .permissions import get_user_permission_codes
 
+FIELDS_QUERY_PARAM = 'fields'
+EXCLUDE_QUERY_PARAM = 'exclude'
 
-class DepartmentSerializer(serializers.ModelSerializer):
+
+def _parse_field_names(value):
+    if not value:
+        return None
+    names = frozenset(name.strip() for name in value.split(',') if name.strip())
+    return names or None
+
+
+def get_field_selection(request):
+    """解析 ?fields=a,b / ?exclude=c,d ，仅对读请求生效，返回 (fields, exclude)"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params
+    return _parse_field_names(params.get(FIELDS_QUERY_PARAM)), _parse_field_names(params.get(EXCLUDE_QUERY_PARAM))
+
+
+def select_fields(fields, only=None, exclude=None):
+    """按字段选择过滤字段字典"""
+    return {
+        name: field for name, field in fields.items()
+        if (only is None or name in only) and (exclude is None or name not in exclude)
+    }
+
+
+class DynamicFieldsMixin:
+    """
+    稀疏字段集
+
+    列表/详情请求可通过 ?fields= 只返回指定字段、?exclude= 排除指定字段，
+    只作用于顶层序列化器；查询集的列裁剪和关联加载见 QueryOptimizationMixin。
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_root():
+            return fields
+        only, exclude = get_field_selection(self.context.get('request'))
+        if only is None and exclude is None:
+            return fields
+        return select_fields(fields, only, exclude)
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+
+class DepartmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """部门序列化器"""
     manager_name = serializers.CharField(source='manager.username', read_only=True, allow_null=True)
     parent_name = serializers.CharField(source='parent.name', read_only=True, allow_null=True)
@@ -20,7 +70,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
         }
 
 
-class PermissionSerializer(serializers.ModelSerializer):
+class PermissionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """权限序列化器"""
 
     class Meta:
@@ -29,7 +79,7 @@ class PermissionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """角色序列化器"""
     permissions_detail = PermissionSerializer(source='permissions', many=True, read_only=True)
 
@@ -40,7 +90,7 @@ class RoleSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class UserListSerializer(serializers.ModelSerializer):
+class UserListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """用户列表序列化器"""
     department_name = serializers.CharField(source='department.name', read_only=True)
     roles_info = serializers.SerializerMethodField()
@@ -55,7 +105,7 @@ class UserListSerializer(serializers.ModelSerializer):
         return [{'id': role.id, 'name': role.name, 'code': role.code} for role in obj.roles.all()]
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """用户详情序列化器"""
     department_info = DepartmentSerializer(source='department', read_only=True)
     roles_detail = RoleSerializer(source='roles', many=True, read_only=True)
@@ -123,7 +173,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class MenuSerializer(serializers.ModelSerializer):
+class MenuSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """菜单序列化器"""
     permission_info = PermissionSerializer(source='permission', read_only=True)
     parent_name = serializers.CharField(source='parent.title', read_only=True)
@@ -137,21 +187,6 @@ class MenuSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class MenuTreeSerializer(serializers.ModelSerializer):
-    """菜单树形序列化器"""
-    children = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Menu
-        fields = ['id', 'name', 'title', 'menu_type', 'path', 'component',
-                  'icon', 'sort_order', 'is_visible', 'is_cache', 'is_external',
-                  'children']
-
-    def get_children(self, obj):
-        children = obj.get_children()
-        return MenuTreeSerializer(children, many=True).data
-
-
 class UserProfileSerializer(serializers.ModelSerializer):
     """用户个人信息序列化器"""
     department_info = DepartmentSerializer(source='department', read_only=True)
@@ -169,14 +204,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return [{'id': role.id, 'name': role.name, 'code': role.code} for role in obj.roles.all()]
 
     def get_permissions_info(self, obj):
-        permissions = set()
-        for role in obj.roles.filter(is_active=True):
-            for perm in role.permissions.all():
-                permissions.add(perm.code)
-        return list(permissions)
+        return sorted(get_user_permission_codes(obj))
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """客户序列化器"""
     customer_type_display = serializers.CharField(source='get_customer_type_display', read_only=True)
     customer_level_display = serializers.CharField(source='get_customer_level_display', read_only=True)
@@ -195,6 +226,9 @@ class CustomerSerializer(serializers.ModelSerializer):
 
     def validate_customer_code(self, value):
         """验证客户编码唯一性"""
+        if self.context.get('bulk'):
+            # 批量保存时由视图集以集合查询统一校验
+            return value
         instance = self.instance
         if instance:
             # 更新时排除自己
@@ -207,7 +241,7 @@ class CustomerSerializer(serializers.ModelSerializer):
         return value
 
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """供应商序列化器"""
     supplier_type_display = serializers.CharField(source='get_supplier_type_display', read_only=True)
     supplier_level_display = serializers.CharField(source='get_supplier_level_display', read_only=True)
@@ -226,6 +260,9 @@ class SupplierSerializer(serializers.ModelSerializer):
 
     def validate_supplier_code(self, value):
         """验证供应商编码唯一性"""
+        if self.context.get('bulk'):
+            # 批量保存时由视图集以集合查询统一校验
+            return value
         instance = self.instance
         if instance:
             # 更新时排除自己
@@ -236,3 +273,35 @@ class SupplierSerializer(serializers.ModelSerializer):
             if Supplier.objects.filter(supplier_code=value).exists():
                 raise serializers.ValidationError('供应商编码已存在')
         return value
+
+
+class ImportJobSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """导入任务序列化器"""
+    target_display = serializers.CharField(source='get_target_display', read_only=True)
+    mode_display = serializers.CharField(source='get_mode_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True, allow_null=True)
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'target', 'target_display', 'mode', 'mode_display', 'file',
+                  'status', 'status_display', 'total_rows', 'processed_rows',
+                  'success_rows', 'failed_rows', 'progress', 'errors', 'message',
+                  'started_at', 'finished_at', 'created_at', 'created_by', 'created_by_name']
+        read_only_fields = ['status', 'total_rows', 'processed_rows', 'success_rows',
+                            'failed_rows', 'errors', 'message', 'started_at',
+                            'finished_at', 'created_at', 'created_by']
+
+    def get_progress(self, obj):
+        if obj.status == 'success':
+            return 100
+        if not obj.total_rows:
+            return 0
+        return min(int(obj.processed_rows * 100 / obj.total_rows), 100)
+
+    def validate_file(self, value):
+        """验证导入文件类型"""
+        if not value.name.lower().endswith(('.csv', '.xlsx')):
+            raise serializers.ValidationError('仅支持CSV和XLSX文件')
+        return value
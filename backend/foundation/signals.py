@@ -0,0 +1,146 @@
+"""
+基础数据信号处理：维护权限、菜单、响应缓存的一致性
+"""
+from functools import partial
+
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from guardian.models import GroupObjectPermission, UserObjectPermission
+
+from .authentication import invalidate_auth_users
+from .caching import bump_model_version
+from .menus import bump_menu_version
+from .models import Menu, Permission, Role, User
+from .permissions import bump_permission_version, invalidate_user_permissions
+
+# 批量写入完成（bulk_create 不触发 post_save），参数 ids 为写入对象的主键列表
+bulk_saved = Signal()
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def role_permissions_changed(sender, action, **kwargs):
+    """角色权限变化"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permission_version()
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def user_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """用户角色变化"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        # user.roles.add(...)
+        invalidate_user_permissions(instance.pk)
+        invalidate_auth_users(instance.pk)
+    elif pk_set:
+        # role.users.add(...)
+        invalidate_user_permissions(*pk_set)
+        invalidate_auth_users(*pk_set)
+    else:
+        # role.users.clear() 无法得知受影响的用户，认证缓存随权限版本号失效
+        bump_permission_version()
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+def user_object_permission_changed(sender, instance, **kwargs):
+    """用户的对象级权限变化（guardian 批量授权不触发，见 permissions.assign_object_permission）"""
+    invalidate_user_permissions(instance.user_id)
+
+
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+@receiver(post_delete, sender=Group)
+def group_object_permission_changed(sender, **kwargs):
+    """用户组的对象级权限变化，无法得知受影响的用户"""
+    bump_permission_version()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_global_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """用户的用户组或全局授权变化（影响对象级权限是否受限）"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user_permissions(instance.pk)
+    elif pk_set:
+        invalidate_user_permissions(*pk_set)
+    else:
+        bump_permission_version()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    """用户组全局授权变化"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permission_version()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """用户信息、启用状态或密码（含重置密码）变化"""
+    invalidate_auth_users(instance.pk)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def role_changed(sender, **kwargs):
+    """角色启用状态变化或角色被删除"""
+    bump_permission_version()
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def permission_changed(sender, **kwargs):
+    """权限编码变化或权限被删除"""
+    bump_permission_version()
+    bump_menu_version()
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def menu_changed(sender, **kwargs):
+    """菜单变化"""
+    bump_menu_version()
+
+
+# 登录时只更新这些字段，不影响接口展示的数据
+LOGIN_UPDATE_FIELDS = frozenset(['last_login', 'last_login_ip'])
+RESPONSE_CACHE_APPS = ('foundation', 'inventory')
+
+
+def _bump_after_commit(*models):
+    for model in models:
+        if model._meta.app_label in RESPONSE_CACHE_APPS:
+            transaction.on_commit(partial(bump_model_version, model))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def model_changed(sender, update_fields=None, **kwargs):
+    """数据变化，事务提交后使依赖该模型的响应缓存失效"""
+    if update_fields and LOGIN_UPDATE_FIELDS.issuperset(update_fields):
+        return
+    _bump_after_commit(sender)
+
+
+@receiver(m2m_changed)
+def model_relation_changed(sender, instance, action, model, **kwargs):
+    """多对多关系变化，两端模型的响应缓存均失效"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _bump_after_commit(type(instance), model)
+
+
+@receiver(bulk_saved)
+def model_bulk_saved(sender, **kwargs):
+    """批量写入（如 TreeLoader 写入菜单），菜单、权限与逐条保存一样还需使权限和菜单树缓存失效"""
+    if sender is Permission:
+        bump_permission_version()
+    if sender in (Menu, Permission):
+        bump_menu_version()
+    _bump_after_commit(sender)
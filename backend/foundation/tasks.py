@@ -0,0 +1,31 @@
+from celery import shared_task
+
+from . import archive, logins, tokens
+from .imports import ImportRunner
+from .models import ImportJob
+
+
+@shared_task
+def run_import_job(job_id):
+    """执行主数据导入任务"""
+    job = ImportJob.objects.select_related('created_by').get(pk=job_id)
+    ImportRunner(job).run()
+    return job_id
+
+
+@shared_task
+def archive_deleted_records():
+    """归档软删除超过保留期限的数据（Celery Beat 定时执行）"""
+    return archive.archive_deleted_records()
+
+
+@shared_task
+def flush_expired_tokens():
+    """清理已过期的令牌记录（Celery Beat 定时执行）"""
+    return tokens.flush_expired_tokens()
+
+
+@shared_task
+def flush_login_events():
+    """批量写入缓冲的登录记录（Celery Beat 定时执行）"""
+    return logins.flush_login_events()
@@ -1,3 +1,710 @@
-from django.test import TestCase
+"""
+基础模块测试
 
-# Create your tests here.
+查询预算：按典型数据量造数后逐个请求已注册的路由，断言 SQL 条数和耗时不超过声明的预算，
+超出时输出捕获到的 SQL，防止 N+1 查询等性能回退。
+耗时预算可通过环境变量 QUERY_BUDGET_LATENCY_SCALE 按机器性能放宽。
+
+功能测试：权限位图及缓存失效、N-gram 搜索、令牌黑名单、批量保存、游标分页、登录记录缓冲写入。
+"""
+import base64
+import json
+import os
+import time
+import unittest
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import logins
+from .bulk import BulkUpserter
+from .menus import get_user_menu_tree
+from .models import Customer, Department, LoginLog, Menu, Permission, Role, Supplier, User
+from .permissions import get_permission_index, has_permissions, load_user_permissions
+from .search import index_objects
+from .signals import bulk_saved
+from .tokens import RefreshToken
+from .trees import TreeLoader, bulk_save_tree_nodes
+
+LATENCY_SCALE = float(os.environ.get('QUERY_BUDGET_LATENCY_SCALE', 1))
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+TEST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def collect_route_names(patterns):
+    """收集路由名称（含 DRF 路由器生成的路由）"""
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= collect_route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+@override_settings(CACHES=TEST_CACHES, PASSWORD_HASHERS=TEST_PASSWORD_HASHERS)
+class QueryBudgetTestCase(TestCase):
+    """
+    查询预算测试基类
+
+    子类声明 route_budgets：[(路由名称, 请求方法, 路由参数, 请求数据, 最大 SQL 条数, 最大耗时毫秒), ...]，
+    路由参数和请求数据可以是以测试用例为参数的函数。每次请求前清空缓存，预算按缓存未命中计算。
+    """
+    urlconf_module = None
+    route_budgets = []
+    # 不做预算检查的路由及原因
+    unbudgeted_routes = {}
+
+    @classmethod
+    def setUpClass(cls):
+        if cls is QueryBudgetTestCase:
+            raise unittest.SkipTest('基类不直接执行')
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, name, method, kwargs=None, data=None):
+        kwargs = kwargs(self) if callable(kwargs) else kwargs
+        data = data(self) if callable(data) else data
+        url = reverse(name, kwargs=kwargs)
+        if method == 'get':
+            return self.client.get(url, data)
+        return getattr(self.client, method)(url, data, format='json')
+
+    def assertWithinBudget(self, name, method, kwargs, data, max_queries, max_ms):
+        cache.clear()
+        # 与真实请求一样每次使用新的用户对象，避免权限等计算结果在对象上跨请求复用
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.request(name, method, kwargs, data)
+            if response.streaming:
+                # 流式响应在读取内容时才执行查询
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        self.assertLess(response.status_code, 400, f'{method.upper()} {name} 返回 {response.status_code}')
+        sql = '\n'.join(f'  {index}. {query["sql"]}' for index, query in enumerate(queries.captured_queries, 1))
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f'{method.upper()} {name} 执行了 {len(queries)} 条 SQL，预算 {max_queries} 条：\n{sql}'
+        )
+        self.assertLessEqual(
+            elapsed, max_ms * LATENCY_SCALE,
+            f'{method.upper()} {name} 耗时 {elapsed:.1f}ms，预算 {max_ms * LATENCY_SCALE:.0f}ms：\n{sql}'
+        )
+
+    def test_route_budgets(self):
+        for name, method, kwargs, data, max_queries, max_ms in self.route_budgets:
+            with self.subTest(route=name, method=method):
+                self.assertWithinBudget(name, method, kwargs, data, max_queries, max_ms)
+
+    def test_all_routes_budgeted(self):
+        if self.urlconf_module is None:
+            return
+        routes = collect_route_names(import_module(self.urlconf_module).urlpatterns)
+        budgeted = {name for name, *_ in self.route_budgets}
+        missing = routes - budgeted - set(self.unbudgeted_routes) - {'api-root'}
+        self.assertFalse(missing, f'以下路由未声明查询预算: {sorted(missing)}')
+
+
+def seed_foundation_data(departments=30, users=60, roles=10, customers=300, suppliers=300):
+    """造数：部门树、用户及角色权限、菜单、客户、供应商"""
+    modules = ['department', 'user', 'role', 'menu', 'customer', 'supplier']
+    actions = ['view', 'add', 'edit', 'delete']
+    permissions = Permission.objects.bulk_create([
+        Permission(name=f'{module}:{action}', code=f'foundation:{module}:{action}', module='foundation')
+        for module in modules for action in actions
+    ])
+    role_objects = []
+    for index in range(roles):
+        role = Role.objects.create(name=f'角色{index}', code=f'role_{index}')
+        role.permissions.set(permissions[index % 4::2])
+        role_objects.append(role)
+    role_objects[0].permissions.add(Permission.objects.create(
+        name='user:reset_pwd', code='foundation:user:reset_pwd', module='foundation'
+    ))
+
+    department_objects = []
+    for index in range(departments):
+        parent = department_objects[(index - 1) // 3] if index else None
+        department_objects.append(Department.objects.create(name=f'部门{index}', code=f'D{index:03d}', parent=parent))
+
+    for index, permission in enumerate(permissions):
+        parent = Menu.objects.create(name=f'menu_{index}', title=f'菜单{index}', path=f'/m{index}',
+                                     menu_type='directory', permission=permission)
+        Menu.objects.create(name=f'menu_{index}_list', title=f'菜单{index}列表', parent=parent,
+                            path=f'/m{index}/list', permission=permission)
+
+    user_objects = User.objects.bulk_create([
+        User(username=f'user{index}', employee_no=f'E{index:04d}',
+             department=department_objects[index % departments])
+        for index in range(users)
+    ])
+    through = User.roles.through
+    through.objects.bulk_create([
+        through(user_id=user.pk, role_id=role_objects[(index + offset) % roles].pk)
+        for index, user in enumerate(user_objects) for offset in range(2)
+    ])
+
+    Customer.objects.bulk_create([
+        Customer(customer_code=f'C{index:05d}', customer_name=f'客户{index}') for index in range(customers)
+    ])
+    Supplier.objects.bulk_create([
+        Supplier(supplier_code=f'S{index:05d}', supplier_name=f'供应商{index}') for index in range(suppliers)
+    ])
+
+
+class FoundationQueryBudgetTests(QueryBudgetTestCase):
+    """基础数据接口查询预算"""
+    urlconf_module = 'foundation.urls'
+    unbudgeted_routes = {
+        'metrics': '指标数据存储在 Redis 中，测试环境使用本地内存缓存',
+        'metrics_slowest': '同上',
+    }
+    # 分页列表在 MySQL/PostgreSQL 上会多一条读取表统计行数的查询，预算已包含
+    # 按动作鉴权的接口在缓存未命中时多一条读取用户权限的查询，预算已包含
+    route_budgets = [
+        # 测试环境未使用 Redis，登录记录同步写入（登录日志 + 最后登录信息），使用 Redis 缓冲时为 3 条
+        ('login', 'post', None, {'username': 'admin', 'password': 'admin123'}, 5, 300),
+        ('token_refresh', 'post', None, lambda t: {'refresh': t.refresh_token}, 1, 100),
+        ('logout', 'post', None, None, 0, 100),
+        ('user_info', 'get', None, None, 2, 100),
+        ('user_menus', 'get', None, None, 2, 200),
+        ('department-list', 'get', None, None, 3, 300),
+        ('department-detail', 'get', lambda t: {'pk': t.department.pk}, None, 2, 100),
+        ('department-tree', 'get', None, None, 2, 200),
+        ('user-list', 'get', None, None, 5, 300),
+        ('user-detail', 'get', lambda t: {'pk': t.user.pk}, None, 4, 100),
+        ('user-reset-password', 'post', lambda t: {'pk': t.other_user.pk}, {'new_password': 'secret123'}, 3, 200),
+        ('role-list', 'get', None, None, 5, 300),
+        ('role-detail', 'get', lambda t: {'pk': t.role.pk}, None, 3, 100),
+        ('permission-list', 'get', None, None, 3, 200),
+        ('permission-detail', 'get', lambda t: {'pk': t.permission.pk}, None, 2, 100),
+        ('menu-list', 'get', None, None, 3, 300),
+        ('menu-detail', 'get', lambda t: {'pk': t.menu.pk}, None, 2, 100),
+        ('menu-tree', 'get', None, None, 2, 200),
+        ('customer-list', 'get', None, None, 4, 300),
+        ('customer-list', 'get', None, {'search': '客户12'}, 2, 300),
+        ('customer-detail', 'get', lambda t: {'pk': t.customer.pk}, None, 2, 100),
+        ('customer-bulk', 'post', None, [{'customer_code': 'C00001', 'customer_name': '客户'},
+                                         {'customer_code': 'CNEW', 'customer_name': '新客户'}], 12, 300),
+        ('customer-export', 'get', None, None, 3, 1000),
+        ('customer-deleted', 'get', None, None, 4, 200),
+        ('customer-restore', 'post', lambda t: {'pk': t.deleted_customer.pk}, None, 3, 100),
+        ('supplier-list', 'get', None, None, 4, 300),
+        ('supplier-detail', 'get', lambda t: {'pk': t.supplier.pk}, None, 2, 100),
+        ('supplier-bulk', 'post', None, [{'supplier_code': 'SNEW', 'supplier_name': '新供应商'}], 12, 300),
+        ('supplier-export', 'get', None, None, 3, 1000),
+        ('supplier-deleted', 'get', None, None, 4, 200),
+        ('supplier-restore', 'post', lambda t: {'pk': t.deleted_supplier.pk}, None, 3, 100),
+        ('importjob-list', 'get', None, None, 3, 200),
+        ('importjob-detail', 'get', lambda t: {'pk': t.import_job.pk}, None, 1, 100),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_foundation_data()
+        cls.user = User.objects.create_user('admin', password='admin123', employee_no='ADMIN', is_staff=True)
+        cls.user.roles.set(Role.objects.all()[:3])
+        cls.other_user = User.objects.get(username='user0')
+        cls.department = Department.objects.first()
+        cls.role = Role.objects.first()
+        cls.permission = Permission.objects.first()
+        cls.menu = Menu.objects.first()
+        cls.customer = Customer.objects.first()
+        cls.supplier = Supplier.objects.first()
+        cls.deleted_customer = Customer.objects.last()
+        cls.deleted_customer.soft_delete()
+        cls.deleted_supplier = Supplier.objects.last()
+        cls.deleted_supplier.soft_delete()
+        cls.import_job = cls.user.import_jobs.create(target='customer', file='imports/test.csv')
+
+    def setUp(self):
+        super().setUp()
+        self.refresh_token = str(RefreshToken.for_user(self.user))
+
+
+@override_settings(CACHES=TEST_CACHES, PASSWORD_HASHERS=TEST_PASSWORD_HASHERS)
+class PermissionTests(TestCase):
+    """权限位图及接口鉴权"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # 权限主键不连续时位图仍按权限数量编号
+        Permission.objects.bulk_create([
+            Permission(name=f'p{index}', code=f'test:p{index}:view', module='test') for index in range(20)
+        ])
+        Permission.objects.filter(code__in=[f'test:p{index}:view' for index in range(15)]).delete()
+        cls.permissions = Permission.objects.bulk_create([
+            Permission(name=name, code=code, module='foundation') for name, code in [
+                ('客户新增', 'foundation:customer:add'), ('客户编辑', 'foundation:customer:edit'),
+                ('客户查看', 'foundation:customer:view'),
+            ]
+        ])
+        cls.role = Role.objects.create(name='客户录入', code='customer_clerk')
+        cls.role.permissions.set(cls.permissions[:1])
+        cls.user = User.objects.create_user('clerk', password='clerk123', employee_no='CLERK')
+        cls.user.roles.set([cls.role])
+
+    def setUp(self):
+        cache.clear()
+
+    def get_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_mask_uses_dense_index(self):
+        user = self.get_user()
+        self.assertTrue(has_permissions(user, 'foundation:customer:add'))
+        self.assertFalse(has_permissions(user, 'foundation:customer:edit'))
+        self.assertEqual(sorted(get_permission_index()['bits'].values()), list(range(Permission.objects.count())))
+        self.assertLess(user._permission_mask.bit_length(), Permission.objects.count() + 1)
+
+    def test_unknown_code_compiled_once(self):
+        self.assertFalse(has_permissions(self.get_user(), 'foundation:customer:approve'))
+        users = [self.get_user() for _ in range(3)]
+        # 同一权限版本内未定义的编码不再从数据库重新编译索引
+        with self.assertNumQueries(0):
+            for user in users:
+                self.assertFalse(has_permissions(user, 'foundation:customer:approve'))
+                self.assertTrue(has_permissions(user, 'foundation:customer:add'))
+        # 新增权限时版本号递增，新编码可用
+        self.role.permissions.add(Permission.objects.create(name='客户审核', code='foundation:customer:approve',
+                                                            module='foundation'))
+        self.assertTrue(has_permissions(self.get_user(), 'foundation:customer:approve'))
+
+    def test_role_change_invalidates_cache(self):
+        self.assertFalse(has_permissions(self.get_user(), 'foundation:customer:edit'))
+        self.role.permissions.add(self.permissions[1])
+        self.assertTrue(has_permissions(self.get_user(), 'foundation:customer:edit'))
+        self.user.roles.clear()
+        self.assertFalse(has_permissions(self.get_user(), 'foundation:customer:add'))
+
+    def test_stale_mask_recompiled_for_new_index(self):
+        user = self.get_user()
+        load_user_permissions(user)
+        # 位图编译自其他索引（如其他进程在同一版本内重新编译过）时按权限编码重新编译
+        user._permission_mask, user._permission_index = 0, 'other'
+        self.assertTrue(has_permissions(user, 'foundation:customer:add'))
+
+    def test_import_requires_target_permissions(self):
+        client = APIClient()
+        client.force_authenticate(self.get_user())
+
+        def create_job(mode):
+            upload = SimpleUploadedFile('customers.csv', '客户编码,客户名称\nC1,客户1\n'.encode())
+            return client.post(reverse('importjob-list'), {'target': 'customer', 'mode': mode, 'file': upload})
+
+        self.assertEqual(create_job('create').status_code, 201)
+        self.assertEqual(create_job('update').status_code, 403)
+        self.assertEqual(create_job('upsert').status_code, 403)
+        self.role.permissions.add(self.permissions[1])
+        client.force_authenticate(self.get_user())
+        self.assertEqual(create_job('upsert').status_code, 201)
+
+    def test_bulk_requires_mode_permissions(self):
+        client = APIClient()
+        client.force_authenticate(self.get_user())
+
+        def bulk(mode=None):
+            items = [{'customer_code': 'C1', 'customer_name': '客户1'}]
+            data = items if mode is None else {'mode': mode, 'items': items}
+            return client.post(reverse('customer-bulk'), data, format='json')
+
+        # 只有新增权限时不能修改已有数据
+        self.assertEqual(bulk().status_code, 403)
+        self.assertEqual(bulk('upsert').status_code, 403)
+        self.assertEqual(bulk('update').status_code, 403)
+        self.assertEqual(bulk('create').status_code, 200)
+        self.role.permissions.add(self.permissions[1])
+        client.force_authenticate(self.get_user())
+        self.assertEqual(bulk('update').status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class NgramSearchTests(TestCase):
+    """N-gram 索引搜索与 LIKE 查询结果一致"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Customer.objects.bulk_create([
+            Customer(customer_code=f'C{index:05d}', customer_name=f'客户{index}区域{index % 7}')
+            for index in range(1500)
+        ] + [
+            # 分词全部命中但不包含关键词：分别来自不同字段、顺序不同
+            Customer(customer_code='XAB', customer_name='BC贸易'),
+            Customer(customer_code='X01', customer_name='BCAB贸易'),
+            Customer(customer_code='X02', customer_name='ABC贸易'),
+        ])
+        index_objects('customer')
+        cls.user = User.objects.create_superuser('admin', password='admin123', employee_no='ADMIN')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, keyword):
+        response = self.client.get(reverse('customer-list'), {'search': keyword, 'page_size': 20})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def like_count(self, keyword):
+        queryset = Customer.objects.alive()
+        for term in keyword.split():
+            queryset = queryset.filter(Q(customer_code__icontains=term) | Q(customer_name__icontains=term))
+        return queryset.count()
+
+    def test_results_not_truncated(self):
+        for keyword in ['客户', '客户 区域3', '区域3 客户1']:
+            with self.subTest(keyword=keyword):
+                self.assertEqual(self.search(keyword)['count'], self.like_count(keyword))
+        self.assertEqual(self.search('客户')['count'], 1500)
+
+    def test_grams_must_match_as_substring(self):
+        data = self.search('abc')
+        self.assertEqual([row['customer_code'] for row in data['results']], ['X02'])
+
+    def test_ranked_by_field_weight(self):
+        # 编码命中权重高于名称命中
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(customer_code='HIT01', customer_name='其他')
+            Customer.objects.create(customer_code='Z99', customer_name='HIT01贸易')
+        codes = [row['customer_code'] for row in self.search('hit01')['results']]
+        self.assertEqual(codes, ['HIT01', 'Z99'])
+
+
+@override_settings(CACHES=TEST_CACHES, PASSWORD_HASHERS=TEST_PASSWORD_HASHERS)
+class TokenBlacklistTests(TestCase):
+    """令牌黑名单"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin', password='admin123', employee_no='ADMIN')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def refresh_token(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(token)}, format='json')
+
+    def test_rotated_token_rejected(self):
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        self.assertEqual(self.refresh_token(response.json()['refresh']).status_code, 200)
+
+    def test_logout_revokes_tokens(self):
+        access = str(self.refresh.access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = self.client.post(reverse('logout'), {'refresh_token': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('user_info')).status_code, 401)
+        self.client.credentials()
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkUpsertTests(TestCase):
+    """批量写入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='admin123', employee_no='ADMIN')
+        Customer.objects.create(customer_code='C001', customer_name='客户1', contact_person='张三', industry='制造')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, rows, mode='upsert'):
+        response = self.client.post(reverse('customer-bulk'), {'mode': mode, 'items': rows}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_mixed_field_sets_keep_omitted_fields(self):
+        self.bulk([
+            {'customer_code': 'C001', 'customer_name': '客户1改'},
+            {'customer_code': 'C002', 'customer_name': '客户2', 'contact_person': '李四', 'industry': '零售'},
+        ])
+        customer = Customer.objects.get(customer_code='C001')
+        self.assertEqual((customer.customer_name, customer.contact_person, customer.industry), ('客户1改', '张三', '制造'))
+        customer = Customer.objects.get(customer_code='C002')
+        self.assertEqual((customer.contact_person, customer.industry), ('李四', '零售'))
+
+    def test_modes_and_duplicates(self):
+        results = self.bulk([
+            {'customer_code': 'C001', 'customer_name': '重复'},
+            {'customer_code': 'C003', 'customer_name': '客户3'},
+            {'customer_code': 'C003', 'customer_name': '客户3'},
+        ], mode='create')
+        self.assertEqual([row['status'] for row in results['results']], ['failed', 'created', 'failed'])
+        results = self.bulk([{'customer_code': 'C404', 'customer_name': '不存在'}], mode='update')
+        self.assertEqual(results['results'][0]['status'], 'failed')
+
+    def test_failed_chunk_keeps_written_rows(self):
+        write_chunk = BulkUpserter._write_chunk
+
+        def fail_second_chunk(upserter, chunk):
+            if chunk[0][1]['customer_code'] != 'C012':
+                return write_chunk(upserter, chunk)
+            # 写入后违反约束，只回滚该块
+            with transaction.atomic():
+                write_chunk(upserter, chunk)
+                raise IntegrityError('duplicate key')
+
+        received = []
+
+        def receiver(sender, ids, **kwargs):
+            received.extend(ids)
+
+        bulk_saved.connect(receiver, sender=Customer)
+        self.addCleanup(bulk_saved.disconnect, receiver, sender=Customer)
+        with mock.patch.object(BulkUpserter, 'chunk_size', 1), \
+                mock.patch.object(BulkUpserter, '_write_chunk', fail_second_chunk):
+            results = self.bulk([{'customer_code': code, 'customer_name': code} for code in ['C011', 'C012', 'C013']])
+        self.assertEqual([row['status'] for row in results['results']], ['created', 'failed', 'created'])
+        self.assertFalse(Customer.objects.filter(customer_code='C012').exists())
+        self.assertEqual(sorted(received), sorted(Customer.objects.filter(
+            customer_code__in=['C011', 'C013']).values_list('pk', flat=True)))
+
+    def test_restores_soft_deleted(self):
+        Customer.objects.get(customer_code='C001').soft_delete()
+        self.bulk([{'customer_code': 'C001', 'customer_name': '客户1'}])
+        self.assertFalse(Customer.objects.get(customer_code='C001').is_deleted)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CursorPaginationTests(TestCase):
+    """游标分页"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='admin123', employee_no='ADMIN')
+        Customer.objects.bulk_create([
+            Customer(customer_code=f'C{index:03d}', customer_name=f'客户{index}') for index in range(45)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_traverse_forward_and_back(self):
+        expected = list(Customer.objects.order_by('-created_at', '-id').values_list('customer_code', flat=True))
+        pages = [self.get_page(reverse('customer-list'), {'cursor': ''})]
+        while pages[-1]['next']:
+            pages.append(self.get_page(pages[-1]['next']))
+        codes = [row['customer_code'] for page in pages for row in page['results']]
+        self.assertEqual(codes, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+        previous = self.get_page(pages[-1]['previous'])
+        self.assertEqual([row['customer_code'] for row in previous['results']], expected[20:40])
+
+    def test_count_estimate_only_unfiltered(self):
+        for customer in Customer.objects.order_by('-pk')[:5]:
+            customer.soft_delete()
+        with mock.patch('foundation.pagination.estimate_row_count', return_value=200000):
+            # 估算值不含回收站中的数据
+            data = self.get_page(reverse('customer-list'))
+            self.assertEqual((data['count'], data['count_is_estimate']), (199995, True))
+            data = self.get_page(reverse('role-list'))
+            self.assertEqual((data['count'], data['count_is_estimate']), (200000, True))
+            # 过滤条件缩小了范围时精确计数
+            index_objects('customer')
+            data = self.get_page(reverse('customer-list'), {'search': 'C001'})
+            self.assertEqual((data['count'], data['count_is_estimate']), (1, False))
+
+    def test_invalid_cursor(self):
+        def encode(position):
+            return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+
+        for cursor in ['not-base64!', encode(['2024-13-45T00:00:00', 1]), encode(['2024-01-01T00:00:00', 'abc']),
+                       encode([None, None]), encode([1]), encode('ab'), base64.urlsafe_b64encode(b'[]').decode()]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('customer-list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class TreeLoaderTests(TestCase):
+    """树形数据批量写入"""
+
+    def test_bulk_saved_after_rebuild(self):
+        received = []
+
+        def receiver(sender, ids, **kwargs):
+            received.append(sorted(Department.objects.filter(pk__in=ids).values_list('code', 'lft', 'rght', 'level')))
+
+        bulk_saved.connect(receiver, sender=Department)
+        self.addCleanup(bulk_saved.disconnect, receiver, sender=Department)
+        root = Department(name='总部', code='HQ')
+        with TreeLoader(Department) as loader:
+            loader.save([root, Department(name='财务部', code='FIN', parent=root)])
+            loader.save([Department(name='销售部', code='SALES', parent=root)])
+            # 重建前不通知，缓存不会读到占位的左右值
+            self.assertEqual(received, [])
+        self.assertEqual(received, [[('FIN', 2, 3, 1), ('HQ', 1, 6, 0), ('SALES', 4, 5, 1)]])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+    """条件 GET：ETag 由模型版本号生成"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='admin123', employee_no='ADMIN')
+        cls.customer = Customer.objects.create(customer_code='C001', customer_name='客户1')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified_without_queries(self):
+        url = reverse('customer-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # 其他查询参数、其他用户的 ETag 不同
+        self.assertNotEqual(self.client.get(url, {'search': 'C0'})['ETag'], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.customer_name = '客户一'
+            self.customer.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_cache_flush(self):
+        url = reverse('customer-detail', kwargs={'pk': self.customer.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.save()
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.save()
+        # 缓存被清空后版本号不从头计数，数据变化后的 ETag 不会与旧值重复
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MenuCacheTests(TestCase):
+    """菜单树缓存"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bulk_saved_menus_invalidate_tree(self):
+        user = User.objects.create_superuser('admin', password='admin123', employee_no='ADMIN')
+        root = Menu(name='system', title='系统管理')
+        bulk_save_tree_nodes(Menu, [root])
+        self.assertEqual([node['title'] for node in get_user_menu_tree(user)], ['系统管理'])
+        bulk_save_tree_nodes(Menu, [Menu(name='user', title='用户管理', parent=root)])
+        self.assertEqual([node['title'] for node in get_user_menu_tree(user)[0]['children']], ['用户管理'])
+
+
+class ListRedis:
+    """登录缓冲区测试用的内存列表，只实现 foundation.logins 用到的命令"""
+
+    def __init__(self):
+        self.lists = {}
+        self.commands = []
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.lists.setdefault(key, []).insert(0, value)
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:None if end == -1 else end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lrange(key, start, end)
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def pipeline(self):
+        redis = self
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args: redis.commands.append((name, args))
+
+            def execute(self):
+                commands, redis.commands = redis.commands, []
+                return [getattr(redis, name)(*args) for name, args in commands]
+
+        return Pipeline()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LoginBufferTests(TestCase):
+    """登录记录缓冲写入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{index}', employee_no=f'E{index}') for index in range(2)]
+
+    def setUp(self):
+        self.logins = logins
+        self.redis = ListRedis()
+        patcher = mock.patch.multiple(logins, get_redis=lambda: self.redis, is_buffer_enabled=lambda: True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_keeps_latest_login(self):
+        now = timezone.now()
+        self.logins.record_login(self.users[0], '10.0.0.2', login_at=now)
+        self.logins.record_login(self.users[0], '10.0.0.1', login_at=now - timedelta(minutes=1))
+        self.logins.record_login(self.users[1], 'not-an-ip', login_at=now)
+        self.assertEqual(self.logins.flush_login_events(), 3)
+        users = User.objects.in_bulk([user.pk for user in self.users])
+        self.assertEqual((users[self.users[0].pk].last_login, users[self.users[0].pk].last_login_ip), (now, '10.0.0.2'))
+        self.assertIsNone(users[self.users[1].pk].last_login_ip)
+        self.assertEqual(self.redis.llen(self.logins.LOGIN_QUEUE_KEY), 0)
+
+    def test_bad_event_moved_to_dead_letter(self):
+        self.logins.record_login(self.users[0], '10.0.0.1')
+        self.redis.rpush(self.logins.LOGIN_QUEUE_KEY, json.dumps({
+            'user_id': self.users[1].pk, 'username': 'user1', 'ip_address': None, 'user_agent': '',
+            'login_at': 'not-a-date',
+        }))
+        self.logins.record_login(self.users[1], '10.0.0.2')
+        self.assertEqual(self.logins.flush_login_events(), 2)
+        self.assertEqual(self.redis.llen(self.logins.LOGIN_QUEUE_KEY), 0)
+        self.assertEqual(self.redis.llen(self.logins.LOGIN_DEAD_LETTER_KEY), 1)
+        self.assertEqual(LoginLog.objects.count(), 2)
+
+    def test_database_unavailable_requeues(self):
+        self.logins.record_login(self.users[0], '10.0.0.1')
+        with mock.patch.object(self.logins, 'save_login_events', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                self.logins.flush_login_events()
+        self.assertEqual(self.redis.llen(self.logins.LOGIN_QUEUE_KEY), 1)
+        self.assertEqual(self.logins.flush_login_events(), 1)
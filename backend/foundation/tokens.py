@@ -0,0 +1,118 @@
+"""
+JWT 令牌黑名单
+
+已作废令牌的 jti 存入 Redis，过期时间等于令牌的剩余有效期，令牌过期后键自动删除，
+校验时只需一次按键读取；不再写入 token_blacklist 应用的 OutstandingToken/BlacklistedToken 表。
+刷新令牌轮换（BLACKLIST_AFTER_ROTATION）及登出时作废旧令牌。
+切换前已记录在 BlacklistedToken 表中、尚未过期的令牌在首次校验时同步到 Redis（见 sync_legacy_blacklist）。
+"""
+from django.apps import apps
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers, tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+TOKEN_BLACKLIST_KEY = 'jwt:blacklist:{jti}'
+TOKEN_BLACKLIST_APP = 'rest_framework_simplejwt.token_blacklist'
+# BlacklistedToken 表已同步到 Redis 的标记，在同步的最后一条令牌过期时失效
+LEGACY_BLACKLIST_SYNCED_KEY = 'jwt:blacklist:legacy-synced'
+
+
+def get_blacklist_key(jti):
+    return TOKEN_BLACKLIST_KEY.format(jti=jti)
+
+
+def blacklist_token(token):
+    """作废令牌，返回是否写入（已过期的令牌无需记录）"""
+    jti = token.payload.get(api_settings.JTI_CLAIM)
+    exp = token.payload.get('exp')
+    if jti is None or exp is None:
+        return False
+    timeout = int((datetime_from_epoch(exp) - timezone.now()).total_seconds()) + 1
+    if timeout <= 0:
+        return False
+    cache.set(get_blacklist_key(jti), 1, timeout)
+    return True
+
+
+def is_token_blacklisted(token):
+    jti = token.payload.get(api_settings.JTI_CLAIM)
+    if jti is None:
+        return False
+    key = get_blacklist_key(jti)
+    values = cache.get_many([key, LEGACY_BLACKLIST_SYNCED_KEY])
+    if key in values:
+        return True
+    if LEGACY_BLACKLIST_SYNCED_KEY not in values:
+        # 首次校验或缓存被清空，先同步数据表中的作废记录
+        sync_legacy_blacklist()
+        return cache.get(key) is not None
+    return False
+
+
+def sync_legacy_blacklist():
+    """
+    把 token_blacklist 数据表中尚未过期的作废令牌写入 Redis 黑名单，返回写入条数
+
+    切换到 Redis 黑名单之前作废的刷新令牌（登出、修改密码）须继续拒绝；
+    同步标记在最后一条令牌过期时失效，此后数据表中不再有需要同步的记录。
+    """
+    now = timezone.now()
+    rows = []
+    if apps.is_installed(TOKEN_BLACKLIST_APP):
+        BlacklistedToken = apps.get_model('token_blacklist', 'BlacklistedToken')
+        rows = list(BlacklistedToken.objects.filter(
+            token__expires_at__gt=now, token__jti__isnull=False
+        ).values_list('token__jti', 'token__expires_at'))
+    for jti, expires_at in rows:
+        cache.set(get_blacklist_key(jti), 1, int((expires_at - now).total_seconds()) + 1)
+    timeout = None
+    if rows:
+        timeout = int((max(expires_at for _, expires_at in rows) - now).total_seconds()) + 1
+    cache.set(LEGACY_BLACKLIST_SYNCED_KEY, 1, timeout)
+    return len(rows)
+
+
+class RedisBlacklistMixin:
+    """使用 Redis 黑名单的令牌，跳过 simplejwt BlacklistMixin 的数据库读写"""
+
+    def verify(self, *args, **kwargs):
+        super(tokens.BlacklistMixin, self).verify(*args, **kwargs)
+        if is_token_blacklisted(self):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        return blacklist_token(self)
+
+    def outstand(self):
+        return None
+
+    @classmethod
+    def for_user(cls, user):
+        return super(tokens.BlacklistMixin, cls).for_user(user)
+
+
+class RefreshToken(RedisBlacklistMixin, tokens.RefreshToken):
+    """刷新令牌"""
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    """刷新令牌时检查 Redis 黑名单，轮换后旧令牌写入黑名单"""
+    token_class = RefreshToken
+
+
+def flush_expired_tokens():
+    """
+    删除 token_blacklist 数据表中已过期的令牌记录，返回删除的 OutstandingToken 条数
+
+    启用 Redis 黑名单后不再新增记录，此处清理历史数据；未安装该应用时不做处理。
+    """
+    if not apps.is_installed(TOKEN_BLACKLIST_APP):
+        return 0
+    OutstandingToken = apps.get_model('token_blacklist', 'OutstandingToken')
+    # BlacklistedToken 随外键级联删除
+    total, counts = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return counts.get(OutstandingToken._meta.label, 0)
@@ -0,0 +1,315 @@
+"""
+MPTT 树形结构组装与批量写入
+
+一次有序查询（tree_id, lft）取回整片森林或指定子树，在内存中以 O(n) 建立父子关系，
+节点使用 values() 投影输出，避免逐节点查询和序列化器实例化。
+
+批量写入时关闭 MPTT 的逐节点左右值维护（按 order_insertion_by 插入每个节点都要平移大量节点的左右值），
+全部写入后每棵受影响的树只重建一次，重建只写回左右值有变化的节点。
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import connections, transaction
+from django.db.models import Max, Subquery
+from rest_framework import serializers
+
+_datetime_field = serializers.DateTimeField()
+
+
+def get_tree_params(request):
+    """
+    解析树形接口的查询参数
+
+    ?root=<id>  只返回该节点及其子树
+    ?depth=<n>  最多返回根节点以下 n 层（0 表示只返回根节点）
+
+    参数不合法时抛出 ValueError
+    """
+    root = request.query_params.get('root') or None
+    depth = request.query_params.get('depth') or None
+    if root is not None:
+        root = int(root)
+    if depth is not None:
+        depth = int(depth)
+        if depth < 0:
+            raise ValueError('depth不能小于0')
+    return root, depth
+
+
+def build_tree(queryset, fields, root=None, max_depth=None, transform=None):
+    """
+    组装树形数据
+
+    :param queryset: MPTT 模型查询集（可已做过滤，如 is_deleted=False）
+    :param fields: 输出字段 -> values() 查询路径，如 {'parent_name': 'parent__name'}
+    :param root: 子树根节点ID，为空时返回整片森林
+    :param max_depth: 根节点以下的最大层数
+    :param transform: 节点后处理函数，用于补充计算字段
+    :return: 根节点列表，每个节点带 children
+    """
+    model = queryset.model
+    opts = model._mptt_meta
+
+    if root is not None:
+        root_qs = model._default_manager.filter(pk=root)
+        queryset = queryset.filter(**{
+            opts.tree_id_attr: Subquery(root_qs.values(opts.tree_id_attr)[:1]),
+            f'{opts.left_attr}__gte': Subquery(root_qs.values(opts.left_attr)[:1]),
+            f'{opts.right_attr}__lte': Subquery(root_qs.values(opts.right_attr)[:1]),
+        })
+        if max_depth is not None:
+            root_level = model._default_manager.filter(pk=root).values(opts.level_attr)[:1]
+            queryset = queryset.filter(**{
+                f'{opts.level_attr}__lte': Subquery(root_level) + max_depth
+            })
+    elif max_depth is not None:
+        queryset = queryset.filter(**{f'{opts.level_attr}__lte': max_depth})
+
+    lookups = dict(fields)
+    lookups.setdefault('id', 'pk')
+    parent_lookup = f'{opts.parent_attr}_id'
+    rows = queryset.order_by(opts.tree_id_attr, opts.left_attr).values_list(
+        'pk', parent_lookup, *lookups.values()
+    )
+
+    keys = list(lookups.keys())
+    forest = []
+    nodes = {}
+    for pk, parent_id, *values in rows:
+        node = {}
+        for key, value in zip(keys, values):
+            if isinstance(value, datetime):
+                value = _datetime_field.to_representation(value)
+            node[key] = value
+        if transform is not None:
+            transform(node)
+        node['children'] = []
+
+        is_root = pk == root if root is not None else parent_id is None
+        if is_root:
+            forest.append(node)
+        elif parent_id in nodes:
+            nodes[parent_id]['children'].append(node)
+        else:
+            # 上级节点不在结果中（如已被过滤掉），其子树一并忽略
+            continue
+        nodes[pk] = node
+
+    return forest
+
+
+class TreeLoader:
+    """
+    树形数据批量写入（部门、菜单、物料分类等 MPTT 模型）
+
+    save() 可多次调用（如导入任务逐批写入），写入期间不维护左右值，只记录受影响的树；
+    rebuild() 或退出 with 块时统一重建，重建后才发送 bulk_saved（避免缓存在重建前读到旧的树结构）：只在已有节点下新增节点或修改排序字段时逐棵重建，
+    新增根节点（根节点按排序字段编排 tree_id）或已有节点更换上级（子树迁移到其他树）时全表重建。
+
+        with TreeLoader(MaterialCategory) as loader:
+            loader.save(nodes)
+    """
+
+    def __init__(self, model, batch_size=1000):
+        self.model = model
+        self.batch_size = batch_size
+        self.opts = model._mptt_meta
+        self.affected_trees = set()
+        self.full_rebuild = False
+        self.next_tree_id = None
+        # 已写入、重建后待通知的主键
+        self.saved_ids = []
+
+    @property
+    def pending(self):
+        """是否有写入后尚未重建的树"""
+        return self.full_rebuild or bool(self.affected_trees)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # 写入中途失败也要重建，已提交的批次保持树结构正确
+        self.rebuild()
+
+    def save(self, nodes):
+        """
+        保存树节点（新增或修改），返回写入对象的主键列表
+
+        节点的上级可以是已保存的节点，也可以是 nodes 中的其他新节点（按层级先上后下写入）。
+        数据库支持批量插入返回主键时，新节点按层级 bulk_create，否则逐个插入（不平移左右值）。
+        """
+        if not nodes:
+            return []
+        model = self.model
+        opts = self.opts
+        order_fields = [model._meta.get_field(name).attname for name in opts.order_insertion_by]
+        existing = {node.pk: node for node in nodes if node.pk is not None}
+        previous = {}
+        if existing:
+            previous = {
+                row[0]: row[1:] for row in model._default_manager.filter(pk__in=existing).values_list(
+                    'pk', f'{opts.parent_attr}_id', opts.tree_id_attr, *order_fields
+                )
+            }
+
+        with transaction.atomic():
+            if self.next_tree_id is None:
+                self.next_tree_id = self._get_max_tree_id() + 1
+            for pk, node in existing.items():
+                if pk in previous:
+                    self._track_change(node, *previous[pk], order_fields=order_fields)
+
+            created_ids = []
+            with model._tree_manager.disable_mptt_updates():
+                pending = list(nodes)
+                while pending:
+                    # 上级已保存（或无上级）的节点本轮写入
+                    ready = []
+                    waiting = []
+                    for node in pending:
+                        parent = getattr(node, opts.parent_attr)
+                        (waiting if parent is not None and parent.pk is None else ready).append(node)
+                    if not ready:
+                        raise ValueError('树节点的上级关系存在循环')
+                    new_nodes = []
+                    for node in ready:
+                        if node.pk is not None:
+                            node.save()
+                        else:
+                            self._set_placeholder(node)
+                            new_nodes.append(node)
+                    created_ids.extend(self._insert(new_nodes))
+                    pending = waiting
+
+        ids = list(existing) + created_ids
+        self.saved_ids.extend(ids)
+        return ids
+
+    def _get_max_tree_id(self):
+        return self.model._tree_manager.aggregate(value=Max(self.opts.tree_id_attr))['value'] or 0
+
+    def _track_change(self, node, old_parent_id, old_tree_id, *old_order, order_fields):
+        parent = getattr(node, self.opts.parent_attr)
+        if parent is None and old_parent_id is not None or parent is not None and parent.pk != old_parent_id:
+            self.full_rebuild = True
+        elif [getattr(node, name) for name in order_fields] != old_order:
+            if old_parent_id is None:
+                # 根节点之间按 tree_id 排序，排序字段变化需要重新编号
+                self.full_rebuild = True
+            self.affected_trees.add(old_tree_id)
+
+    def _set_placeholder(self, node):
+        """新节点写入占位的树字段，重建时修正"""
+        opts = self.opts
+        parent = getattr(node, opts.parent_attr)
+        if parent is None:
+            tree_id = self.next_tree_id
+            self.next_tree_id += 1
+            level = 0
+            self.full_rebuild = True
+        else:
+            tree_id = getattr(parent, opts.tree_id_attr)
+            level = getattr(parent, opts.level_attr) + 1
+        setattr(node, opts.tree_id_attr, tree_id)
+        setattr(node, opts.level_attr, level)
+        setattr(node, opts.left_attr, 0)
+        setattr(node, opts.right_attr, 0)
+        self.affected_trees.add(tree_id)
+
+    def _insert(self, nodes):
+        manager = self.model._default_manager
+        if connections[manager.db].features.can_return_rows_from_bulk_insert:
+            manager.bulk_create(nodes, batch_size=self.batch_size)
+        else:
+            for node in nodes:
+                node.save(force_insert=True)
+        return [node.pk for node in nodes]
+
+    def rebuild(self):
+        """重建受影响的树并通知已写入的节点，返回写回的节点数"""
+        try:
+            if self.full_rebuild:
+                updated = rebuild_tree_fields(self.model, batch_size=self.batch_size)
+            elif self.affected_trees:
+                updated = rebuild_tree_fields(self.model, self.affected_trees, batch_size=self.batch_size)
+            else:
+                updated = 0
+        finally:
+            self.affected_trees = set()
+            self.full_rebuild = False
+            self.next_tree_id = None
+            ids, self.saved_ids = self.saved_ids, []
+            if ids:
+                # signals 经 menus 引用本模块，在此导入避免循环引用
+                from .signals import bulk_saved
+
+                # bulk_create 不触发 post_save，由 bulk_saved 通知缓存和索引
+                bulk_saved.send(sender=self.model, ids=ids)
+        return updated
+
+
+def bulk_save_tree_nodes(model, nodes, batch_size=1000):
+    """批量保存树节点并重建受影响的树，返回写入对象的主键列表"""
+    with TreeLoader(model, batch_size=batch_size) as loader:
+        return loader.save(nodes)
+
+
+def rebuild_tree_fields(model, tree_ids=None, batch_size=1000):
+    """
+    按上级关系重新计算 MPTT 字段，只写回有变化的节点，返回写回的节点数
+
+    tree_ids 为空时全表重建，根节点按排序字段重新编排 tree_id；否则只重建指定的树（保留其 tree_id）。
+    与 TreeManager.rebuild() 结果一致，但不实例化模型、不使用 bulk_update 的 CASE 语句。
+    """
+    opts = model._mptt_meta
+    manager = model._tree_manager
+    fields = [opts.tree_id_attr, opts.left_attr, opts.right_attr, opts.level_attr]
+    queryset = manager.all()
+    if tree_ids is not None:
+        queryset = queryset.filter(**{f'{opts.tree_id_attr}__in': list(tree_ids)})
+    rows = queryset.order_by(*opts.order_insertion_by, 'pk').values_list('pk', f'{opts.parent_attr}_id', *fields)
+
+    current = {}
+    children = defaultdict(list)
+    roots = []
+    for pk, parent_id, *values in rows:
+        current[pk] = tuple(values)
+        if parent_id is None:
+            roots.append(pk)
+        else:
+            children[parent_id].append(pk)
+
+    changed = []
+    for index, root in enumerate(roots):
+        tree_id = index + 1 if tree_ids is None else current[root][0]
+        counter = 1
+        lefts = {}
+        # 非递归深度优先遍历，(节点, 层级, 是否已展开)
+        stack = [(root, 0, False)]
+        while stack:
+            pk, level, expanded = stack.pop()
+            if not expanded:
+                lefts[pk] = counter
+                counter += 1
+                stack.append((pk, level, True))
+                stack.extend((child, level + 1, False) for child in reversed(children[pk]))
+                continue
+            values = (tree_id, lefts.pop(pk), counter, level)
+            counter += 1
+            if values != current[pk]:
+                changed.append((*values, pk))
+
+    if changed:
+        connection = connections[manager.db]
+        quote = connection.ops.quote_name
+        sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+            quote(model._meta.db_table),
+            ', '.join(f'{quote(model._meta.get_field(name).column)} = %s' for name in fields),
+            quote(model._meta.pk.column),
+        )
+        with transaction.atomic(using=manager.db), connection.cursor() as cursor:
+            for start in range(0, len(changed), batch_size):
+                cursor.executemany(sql, changed[start:start + batch_size])
+    return len(changed)
@@ -2,9 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CustomTokenObtainPairView, CustomTokenRefreshView,
-    logout, get_user_info, get_user_menus,
+    logout, get_user_info, get_user_menus, metrics, slowest_endpoints,
     DepartmentViewSet, UserViewSet, RoleViewSet,
-    PermissionViewSet, MenuViewSet, CustomerViewSet, SupplierViewSet
+    PermissionViewSet, MenuViewSet, CustomerViewSet, SupplierViewSet,
+    ImportJobViewSet
 )
 
 # 创建路由器
@@ -16,6 +17,7 @@ router.register('permissions', PermissionViewSet)
 router.register('menus', MenuViewSet)
 router.register('customers', CustomerViewSet)
 router.register('suppliers', SupplierViewSet)
+router.register('imports', ImportJobViewSet)
 
 urlpatterns = [
     # 认证相关
@@ -25,6 +27,10 @@ urlpatterns = [
     path('auth/user/', get_user_info, name='user_info'),
     path('auth/menus/', get_user_menus, name='user_menus'),
 
+    # 性能指标
+    path('metrics/', metrics, name='metrics'),
+    path('metrics/slowest/', slowest_endpoints, name='metrics_slowest'),
+
     # 模块路由
     path('', include(router.urls)),
 ]
@@ -1,18 +1,33 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.utils import timezone
-from .models import Department, User, Role, Permission, Menu, Customer, Supplier
+from django.db import transaction
+from django.http import HttpResponse
+from .models import Department, User, Role, Permission, Menu, Customer, Supplier, ImportJob
+from .imports import get_import_permission_codes
+from .logins import record_login
+from .menus import get_user_menu_tree
+from .metrics import get_slowest_endpoints, load_metrics, render_prometheus
+from .mixins import (
+    BulkUpsertMixin, ConditionalGetMixin, ExportMixin, QueryOptimizationMixin, ResponseCacheMixin,
+    SoftDeleteMixin
+)
+from .pagination import KeysetPageNumberPagination, invalidate_count_cache
+from .permissions import HasActionPermission, IsMetricsReader, has_permissions, require_permissions
+from .trees import build_tree, get_tree_params
 from .serializers import (
     DepartmentSerializer, UserListSerializer, UserDetailSerializer,
     UserCreateSerializer, UserUpdateSerializer, RoleSerializer,
-    PermissionSerializer, MenuSerializer, MenuTreeSerializer,
-    UserProfileSerializer, CustomerSerializer, SupplierSerializer
+    PermissionSerializer, MenuSerializer,
+    UserProfileSerializer, CustomerSerializer, SupplierSerializer,
+    ImportJobSerializer
 )
+from .tasks import run_import_job
+from .tokens import RefreshToken, blacklist_token
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -43,10 +58,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                 'message': '用户已被禁用'
             }, status=status.HTTP_403_FORBIDDEN)
 
-        # 更新最后登录信息
-        user.last_login = timezone.now()
-        user.last_login_ip = self.get_client_ip(request)
-        user.save(update_fields=['last_login', 'last_login_ip'])
+        # 记录登录信息（缓冲后由定时任务批量写入）
+        record_login(user, self.get_client_ip(request), request.META.get('HTTP_USER_AGENT', ''))
 
         # 生成token
         refresh = RefreshToken.for_user(user)
@@ -68,7 +81,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         """获取客户端IP"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
+            ip = x_forwarded_for.split(',')[0].strip()
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
@@ -88,6 +101,9 @@ def logout(request):
         if refresh_token:
             token = RefreshToken(refresh_token)
             token.blacklist()
+        # 当前访问令牌同时作废
+        if request.auth is not None:
+            blacklist_token(request.auth)
 
         return Response({
             'code': 200,
@@ -112,58 +128,34 @@ def get_user_info(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsMetricsReader])
+def metrics(request):
+    """Prometheus 格式的接口性能指标"""
+    return HttpResponse(render_prometheus(load_metrics()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([IsMetricsReader])
+def slowest_endpoints(request):
+    """最慢接口汇总"""
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        limit = 10
+    order = request.query_params.get('order', 'p95')
+    return Response({
+        'code': 200,
+        'message': '获取成功',
+        'data': get_slowest_endpoints(load_metrics(), limit=limit, order=order)
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_menus(request):
     """获取当前用户的菜单"""
-    user = request.user
-
-    # 如果是超级管理员,返回所有菜单
-    if user.is_superuser:
-        menus = Menu.objects.filter(is_visible=True).order_by('sort_order')
-    else:
-        # 获取用户所有角色的权限
-        permission_codes = set()
-        for role in user.roles.filter(is_active=True):
-            for perm in role.permissions.all():
-                permission_codes.add(perm.code)
-
-        # 获取有权限的菜单
-        menus = Menu.objects.filter(
-            is_visible=True,
-            permission__code__in=permission_codes
-        ).order_by('sort_order')
-
-    # 构建树形菜单
-    menu_tree = []
-    menu_dict = {}
-
-    for menu in menus:
-        menu_data = {
-            'id': menu.id,
-            'name': menu.name,
-            'title': menu.title,
-            'path': menu.path,
-            'component': menu.component,
-            'icon': menu.icon,
-            'menu_type': menu.menu_type,
-            'parent_id': menu.parent_id,
-            'sort_order': menu.sort_order,
-            'is_cache': menu.is_cache,
-            'is_external': menu.is_external,
-            'children': []
-        }
-        menu_dict[menu.id] = menu_data
-
-    # 构建树形结构
-    for menu_id, menu_data in menu_dict.items():
-        if menu_data['parent_id'] is None:
-            menu_tree.append(menu_data)
-        else:
-            parent = menu_dict.get(menu_data['parent_id'])
-            if parent:
-                parent['children'].append(menu_data)
-
+    menu_tree = get_user_menu_tree(request.user)
     return Response({
         'code': 200,
         'message': '获取成功',
@@ -171,11 +163,12 @@ def get_user_menus(request):
     })
 
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ConditionalGetMixin, ResponseCacheMixin, QueryOptimizationMixin, viewsets.ModelViewSet):
     """部门管理视图集"""
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'foundation:department'
 
     def list(self, request, *args, **kwargs):
         """获取部门列表"""
@@ -251,29 +244,42 @@ class DepartmentViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def tree(self, request):
         """获取部门树"""
-        departments = Department.objects.filter(parent__isnull=True)
-        tree_data = self._build_tree(departments)
+        try:
+            root, depth = get_tree_params(request)
+        except ValueError:
+            return Response({
+                'code': 400,
+                'message': '参数错误'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        tree_data = build_tree(self.get_queryset(), {
+            'id': 'id',
+            'name': 'name',
+            'code': 'code',
+            'parent': 'parent_id',
+            'parent_name': 'parent__name',
+            'manager': 'manager_id',
+            'manager_name': 'manager__username',
+            'description': 'description',
+            'sort_order': 'sort_order',
+            'is_active': 'is_active',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        }, root=root, max_depth=depth)
         return Response({
             'code': 200,
             'message': '获取成功',
             'data': tree_data
         })
 
-    def _build_tree(self, departments):
-        """递归构建树形结构"""
-        tree = []
-        for dept in departments:
-            serializer = self.get_serializer(dept)
-            node = serializer.data
-            node['children'] = self._build_tree(dept.get_children())
-            tree.append(node)
-        return tree
-
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryOptimizationMixin, viewsets.ModelViewSet):
     """用户管理视图集"""
     queryset = User.objects.all()
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'foundation:user'
+    pagination_class = KeysetPageNumberPagination
+    cursor_ordering = ('-date_joined', 'id')
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -310,12 +316,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response({
             'code': 200,
             'message': '获取成功',
-            'data': {
-                'count': self.paginator.page.paginator.count,
-                'next': self.paginator.get_next_link(),
-                'previous': self.paginator.get_previous_link(),
-                'results': data['data']
-            }
+            'data': self.paginator.get_paginated_data(data['data'])
         })
 
     def retrieve(self, request, *args, **kwargs):
@@ -338,6 +339,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 'data': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
         self.perform_create(serializer)
+        invalidate_count_cache(User)
         return Response({
             'code': 200,
             'message': '创建成功',
@@ -374,6 +376,7 @@ class UserViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         self.perform_destroy(instance)
+        invalidate_count_cache(User)
         return Response({
             'code': 200,
             'message': '删除成功',
@@ -381,6 +384,7 @@ class UserViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=True, methods=['post'])
+    @require_permissions('foundation:user:reset_pwd')
     def reset_password(self, request, pk=None):
         """重置用户密码"""
         user = self.get_object()
@@ -402,11 +406,13 @@ class UserViewSet(viewsets.ModelViewSet):
         })
 
 
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(ConditionalGetMixin, ResponseCacheMixin, QueryOptimizationMixin, viewsets.ModelViewSet):
     """角色管理视图集"""
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'foundation:role'
+    pagination_class = KeysetPageNumberPagination
 
     def list(self, request, *args, **kwargs):
         """获取角色列表"""
@@ -434,12 +440,7 @@ class RoleViewSet(viewsets.ModelViewSet):
         return Response({
             'code': 200,
             'message': '获取成功',
-            'data': {
-                'count': self.paginator.page.paginator.count,
-                'next': self.paginator.get_next_link(),
-                'previous': self.paginator.get_previous_link(),
-                'results': data['data']
-            }
+            'data': self.paginator.get_paginated_data(data['data'])
         })
 
     def retrieve(self, request, *args, **kwargs):
@@ -462,6 +463,7 @@ class RoleViewSet(viewsets.ModelViewSet):
                 'data': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
         self.perform_create(serializer)
+        invalidate_count_cache(Role)
         return Response({
             'code': 200,
             'message': '创建成功',
@@ -497,6 +499,7 @@ class RoleViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         self.perform_destroy(instance)
+        invalidate_count_cache(Role)
         return Response({
             'code': 200,
             'message': '删除成功',
@@ -504,11 +507,13 @@ class RoleViewSet(viewsets.ModelViewSet):
         })
 
 
-class PermissionViewSet(viewsets.ModelViewSet):
+class PermissionViewSet(ConditionalGetMixin, ResponseCacheMixin, QueryOptimizationMixin, viewsets.ModelViewSet):
     """权限管理视图集"""
     queryset = Permission.objects.all()
     serializer_class = PermissionSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    # 权限数据在角色管理中维护
+    permission_prefix = 'foundation:role'
 
     def list(self, request, *args, **kwargs):
         """获取权限列表"""
@@ -521,11 +526,12 @@ class PermissionViewSet(viewsets.ModelViewSet):
         })
 
 
-class MenuViewSet(viewsets.ModelViewSet):
+class MenuViewSet(ConditionalGetMixin, QueryOptimizationMixin, viewsets.ModelViewSet):
     """菜单管理视图集"""
     queryset = Menu.objects.all()
     serializer_class = MenuSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'foundation:menu'
 
     def list(self, request, *args, **kwargs):
         """获取菜单列表"""
@@ -602,20 +608,62 @@ class MenuViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def tree(self, request):
         """获取菜单树"""
-        menus = Menu.objects.filter(parent__isnull=True).order_by('sort_order')
-        serializer = MenuTreeSerializer(menus, many=True)
+        try:
+            root, depth = get_tree_params(request)
+        except ValueError:
+            return Response({
+                'code': 400,
+                'message': '参数错误'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        tree_data = build_tree(self.get_queryset(), {
+            'id': 'id',
+            'name': 'name',
+            'title': 'title',
+            'menu_type': 'menu_type',
+            'path': 'path',
+            'component': 'component',
+            'icon': 'icon',
+            'sort_order': 'sort_order',
+            'is_visible': 'is_visible',
+            'is_cache': 'is_cache',
+            'is_external': 'is_external',
+        }, root=root, max_depth=depth)
         return Response({
             'code': 200,
             'message': '获取成功',
-            'data': serializer.data
+            'data': tree_data
         })
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(BulkUpsertMixin, ExportMixin, SoftDeleteMixin, ConditionalGetMixin, QueryOptimizationMixin,
+                      viewsets.ModelViewSet):
     """客户管理视图集"""
-    queryset = Customer.objects.filter(is_deleted=False)
+    queryset = Customer.objects.alive()
     serializer_class = CustomerSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'foundation:customer'
+    pagination_class = KeysetPageNumberPagination
+    bulk_code_field = 'customer_code'
+    search_fields = ['customer_code', 'customer_name']
+    search_index_target = 'customer'
+    export_fields = (
+        ('customer_code', '客户编码'),
+        ('customer_name', '客户名称'),
+        ('customer_type', '客户类型'),
+        ('customer_level', '客户等级'),
+        ('industry', '所属行业'),
+        ('contact_person', '联系人'),
+        ('contact_phone', '联系电话'),
+        ('contact_email', '联系邮箱'),
+        ('address', '详细地址'),
+        ('credit_limit', '信用额度'),
+        ('credit_days', '账期天数'),
+        ('status', '状态'),
+        ('remark', '备注'),
+        ('created_at', '创建时间'),
+        ('updated_at', '更新时间'),
+    )
 
     def list(self, request, *args, **kwargs):
         """获取客户列表"""
@@ -643,12 +691,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return Response({
             'code': 200,
             'message': '获取成功',
-            'data': {
-                'count': self.paginator.page.paginator.count,
-                'next': self.paginator.get_next_link(),
-                'previous': self.paginator.get_previous_link(),
-                'results': data['data']
-            }
+            'data': self.paginator.get_paginated_data(data['data'])
         })
 
     def retrieve(self, request, *args, **kwargs):
@@ -673,6 +716,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
 
         # 保存时记录创建人
         serializer.save(created_by=request.user, updated_by=request.user)
+        invalidate_count_cache(Customer)
 
         return Response({
             'code': 200,
@@ -704,8 +748,8 @@ class CustomerViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """删除客户（软删除）"""
         instance = self.get_object()
-        instance.is_deleted = True
-        instance.save()
+        instance.soft_delete(request.user)
+        invalidate_count_cache(Customer)
 
         return Response({
             'code': 200,
@@ -714,11 +758,32 @@ class CustomerViewSet(viewsets.ModelViewSet):
         })
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(BulkUpsertMixin, ExportMixin, SoftDeleteMixin, ConditionalGetMixin, QueryOptimizationMixin,
+                      viewsets.ModelViewSet):
     """供应商管理视图集"""
-    queryset = Supplier.objects.filter(is_deleted=False)
+    queryset = Supplier.objects.alive()
     serializer_class = SupplierSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'foundation:supplier'
+    pagination_class = KeysetPageNumberPagination
+    bulk_code_field = 'supplier_code'
+    search_fields = ['supplier_code', 'supplier_name']
+    search_index_target = 'supplier'
+    export_fields = (
+        ('supplier_code', '供应商编码'),
+        ('supplier_name', '供应商名称'),
+        ('supplier_type', '供应商类型'),
+        ('supplier_level', '供应商等级'),
+        ('contact_person', '联系人'),
+        ('contact_phone', '联系电话'),
+        ('contact_email', '联系邮箱'),
+        ('address', '详细地址'),
+        ('payment_days', '付款账期'),
+        ('status', '状态'),
+        ('remark', '备注'),
+        ('created_at', '创建时间'),
+        ('updated_at', '更新时间'),
+    )
 
     def list(self, request, *args, **kwargs):
         """获取供应商列表"""
@@ -746,12 +811,7 @@ class SupplierViewSet(viewsets.ModelViewSet):
         return Response({
             'code': 200,
             'message': '获取成功',
-            'data': {
-                'count': self.paginator.page.paginator.count,
-                'next': self.paginator.get_next_link(),
-                'previous': self.paginator.get_previous_link(),
-                'results': data['data']
-            }
+            'data': self.paginator.get_paginated_data(data['data'])
         })
 
     def retrieve(self, request, *args, **kwargs):
@@ -776,6 +836,7 @@ class SupplierViewSet(viewsets.ModelViewSet):
 
         # 保存时记录创建人
         serializer.save(created_by=request.user, updated_by=request.user)
+        invalidate_count_cache(Supplier)
 
         return Response({
             'code': 200,
@@ -807,11 +868,91 @@ class SupplierViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """删除供应商（软删除）"""
         instance = self.get_object()
-        instance.is_deleted = True
-        instance.save()
+        instance.soft_delete(request.user)
+        invalidate_count_cache(Supplier)
 
         return Response({
             'code': 200,
             'message': '删除成功',
             'data': None
         })
+
+
+class ImportJobViewSet(QueryOptimizationMixin, viewsets.ModelViewSet):
+    """数据导入任务视图集"""
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPageNumberPagination
+    http_method_names = ['get', 'post', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """获取导入任务列表"""
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response({
+                'code': 200,
+                'message': '获取成功',
+                'data': serializer.data
+            })
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({
+            'code': 200,
+            'message': '获取成功',
+            'data': serializer.data
+        })
+
+    def get_paginated_response(self, data):
+        """自定义分页响应"""
+        return Response({
+            'code': 200,
+            'message': '获取成功',
+            'data': self.paginator.get_paginated_data(data['data'])
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        """获取导入任务状态（含进度和错误明细）"""
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return Response({
+            'code': 200,
+            'message': '获取成功',
+            'data': serializer.data
+        })
+
+    def create(self, request, *args, **kwargs):
+        """上传文件并创建导入任务"""
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'code': 400,
+                'message': '数据验证失败',
+                'data': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 导入绕过对应视图集的鉴权，按导入对象和模式检查新增/编辑权限
+        codes = get_import_permission_codes(serializer.validated_data['target'],
+                                            serializer.validated_data.get('mode', 'upsert'))
+        if not has_permissions(request.user, *codes):
+            raise PermissionDenied('没有导入权限')
+
+        job = serializer.save(created_by=request.user)
+        invalidate_count_cache(ImportJob)
+        # 事务提交后再投递任务，避免任务读取不到记录
+        transaction.on_commit(lambda: run_import_job.delay(job.id))
+
+        return Response({
+            'code': 200,
+            'message': '导入任务已创建',
+            'data': serializer.data
+        }, status=status.HTTP_201_CREATED)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from mptt.admin import MPTTModelAdmin
+from guardian.admin import GuardedModelAdmin
 from .models import MaterialCategory, Material, Warehouse
 
 
@@ -24,7 +25,7 @@ class MaterialAdmin(admin.ModelAdmin):
 
 
 @admin.register(Warehouse)
-class WarehouseAdmin(admin.ModelAdmin):
+class WarehouseAdmin(GuardedModelAdmin):
     list_display = ['warehouse_code', 'warehouse_name', 'warehouse_type',
                     'location', 'manager', 'status', 'created_at']
     list_filter = ['warehouse_type', 'status', 'created_at']
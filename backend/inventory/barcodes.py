@@ -0,0 +1,112 @@
+"""
+条形码/物料编码解析
+
+扫码终端高频按条形码或物料编码查询物料，每个条形码、物料编码各自缓存一条精简物料记录：
+- 查询时一次 get_many 取回所查编码的缓存项，未命中的编码一次查询数据库后写入缓存，
+  不存在的编码同样缓存（较短时间），避免反复扫描无效条码时查询数据库
+- 物料保存/删除/批量写入后只删除该物料新旧条形码、编码对应的缓存项，不重建整张映射；
+  物料被缓存时在其索引项中记下对应的键，修改后据此找到旧条形码、编码
+"""
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Material
+
+BARCODE_KEY = 'barcode:b:{value}'
+MATERIAL_CODE_KEY = 'barcode:c:{value}'
+# 物料已缓存的键
+MATERIAL_KEYS_KEY = 'barcode:m:{id}'
+BARCODE_CACHE_TIMEOUT = 60 * 60 * 24
+# 不存在的编码缓存时间（新增物料时也会删除对应的缓存项）
+MISSING_TIMEOUT = 60
+# 不存在的编码的缓存值
+MISSING = 0
+
+# 精简物料记录包含的字段
+RECORD_FIELDS = (
+    'id', 'material_code', 'material_name', 'material_spec', 'category_id',
+    'material_type', 'unit', 'barcode', 'status',
+)
+
+
+def get_record_keys(barcode, material_code):
+    """物料记录缓存在其条形码和物料编码两个键下"""
+    keys = [MATERIAL_CODE_KEY.format(value=material_code)]
+    if barcode:
+        keys.append(BARCODE_KEY.format(value=barcode))
+    return keys
+
+
+def load_records(codes):
+    """从数据库查询编码对应的记录，写入缓存，返回 {缓存键: 记录或 MISSING}"""
+    barcodes = {}
+    material_codes = {}
+    rows = Material.objects.filter(
+        Q(barcode__in=codes) | Q(material_code__in=codes), is_deleted=False
+    ).order_by('pk').values_list(*RECORD_FIELDS)
+    for row in rows:
+        record = dict(zip(RECORD_FIELDS, row))
+        material_codes[record['material_code']] = record
+        if record['barcode']:
+            # 条形码重复时保留先创建的物料
+            barcodes.setdefault(record['barcode'], record)
+
+    entries = {}
+    for code in codes:
+        entries[BARCODE_KEY.format(value=code)] = barcodes.get(code, MISSING)
+        entries[MATERIAL_CODE_KEY.format(value=code)] = material_codes.get(code, MISSING)
+    found = {key: record for key, record in entries.items() if record is not MISSING}
+    index = {
+        MATERIAL_KEYS_KEY.format(id=record['id']): get_record_keys(record['barcode'], record['material_code'])
+        for record in found.values()
+    }
+    cache.set_many({**found, **index}, BARCODE_CACHE_TIMEOUT)
+    cache.set_many({key: record for key, record in entries.items() if record is MISSING}, MISSING_TIMEOUT)
+    return entries
+
+
+def lookup_materials(codes):
+    """批量查询，优先匹配条形码，返回 (code -> 记录, 未找到的 code 列表)"""
+    keys = {code: (BARCODE_KEY.format(value=code), MATERIAL_CODE_KEY.format(value=code)) for code in codes}
+    entries = cache.get_many([key for pair in keys.values() for key in pair])
+    unresolved = [code for code, pair in keys.items() if not all(key in entries for key in pair)]
+    if unresolved:
+        entries.update(load_records(unresolved))
+
+    found = {}
+    missing = []
+    for code in codes:
+        barcode_key, code_key = keys[code]
+        record = entries[barcode_key] or entries[code_key]
+        if record:
+            found[code] = record
+        else:
+            missing.append(code)
+    return found, missing
+
+
+def lookup_material(code):
+    """按条形码或物料编码查询物料记录，优先匹配条形码，不存在返回 None"""
+    found, _ = lookup_materials([code])
+    return found.get(code)
+
+
+def invalidate_materials(materials):
+    """
+    删除物料新旧条形码、编码对应的缓存项
+
+    materials 为 [(物料ID, 条形码, 物料编码), ...]（当前值），旧值从物料的索引项中取得。
+    """
+    index_keys = [MATERIAL_KEYS_KEY.format(id=pk) for pk, _, _ in materials]
+    keys = set(index_keys)
+    for cached_keys in cache.get_many(index_keys).values():
+        keys.update(cached_keys)
+    for _, barcode, material_code in materials:
+        keys.update(get_record_keys(barcode, material_code))
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def invalidate_material_ids(ids):
+    """按物料ID删除缓存项（批量写入后使用，一次查询取回当前条形码和编码）"""
+    invalidate_materials(list(Material.objects.filter(pk__in=ids).values_list('pk', 'barcode', 'material_code')))
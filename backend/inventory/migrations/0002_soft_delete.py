@@ -0,0 +1,75 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_deleted_at(apps, schema_editor):
+    """已删除数据以最后更新时间作为删除时间"""
+    for model_name in ["material", "materialcategory", "warehouse"]:
+        model = apps.get_model("inventory", model_name)
+        model.objects.filter(is_deleted=True, deleted_at__isnull=True).update(
+            deleted_at=models.F("updated_at")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="material",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="删除时间"),
+        ),
+        migrations.AddField(
+            model_name="materialcategory",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="删除时间"),
+        ),
+        migrations.AddField(
+            model_name="warehouse",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="删除时间"),
+        ),
+        migrations.AddIndex(
+            model_name="material",
+            index=models.Index(
+                fields=["is_deleted", "status", "created_at"],
+                name="foundation__is_dele_61442c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="material",
+            index=models.Index(
+                fields=["is_deleted", "created_at"],
+                name="foundation__is_dele_1375de_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="materialcategory",
+            index=models.Index(
+                fields=["is_deleted", "status", "created_at"],
+                name="foundation__is_dele_6e4193_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="warehouse",
+            index=models.Index(
+                fields=["is_deleted", "status", "created_at"],
+                name="foundation__is_dele_0ce507_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="warehouse",
+            index=models.Index(
+                fields=["is_deleted", "created_at"],
+                name="foundation__is_dele_d0e997_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+    ]
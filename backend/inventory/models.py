@@ -1,9 +1,9 @@
 from django.db import models
 from mptt.models import MPTTModel, TreeForeignKey
-from foundation.models import User
+from foundation.models import SoftDeleteModel, SoftDeleteTreeManager, User
 
 
-class MaterialCategory(MPTTModel):
+class MaterialCategory(MPTTModel, SoftDeleteModel):
     """物料分类模型"""
     STATUS_CHOICES = [
         (1, '正常'),
@@ -41,7 +41,8 @@ class MaterialCategory(MPTTModel):
         related_name='updated_material_categories',
         verbose_name='更新人'
     )
-    is_deleted = models.BooleanField('是否删除', default=False)
+
+    objects = SoftDeleteTreeManager()
 
     class MPTTMeta:
         order_insertion_by = ['sort_order', 'category_code']
@@ -53,13 +54,14 @@ class MaterialCategory(MPTTModel):
         ordering = ['sort_order', 'category_code']
         indexes = [
             models.Index(fields=['category_code']),
+            models.Index(fields=['is_deleted', 'status', 'created_at']),
         ]
 
     def __str__(self):
         return f"{self.category_code} - {self.category_name}"
 
 
-class Material(models.Model):
+class Material(SoftDeleteModel):
     """物料模型"""
     MATERIAL_TYPE_CHOICES = [
         (1, '原材料'),
@@ -110,7 +112,6 @@ class Material(models.Model):
         related_name='updated_materials',
         verbose_name='更新人'
     )
-    is_deleted = models.BooleanField('是否删除', default=False)
 
     class Meta:
         db_table = 'foundation_material'
@@ -121,13 +122,15 @@ class Material(models.Model):
             models.Index(fields=['material_code']),
             models.Index(fields=['material_name']),
             models.Index(fields=['barcode']),
+            models.Index(fields=['is_deleted', 'status', 'created_at']),
+            models.Index(fields=['is_deleted', 'created_at']),
         ]
 
     def __str__(self):
         return f"{self.material_code} - {self.material_name}"
 
 
-class Warehouse(models.Model):
+class Warehouse(SoftDeleteModel):
     """仓库模型"""
     WAREHOUSE_TYPE_CHOICES = [
         (1, '原材料仓'),
@@ -174,7 +177,6 @@ class Warehouse(models.Model):
         related_name='updated_warehouses',
         verbose_name='更新人'
     )
-    is_deleted = models.BooleanField('是否删除', default=False)
 
     class Meta:
         db_table = 'foundation_warehouse'
@@ -184,6 +186,8 @@ class Warehouse(models.Model):
         indexes = [
             models.Index(fields=['warehouse_code']),
             models.Index(fields=['warehouse_name']),
+            models.Index(fields=['is_deleted', 'status', 'created_at']),
+            models.Index(fields=['is_deleted', 'created_at']),
         ]
 
     def __str__(self):
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from foundation.serializers import DynamicFieldsMixin
 from .models import MaterialCategory, Material, Warehouse
 
 
-class MaterialCategorySerializer(serializers.ModelSerializer):
+class MaterialCategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """物料分类序列化器"""
     parent_name = serializers.CharField(source='parent.category_name', read_only=True, allow_null=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -23,6 +24,9 @@ class MaterialCategorySerializer(serializers.ModelSerializer):
 
     def validate_category_code(self, value):
         """验证分类编码唯一性"""
+        if self.context.get('bulk'):
+            # 批量导入时统一按集合校验
+            return value
         instance = self.instance
         if instance:
             if MaterialCategory.objects.exclude(pk=instance.pk).filter(category_code=value).exists():
@@ -33,7 +37,7 @@ class MaterialCategorySerializer(serializers.ModelSerializer):
         return value
 
 
-class MaterialSerializer(serializers.ModelSerializer):
+class MaterialSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """物料序列化器"""
     category_name = serializers.CharField(source='category.category_name', read_only=True, allow_null=True)
     material_type_display = serializers.CharField(source='get_material_type_display', read_only=True)
@@ -60,6 +64,9 @@ class MaterialSerializer(serializers.ModelSerializer):
 
     def validate_material_code(self, value):
         """验证物料编码唯一性"""
+        if self.context.get('bulk'):
+            # 批量保存时由视图集以集合查询统一校验
+            return value
         instance = self.instance
         if instance:
             if Material.objects.exclude(pk=instance.pk).filter(material_code=value).exists():
@@ -70,7 +77,7 @@ class MaterialSerializer(serializers.ModelSerializer):
         return value
 
 
-class WarehouseSerializer(serializers.ModelSerializer):
+class WarehouseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """仓库序列化器"""
     manager_name = serializers.CharField(source='manager.username', read_only=True, allow_null=True)
     warehouse_type_display = serializers.CharField(source='get_warehouse_type_display', read_only=True)
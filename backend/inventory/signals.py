@@ -0,0 +1,25 @@
+"""
+物料数据信号处理：维护条码缓存的一致性
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foundation.signals import bulk_saved
+from .barcodes import invalidate_material_ids, invalidate_materials
+from .models import Material
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def material_changed(sender, instance, **kwargs):
+    """物料变化，事务提交后删除其条码缓存项"""
+    materials = [(instance.pk, instance.barcode, instance.material_code)]
+    transaction.on_commit(lambda: invalidate_materials(materials))
+
+
+@receiver(bulk_saved, sender=Material)
+def materials_bulk_saved(sender, ids, **kwargs):
+    """批量写入物料，事务提交后删除其条码缓存项"""
+    ids = list(ids)
+    transaction.on_commit(lambda: invalidate_material_ids(ids))
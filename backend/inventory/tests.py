@@ -1,3 +1,272 @@
-from django.test import TestCase
+"""
+库存模块测试：接口查询预算（基类见 foundation.tests），仓库对象级权限、条码查询缓存、归档及恢复等功能测试
+"""
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import Permission as AuthPermission
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from guardian.shortcuts import remove_perm
+from rest_framework.test import APIClient
+
+from foundation.archive import archive_deleted_records
+from foundation.imports import ImportRunner
+from foundation.models import ArchivedRecord, ImportJob, Permission, Role, User
+from foundation.permissions import assign_object_permission
+from foundation.tests import TEST_CACHES, QueryBudgetTestCase
+
+from .models import Material, MaterialCategory, Warehouse
+
+
+def seed_inventory_data(categories=50, materials=500, warehouses=20):
+    """造数：物料分类树、物料、仓库及拥有库存模块全部权限的角色"""
+    role = Role.objects.create(name='库管员', code='inventory_keeper')
+    role.permissions.set(Permission.objects.bulk_create([
+        Permission(name=f'{module}:{action}', code=f'inventory:{module}:{action}', module='inventory')
+        for module in ['category', 'material', 'warehouse'] for action in ['view', 'add', 'edit', 'delete']
+    ]))
+    category_objects = []
+    for index in range(categories):
+        parent = category_objects[(index - 1) // 4] if index else None
+        category_objects.append(MaterialCategory.objects.create(
+            category_code=f'MC{index:03d}', category_name=f'分类{index}', parent=parent
+        ))
+    Material.objects.bulk_create([
+        Material(material_code=f'M{index:05d}', material_name=f'物料{index}', material_spec=f'规格{index % 7}',
+                 category=category_objects[index % categories], unit='个', barcode=f'69{index:011d}')
+        for index in range(materials)
+    ])
+    Warehouse.objects.bulk_create([
+        Warehouse(warehouse_code=f'WH{index:03d}', warehouse_name=f'仓库{index}') for index in range(warehouses)
+    ])
+
+
+class InventoryQueryBudgetTests(QueryBudgetTestCase):
+    """库存模块接口查询预算"""
+    urlconf_module = 'inventory.urls'
+    # 分页列表在 MySQL/PostgreSQL 上会多一条读取表统计行数的查询，预算已包含
+    # 按动作鉴权的接口在缓存未命中时多一条读取用户权限的查询，预算已包含
+    # 仓库按对象级权限过滤，缓存未命中时多两条查询（全局权限、授权对象ID），预算已包含
+    route_budgets = [
+        ('materialcategory-list', 'get', None, None, 3, 300),
+        ('materialcategory-detail', 'get', lambda t: {'pk': t.category.pk}, None, 2, 100),
+        ('materialcategory-tree', 'get', None, None, 2, 300),
+        ('materialcategory-deleted', 'get', None, None, 4, 200),
+        ('materialcategory-restore', 'post', lambda t: {'pk': t.deleted_category.pk}, None, 4, 100),
+        ('material-list', 'get', None, None, 4, 300),
+        ('material-list', 'get', None, {'search': '物料12'}, 2, 300),
+        ('material-detail', 'get', lambda t: {'pk': t.material.pk}, None, 2, 100),
+        ('material-lookup', 'get', None, {'code': '6900000000012'}, 2, 300),
+        ('material-batch-lookup', 'post', None, {'codes': ['M00001', '6900000000002', 'NOT-EXIST']}, 2, 300),
+        ('material-bulk', 'post', None, lambda t: [
+            {'material_code': 'M00001', 'material_name': '物料', 'category': t.category.pk},
+            {'material_code': 'MNEW', 'material_name': '新物料', 'category': t.category.pk},
+        ], 13, 300),
+        ('material-export', 'get', None, None, 3, 1500),
+        ('material-deleted', 'get', None, None, 4, 200),
+        ('material-restore', 'post', lambda t: {'pk': t.deleted_material.pk}, None, 4, 100),
+        ('warehouse-list', 'get', None, None, 5, 200),
+        ('warehouse-detail', 'get', lambda t: {'pk': t.warehouse.pk}, None, 4, 100),
+        ('warehouse-export', 'get', None, None, 5, 300),
+        ('warehouse-deleted', 'get', None, None, 5, 200),
+        ('warehouse-restore', 'post', lambda t: {'pk': t.deleted_warehouse.pk}, None, 5, 100),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_inventory_data()
+        cls.user = User.objects.create_user('admin', password='admin123', employee_no='ADMIN', is_staff=True)
+        cls.user.roles.set(Role.objects.all())
+        cls.category = MaterialCategory.objects.first()
+        cls.deleted_category = MaterialCategory.objects.filter(children__isnull=True).last()
+        cls.deleted_category.soft_delete()
+        cls.material = Material.objects.first()
+        cls.deleted_material = Material.objects.last()
+        cls.deleted_material.soft_delete()
+        cls.warehouse = Warehouse.objects.first()
+        cls.deleted_warehouse = Warehouse.objects.last()
+        cls.deleted_warehouse.soft_delete()
+        # 仓库按对象级权限过滤，只授权部分仓库（含用例使用的两个）
+        warehouse_ids = list(Warehouse.objects.order_by('pk').values_list('pk', flat=True))
+        granted_ids = {*warehouse_ids[::2], cls.warehouse.pk, cls.deleted_warehouse.pk}
+        assign_object_permission('inventory.view_warehouse', cls.user, Warehouse.objects.filter(pk__in=granted_ids))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class WarehouseObjectPermissionTests(TestCase):
+    """仓库对象级权限过滤及缓存失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_inventory_data(categories=1, materials=0, warehouses=5)
+        cls.user = User.objects.create_user('keeper', password='keeper123', employee_no='KEEPER')
+        cls.user.roles.set(Role.objects.all())
+        cls.warehouses = list(Warehouse.objects.order_by('pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def list_codes(self):
+        # 每次请求使用新的用户对象，与真实请求一致
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(reverse('warehouse-list'))
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['warehouse_code'] for row in response.json()['data']['results'])
+
+    def test_bulk_assign_invalidates_cache(self):
+        self.assertEqual(self.list_codes(), [])
+        assign_object_permission('inventory.view_warehouse', self.user,
+                                 Warehouse.objects.filter(pk__in=[w.pk for w in self.warehouses[:2]]))
+        self.assertEqual(self.list_codes(), ['WH000', 'WH001'])
+
+    def test_group_assign_and_remove(self):
+        group = Group.objects.create(name='华东仓')
+        self.user.groups.add(group)
+        self.assertEqual(self.list_codes(), [])
+        assign_object_permission('inventory.view_warehouse', [group], self.warehouses[3])
+        self.assertEqual(self.list_codes(), ['WH003'])
+        # 逐个撤销时由 post_delete 信号使缓存失效
+        remove_perm('inventory.view_warehouse', group, self.warehouses[3])
+        self.assertEqual(self.list_codes(), [])
+
+    def test_global_permission_unrestricted(self):
+        assign_object_permission('inventory.view_warehouse', self.user, self.warehouses[0])
+        self.assertEqual(self.list_codes(), ['WH000'])
+        self.user.user_permissions.add(AuthPermission.objects.get(codename='view_warehouse'))
+        self.assertEqual(len(self.list_codes()), 5)
+
+    def test_scoped_list_counts_exactly(self):
+        assign_object_permission('inventory.view_warehouse', self.user, self.warehouses[0])
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with mock.patch('foundation.pagination.estimate_row_count', return_value=200000):
+            data = self.client.get(reverse('warehouse-list')).json()['data']
+        self.assertEqual((data['count'], data['count_is_estimate']), (1, False))
+
+    def test_detail_outside_scope(self):
+        assign_object_permission('inventory.view_warehouse', self.user, self.warehouses[0])
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        for warehouse, status_code in [(self.warehouses[0], 200), (self.warehouses[1], 404)]:
+            response = self.client.get(reverse('warehouse-detail', kwargs={'pk': warehouse.pk}))
+            self.assertEqual(response.status_code, status_code)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MaterialLookupTests(TestCase):
+    """条码查询缓存：只删除变化物料的缓存项"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_inventory_data(categories=1, materials=3, warehouses=0)
+        cls.user = User.objects.create_user('scanner', password='scanner123', employee_no='SCANNER')
+        cls.user.roles.set(Role.objects.all())
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def lookup(self, code):
+        response = self.client.get(reverse('material-lookup'), {'code': code})
+        return response.json()['data']['material_code'] if response.status_code == 200 else None
+
+    def save(self, material):
+        with self.captureOnCommitCallbacks(execute=True):
+            material.save()
+
+    def test_barcode_change(self):
+        material = Material.objects.get(material_code='M00001')
+        self.assertEqual(self.lookup('6900000000001'), 'M00001')
+        material.barcode = '6911111111111'
+        self.save(material)
+        self.assertIsNone(self.lookup('6900000000001'))
+        self.assertEqual(self.lookup('6911111111111'), 'M00001')
+        # 其他物料的缓存项不受影响
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.post(reverse('material-batch-lookup'), {'codes': ['6900000000001']},
+                                              format='json').json()['data']['missing'], ['6900000000001'])
+
+    def test_new_material_after_missing(self):
+        self.assertIsNone(self.lookup('NEW001'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Material.objects.create(material_code='NEW001', material_name='新物料', barcode='6922222222222')
+        self.assertEqual(self.lookup('NEW001'), 'NEW001')
+        self.assertEqual(self.lookup('6922222222222'), 'NEW001')
+
+    def test_soft_delete(self):
+        material = Material.objects.get(material_code='M00002')
+        self.assertEqual(self.lookup('M00002'), 'M00002')
+        material.is_deleted = True
+        self.save(material)
+        self.assertIsNone(self.lookup('M00002'))
+        self.assertIsNone(self.lookup('6900000000002'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MaterialArchiveTests(TestCase):
+    """归档不破坏仍在使用的物料分类，恢复物料时检查分类"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_inventory_data(categories=1, materials=2, warehouses=0)
+        cls.user = User.objects.create_user('archiver', password='archiver123', employee_no='ARCHIVER')
+        cls.user.roles.set(Role.objects.all())
+        cls.category = MaterialCategory.objects.get()
+
+    def setUp(self):
+        cache.clear()
+        self.category.soft_delete()
+
+    def test_referenced_category_not_archived(self):
+        self.assertEqual(archive_deleted_records(days=0)['inventory.MaterialCategory'], 0)
+        self.assertEqual(Material.objects.filter(category=self.category).count(), 2)
+        # 物料全部归档后，分类在同一轮中归档
+        for material in Material.objects.all():
+            material.soft_delete()
+        result = archive_deleted_records(days=0)
+        self.assertEqual((result['inventory.Material'], result['inventory.MaterialCategory']), (2, 1))
+        self.assertEqual(ArchivedRecord.objects.count(), 3)
+
+    def test_restore_requires_category(self):
+        material = Material.objects.get(material_code='M00000')
+        material.soft_delete()
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.user.pk))
+        url = reverse('material-restore', kwargs={'pk': material.pk})
+        self.assertEqual(client.post(url).status_code, 400)
+        self.category.restore()
+        self.assertEqual(client.post(url).status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CategoryImportTests(TestCase):
+    """物料分类（树形数据）导入"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_superuser('admin', password='admin123', employee_no='ADMIN')
+
+    def run_import(self, content, mode='upsert'):
+        job = ImportJob.objects.create(target='material_category', mode=mode, created_by=self.user,
+                                       file=SimpleUploadedFile('categories.csv', content.encode()))
+        ImportRunner(job).run()
+        job.refresh_from_db()
+        return job
+
+    def test_upsert_restores_soft_deleted(self):
+        parent = MaterialCategory.objects.create(category_code='MC001', category_name='原材料')
+        child = MaterialCategory.objects.create(category_code='MC002', category_name='钢材', parent=parent)
+        child.soft_delete()
+        job = self.run_import('category_code,category_name,parent_code\nMC002,型钢,MC001\nMC003,板材,MC002\n')
+        self.assertEqual((job.status, job.success_rows), ('success', 2), job.errors)
+        child.refresh_from_db()
+        self.assertEqual((child.category_name, child.is_deleted, child.deleted_at), ('型钢', False, None))
+        self.assertEqual(MaterialCategory.objects.get(category_code='MC003').parent, child)
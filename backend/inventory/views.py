@@ -2,15 +2,31 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from foundation.mixins import (
+    BulkUpsertMixin, ConditionalGetMixin, ExportMixin, QueryOptimizationMixin, ResponseCacheMixin,
+    SoftDeleteMixin
+)
+from foundation.pagination import KeysetPageNumberPagination, invalidate_count_cache
+from foundation.permissions import HasActionPermission
+from foundation.trees import build_tree, get_tree_params
+from .barcodes import lookup_material, lookup_materials
 from .models import MaterialCategory, Material, Warehouse
 from .serializers import MaterialCategorySerializer, MaterialSerializer, WarehouseSerializer
 
 
-class MaterialCategoryViewSet(viewsets.ModelViewSet):
+class MaterialCategoryViewSet(SoftDeleteMixin, ConditionalGetMixin, ResponseCacheMixin, QueryOptimizationMixin,
+                              viewsets.ModelViewSet):
     """物料分类管理视图集"""
-    queryset = MaterialCategory.objects.filter(is_deleted=False)
+    queryset = MaterialCategory.objects.alive()
     serializer_class = MaterialCategorySerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'inventory:category'
+
+    def check_restore(self, instance):
+        """上级分类已删除时不能恢复"""
+        if instance.parent_id and instance.parent.is_deleted:
+            return '上级分类已删除，请先恢复上级分类'
+        return None
 
     def list(self, request, *args, **kwargs):
         """获取物料分类列表"""
@@ -89,8 +105,7 @@ class MaterialCategoryViewSet(viewsets.ModelViewSet):
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        instance.is_deleted = True
-        instance.save()
+        instance.soft_delete(request.user)
 
         return Response({
             'code': 200,
@@ -101,17 +116,36 @@ class MaterialCategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def tree(self, request):
         """获取物料分类树"""
-        def build_tree(parent=None):
-            categories = MaterialCategory.objects.filter(parent=parent, is_deleted=False).order_by('sort_order', 'category_code')
-            result = []
-            for category in categories:
-                serializer = self.get_serializer(category)
-                item = serializer.data
-                item['children'] = build_tree(category)
-                result.append(item)
-            return result
-
-        tree_data = build_tree()
+        try:
+            root, depth = get_tree_params(request)
+        except ValueError:
+            return Response({
+                'code': 400,
+                'message': '参数错误',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        status_display = dict(MaterialCategory.STATUS_CHOICES)
+
+        def add_display(node):
+            node['status_display'] = status_display.get(node['status'])
+
+        tree_data = build_tree(self.get_queryset(), {
+            'id': 'id',
+            'category_code': 'category_code',
+            'category_name': 'category_name',
+            'parent': 'parent_id',
+            'parent_name': 'parent__category_name',
+            'sort_order': 'sort_order',
+            'status': 'status',
+            'remark': 'remark',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+            'created_by': 'created_by_id',
+            'created_by_name': 'created_by__username',
+            'updated_by': 'updated_by_id',
+            'updated_by_name': 'updated_by__username',
+        }, root=root, max_depth=depth, transform=add_display)
         return Response({
             'code': 200,
             'message': '获取成功',
@@ -119,11 +153,44 @@ class MaterialCategoryViewSet(viewsets.ModelViewSet):
         })
 
 
-class MaterialViewSet(viewsets.ModelViewSet):
+class MaterialViewSet(BulkUpsertMixin, ExportMixin, SoftDeleteMixin, ConditionalGetMixin, QueryOptimizationMixin,
+                      viewsets.ModelViewSet):
     """物料管理视图集"""
-    queryset = Material.objects.filter(is_deleted=False)
+    queryset = Material.objects.alive()
     serializer_class = MaterialSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'inventory:material'
+    # 批量查询只读取数据
+    permission_codes = {'batch_lookup': 'inventory:material:view'}
+    pagination_class = KeysetPageNumberPagination
+    bulk_code_field = 'material_code'
+    search_fields = ['material_code', 'material_name', 'material_spec', 'barcode']
+    search_index_target = 'material'
+    lookup_max_codes = 1000
+    export_fields = (
+        ('material_code', '物料编码'),
+        ('material_name', '物料名称'),
+        ('material_spec', '物料规格'),
+        ('category__category_code', '分类编码'),
+        ('category__category_name', '分类名称'),
+        ('material_type', '物料类型'),
+        ('unit', '基本单位'),
+        ('price', '参考价格'),
+        ('min_stock', '最小库存'),
+        ('max_stock', '最大库存'),
+        ('safety_stock', '安全库存'),
+        ('barcode', '条形码'),
+        ('status', '状态'),
+        ('remark', '备注'),
+        ('created_at', '创建时间'),
+        ('updated_at', '更新时间'),
+    )
+
+    def check_restore(self, instance):
+        """物料分类已删除时不能恢复"""
+        if instance.category_id and instance.category.is_deleted:
+            return '物料分类已删除，请先恢复物料分类'
+        return None
 
     def list(self, request, *args, **kwargs):
         """获取物料列表"""
@@ -136,12 +203,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
             return Response({
                 'code': 200,
                 'message': '获取成功',
-                'data': {
-                    'results': serializer.data,
-                    'count': self.paginator.page.paginator.count,
-                    'next': self.paginator.get_next_link(),
-                    'previous': self.paginator.get_previous_link()
-                }
+                'data': self.paginator.get_paginated_data(serializer.data)
             })
 
         serializer = self.get_serializer(queryset, many=True)
@@ -172,6 +234,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         serializer.save(created_by=request.user, updated_by=request.user)
+        invalidate_count_cache(Material)
 
         return Response({
             'code': 200,
@@ -201,8 +264,8 @@ class MaterialViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """删除物料（软删除）"""
         instance = self.get_object()
-        instance.is_deleted = True
-        instance.save()
+        instance.soft_delete(request.user)
+        invalidate_count_cache(Material)
 
         return Response({
             'code': 200,
@@ -210,12 +273,78 @@ class MaterialViewSet(viewsets.ModelViewSet):
             'data': None
         })
 
+    @action(detail=False, methods=['get'])
+    def lookup(self, request):
+        """按条形码或物料编码查询物料（扫码）"""
+        code = request.query_params.get('code', '').strip()
+        if not code:
+            return Response({
+                'code': 400,
+                'message': '请提供条形码或物料编码',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        record = lookup_material(code)
+        if record is None:
+            return Response({
+                'code': 404,
+                'message': '物料不存在',
+                'data': None
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'code': 200,
+            'message': '获取成功',
+            'data': record
+        })
+
+    @action(detail=False, methods=['post'], url_path='batch-lookup')
+    def batch_lookup(self, request):
+        """批量按条形码或物料编码查询物料"""
+        codes = request.data.get('codes') if isinstance(request.data, dict) else None
+        if not isinstance(codes, list) or not codes:
+            return Response({
+                'code': 400,
+                'message': 'codes必须为非空数组',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(codes) > self.lookup_max_codes:
+            return Response({
+                'code': 400,
+                'message': f'单次最多查询{self.lookup_max_codes}个编码',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        found, missing = lookup_materials([str(code).strip() for code in codes])
+        return Response({
+            'code': 200,
+            'message': '获取成功',
+            'data': {'found': found, 'missing': missing}
+        })
+
 
-class WarehouseViewSet(viewsets.ModelViewSet):
+class WarehouseViewSet(ExportMixin, SoftDeleteMixin, ConditionalGetMixin, ResponseCacheMixin, QueryOptimizationMixin,
+                       viewsets.ModelViewSet):
     """仓库管理视图集"""
-    queryset = Warehouse.objects.filter(is_deleted=False)
+    queryset = Warehouse.objects.alive()
     serializer_class = WarehouseSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, HasActionPermission]
+    permission_prefix = 'inventory:warehouse'
+    # 仓库人员只能访问被授权的仓库（guardian 对象级权限），拥有全局授权的用户不受限
+    object_permission = 'inventory.view_warehouse'
+    pagination_class = KeysetPageNumberPagination
+    export_fields = (
+        ('warehouse_code', '仓库编码'),
+        ('warehouse_name', '仓库名称'),
+        ('warehouse_type', '仓库类型'),
+        ('location', '仓库位置'),
+        ('manager__username', '仓库管理员'),
+        ('contact_phone', '联系电话'),
+        ('status', '状态'),
+        ('remark', '备注'),
+        ('created_at', '创建时间'),
+        ('updated_at', '更新时间'),
+    )
 
     def list(self, request, *args, **kwargs):
         """获取仓库列表"""
@@ -228,12 +357,7 @@ class WarehouseViewSet(viewsets.ModelViewSet):
             return Response({
                 'code': 200,
                 'message': '获取成功',
-                'data': {
-                    'results': serializer.data,
-                    'count': self.paginator.page.paginator.count,
-                    'next': self.paginator.get_next_link(),
-                    'previous': self.paginator.get_previous_link()
-                }
+                'data': self.paginator.get_paginated_data(serializer.data)
             })
 
         serializer = self.get_serializer(queryset, many=True)
@@ -264,6 +388,7 @@ class WarehouseViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         serializer.save(created_by=request.user, updated_by=request.user)
+        invalidate_count_cache(Warehouse)
 
         return Response({
             'code': 200,
@@ -293,8 +418,8 @@ class WarehouseViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """删除仓库（软删除）"""
         instance = self.get_object()
-        instance.is_deleted = True
-        instance.save()
+        instance.soft_delete(request.user)
+        invalidate_count_cache(Warehouse)
 
         return Response({
             'code': 200,